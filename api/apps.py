@@ -9,4 +9,7 @@ class ApiConfig(AppConfig):
         from .models import create_mongodb_indexes
         create_mongodb_indexes()
 
+        # Enregistrer les index en mémoire construits sur PreExtractedLocation
+        from . import search  # noqa: F401
+
 
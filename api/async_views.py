@@ -0,0 +1,185 @@
+"""
+Versions asynchrones des vues qui attendent des services externes (mode ASGI)
+
+Servies à la place de RouteView, OptimizedRouteView et SearchLocationView quand
+SERVER_MODE vaut 'asgi' : les appels à Valhalla (httpx) et à MongoDB
+(AsyncMongoClient) rendent la main à la boucle d'événements, si bien qu'un seul
+worker peut attendre des centaines de réponses en parallèle au lieu d'une.
+Les réponses sont identiques à celles des vues synchrones.
+"""
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+
+from .instrumentation import increment, timed
+from .ml_integration import MLIntegration
+from .models import MongoDBManager
+from .search import LocationSearchService
+from .serializers import RouteRequestSerializer, SearchLocationSerializer
+from .single_flight import route_flights
+from .utils import RoutingService
+from .views import RouteView
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncAPIView(View):
+    """
+    Vue asynchrone acceptant des requêtes POST en JSON, exemptée de CSRF comme les APIView
+    """
+    http_method_names = ['post', 'options']
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    @staticmethod
+    def parse(request, serializer_class):
+        """
+        Valide le corps JSON de la requête
+
+        Returns:
+            (serializer, None) si la requête est valide, sinon (None, réponse 400)
+        """
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError as e:
+            return None, AsyncAPIView.respond({'detail': f"JSON parse error - {str(e)}"}, status.HTTP_400_BAD_REQUEST)
+
+        serializer = serializer_class(data=data)
+        if not serializer.is_valid():
+            return None, AsyncAPIView.respond(serializer.errors, status.HTTP_400_BAD_REQUEST)
+        return serializer, None
+
+    @staticmethod
+    def respond(data, status_code=status.HTTP_200_OK):
+        with timed('serialization'):
+            return JsonResponse(data, status=status_code, safe=False, json_dumps_params={'ensure_ascii': False})
+
+
+class AsyncSearchLocationView(AsyncAPIView):
+    """
+    API pour rechercher des lieux par nom dans les données pré-extraites
+    """
+    async def post(self, request):
+        serializer, error = self.parse(request, SearchLocationSerializer)
+        if error:
+            return error
+
+        # Les index peuvent être rechargés depuis la base : accès ORM hors de la boucle
+        results = await sync_to_async(LocationSearchService.search)(
+            serializer.validated_data['query'],
+            limit=10,
+            fuzzy=serializer.validated_data['fuzzy']
+        )
+
+        if results:
+            return self.respond(results)
+
+        return self.respond({'message': 'Aucun lieu trouvé'}, status.HTTP_404_NOT_FOUND)
+
+
+class AsyncRouteView(AsyncAPIView):
+    """
+    API pour calculer un itinéraire entre deux points
+    """
+    async def post(self, request):
+        try:
+            serializer, error = self.parse(request, RouteRequestSerializer)
+            if error:
+                return error
+
+            start_point = serializer.validated_data['start_point']
+            end_point = serializer.validated_data['end_point']
+
+            # Vérifier si l'itinéraire existe déjà dans MongoDB
+            existing_route = await self.find_cached_route(start_point, end_point)
+            increment('route_cache_requests_total', result='hit' if existing_route else 'miss')
+            if existing_route:
+                return self.respond(RouteView.format_response(existing_route, serializer.validated_data))
+
+            route = await route_flights.ado(
+                MongoDBManager.route_key(start_point, end_point),
+                lambda: self.compute_route(start_point, end_point),
+                recheck=lambda: self.find_cached_route(start_point, end_point)
+            )
+
+            return self.respond(RouteView.format_response(route, serializer.validated_data))
+        except Exception as e:
+            logger.exception("Erreur dans AsyncRouteView: %s", e)
+            return self.respond(
+                {'error': f"Une erreur s'est produite lors du calcul de l'itinéraire: {str(e)}"},
+                status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    @staticmethod
+    async def find_cached_route(start_point, end_point):
+        return RouteView.cached_response(await MongoDBManager.afind_route(start_point, end_point), start_point, end_point)
+
+    @staticmethod
+    async def compute_route(start_point, end_point):
+        """
+        Calcule l'itinéraire et l'enregistre dans MongoDB
+        """
+        route = await RoutingService.aget_route(start_point, end_point)
+
+        await MongoDBManager.asave_route(
+            start_point,
+            end_point,
+            route['path'],
+            route['distance'],
+            route['duration'],
+            route.get('duration_text', '')
+        )
+        return route
+
+
+class AsyncOptimizedRouteView(AsyncAPIView):
+    """
+    API pour calculer un itinéraire optimisé entre deux points
+    en utilisant le modèle de machine learning
+    """
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.ml_integration = MLIntegration()
+
+    async def post(self, request):
+        try:
+            serializer, error = self.parse(request, RouteRequestSerializer)
+            if error:
+                return error
+
+            start_point = serializer.validated_data['start_point']
+            end_point = serializer.validated_data['end_point']
+
+            route = await self.ml_integration.apredict_optimal_route(start_point, end_point)
+
+            await MongoDBManager.asave_route(
+                start_point,
+                end_point,
+                route['path'],
+                route['distance'],
+                route['duration'],
+                route.get('duration_text', '')
+            )
+
+            return self.respond(RouteView.format_response({
+                'path': route['path'],
+                'distance': route['distance'],
+                'duration': route['duration'],
+                'duration_text': route.get('duration_text', ''),
+                'start_point': route['start_point'],
+                'end_point': route['end_point'],
+                'polyline': route.get('polyline')
+            }, serializer.validated_data))
+        except Exception as e:
+            logger.exception("Erreur dans AsyncOptimizedRouteView: %s", e)
+            return self.respond(
+                {'error': f"Une erreur s'est produite lors du calcul de l'itinéraire optimisé: {str(e)}"},
+                status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
@@ -0,0 +1,132 @@
+"""
+Disjoncteur (circuit breaker) pour les appels aux services externes
+
+Après `failure_threshold` échecs consécutifs (erreurs ou appels plus lents que
+`slow_call_seconds`), le circuit s'ouvre : les appels sont refusés
+immédiatement et l'appelant passe à sa solution de secours sans attendre.
+Après `reset_timeout` secondes, un seul appel de test est autorisé (demi-ouvert) :
+son succès referme le circuit, son échec le rouvre. Un appel de test dont
+l'issue n'a pas été enregistrée (exception imprévue, requête annulée) est
+considéré comme perdu après `probe_timeout` secondes : un nouvel appel de test
+est alors autorisé.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur à trois états : fermé, ouvert, demi-ouvert
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=5, slow_call_seconds=10.0, reset_timeout=30.0, probe_timeout=None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_timeout = reset_timeout
+        # Par défaut, le budget de latence d'un appel avec ses tentatives
+        if probe_timeout is None:
+            probe_timeout = getattr(settings, 'ROUTING_LATENCY_BUDGET', 20)
+        self.probe_timeout = probe_timeout
+
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started_at = 0.0
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow_request(self):
+        """
+        Indique si un appel peut être tenté maintenant
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                self._probe_in_flight = False
+
+            # Demi-ouvert : un seul appel de test à la fois, sauf s'il est perdu
+            now = time.monotonic()
+            if self._probe_in_flight and now - self._probe_started_at < self.probe_timeout:
+                return False
+            self._probe_in_flight = True
+            self._probe_started_at = now
+            return True
+
+    def record_success(self, elapsed=0.0):
+        """
+        Enregistre un appel réussi ; un appel trop lent compte comme un échec
+        """
+        if elapsed >= self.slow_call_seconds:
+            self.record_failure()
+            return
+
+        with self._lock:
+            self._failures = 0
+            self._probe_in_flight = False
+            if self._state != self.CLOSED:
+                logger.info("Circuit %s refermé", self.name)
+            self._state = self.CLOSED
+
+    def record_failure(self):
+        """
+        Enregistre un échec et ouvre le circuit si le seuil est atteint
+        """
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning("Circuit %s ouvert après %s échec(s)", self.name, self._failures)
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name):
+    """
+    Retourne le disjoncteur du service `name` (paramètres dans CIRCUIT_BREAKERS)
+
+    Chaque worker a ses propres disjoncteurs.
+    """
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(name)
+            if breaker is None:
+                config = getattr(settings, 'CIRCUIT_BREAKERS', {}).get(name, {})
+                breaker = _breakers[name] = CircuitBreaker(name, **config)
+    return breaker
+
+
+def _reset_circuit_breakers(setting, **kwargs):
+    if setting == 'CIRCUIT_BREAKERS':
+        with _breakers_lock:
+            _breakers.clear()
+
+
+setting_changed.connect(_reset_circuit_breakers)
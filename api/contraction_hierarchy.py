@@ -0,0 +1,463 @@
+"""
+Hiérarchies de contraction (CH) pour le graphe routier local
+
+Prétraitement (`python manage.py build_contraction_hierarchy`) : les nœuds sont
+contractés un à un, du moins important au plus important. Contracter un nœud v
+le retire du graphe en ajoutant un raccourci u -> w pour chaque chemin u -> v -> w
+qui est le seul plus court chemin entre u et w (vérifié par une recherche de
+témoin bornée). Le rang d'un nœud est son ordre de contraction.
+
+Requête : deux recherches de Dijkstra, depuis la source sur les arcs montants et
+depuis la destination sur les arcs descendants inversés, ne visitent que des
+nœuds de rang croissant ; elles se rejoignent au sommet du plus court chemin
+après quelques centaines de nœuds au plus. Les raccourcis sont ensuite déroulés
+pour retrouver les nœuds du graphe d'origine.
+
+Toutes les données sont stockées dans des tableaux plats (CSR), projetés en
+mémoire depuis le fichier de graph_storage :
+    up_offsets[v]..up_offsets[v+1]      arcs v -> x avec rang(x) > rang(v)
+    down_offsets[v]..down_offsets[v+1]  arcs x -> v avec rang(x) > rang(v)
+    arc_*                               table des arcs ; arc_first/arc_second
+                                        sont les deux moitiés d'un raccourci (-1 sinon)
+"""
+import heapq
+import math
+import time
+
+import numpy as np
+
+from .graph_storage import MappedArrays, save_arrays
+
+
+class ContractionHierarchy:
+    """
+    Index de plus courts chemins (temps de parcours) sur un RoadGraph
+    """
+    ARRAYS = (
+        'rank',
+        'up_offsets', 'up_targets', 'up_weights', 'up_arcs',
+        'down_offsets', 'down_targets', 'down_weights', 'down_arcs',
+        'arc_source', 'arc_target', 'arc_length', 'arc_first', 'arc_second',
+    )
+
+    def __init__(self, arrays):
+        """
+        Args:
+            arrays: Tableaux ARRAYS (dictionnaire ou MappedArrays)
+        """
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        # Empreinte (RoadGraph.fingerprint) du graphe contracté, None si inconnue
+        self.graph_fingerprint = getattr(arrays, 'metadata', {}).get('graph_fingerprint')
+
+        # Vues memoryview pour la boucle de recherche : l'accès élément par élément
+        # à un tableau NumPy est plusieurs fois plus lent, et une copie en listes
+        # Python ne serait plus partagée entre workers
+        self._up = tuple(memoryview(getattr(self, f'up_{name}')) for name in ('offsets', 'targets', 'weights', 'arcs'))
+        self._down = tuple(memoryview(getattr(self, f'down_{name}')) for name in ('offsets', 'targets', 'weights', 'arcs'))
+        self._arc_source = memoryview(self.arc_source)
+        self._arc_target = memoryview(self.arc_target)
+        self._arc_length = memoryview(self.arc_length)
+        self._arc_first = memoryview(self.arc_first)
+        self._arc_second = memoryview(self.arc_second)
+
+    def __len__(self):
+        return len(self.rank)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Ouvre une hiérarchie enregistrée par save() (projection mémoire)
+        """
+        return cls(MappedArrays(path))
+
+    def save(self, path):
+        """
+        Enregistre la hiérarchie au format binaire de graph_storage, avec l'empreinte du graphe contracté
+        """
+        save_arrays(
+            path, {name: getattr(self, name) for name in self.ARRAYS},
+            {'graph_fingerprint': self.graph_fingerprint}
+        )
+
+    @classmethod
+    def build(cls, graph, witness_limit=100, progress=None):
+        """
+        Contracte tous les nœuds de `graph` (RoadGraph)
+
+        Args:
+            witness_limit: Nombre maximal de nœuds visités par recherche de témoin ;
+                une limite basse ajoute quelques raccourcis inutiles mais jamais
+                de chemin faux
+            progress: Fonction appelée avec (nœuds contractés, total) pendant le calcul
+
+        Returns:
+            ContractionHierarchy, qui retient l'empreinte de `graph`
+        """
+        hierarchy = _HierarchyBuilder(graph, witness_limit).build(progress)
+        hierarchy.graph_fingerprint = graph.fingerprint
+        return hierarchy
+
+    def shortest_path(self, source, target):
+        """
+        Itinéraire le plus rapide par recherche bidirectionnelle montante
+
+        Returns:
+            (liste des nœuds, durée en secondes, longueur en mètres), ou None sans chemin
+        """
+        if source == target:
+            return [source], 0.0, 0.0
+
+        distances = ({source: 0.0}, {target: 0.0})
+        parents = ({source: -1}, {target: -1})
+        queues = ([(0.0, source)], [(0.0, target)])
+        # Arcs parcourus par chaque direction, et arcs servant à « caler » ses nœuds :
+        # un nœud atteint plus court par un voisin de rang supérieur n'est pas développé
+        graphs = ((self._up, self._down), (self._down, self._up))
+
+        best = math.inf
+        meeting = None
+
+        while queues[0] or queues[1]:
+            if not queues[1] or (queues[0] and queues[0][0][0] <= queues[1][0][0]):
+                side = 0
+            else:
+                side = 1
+            queue = queues[side]
+            distance, node = heapq.heappop(queue)
+
+            if distance >= best:
+                # Plus rien à gagner de ce côté
+                queue.clear()
+                continue
+            side_distances = distances[side]
+            if distance > side_distances[node]:
+                continue
+
+            other_distance = distances[1 - side].get(node)
+            if other_distance is not None and distance + other_distance < best:
+                best = distance + other_distance
+                meeting = node
+
+            (offsets, targets, weights, arcs), (stall_offsets, stall_targets, stall_weights, _) = graphs[side]
+
+            stalled = False
+            for i in range(stall_offsets[node], stall_offsets[node + 1]):
+                higher = side_distances.get(stall_targets[i])
+                if higher is not None and higher + stall_weights[i] < distance:
+                    stalled = True
+                    break
+            if stalled:
+                continue
+
+            side_parents = parents[side]
+            start, end = offsets[node], offsets[node + 1]
+            for neighbour, weight, arc in zip(targets[start:end], weights[start:end], arcs[start:end]):
+                candidate = distance + weight
+                if candidate < side_distances.get(neighbour, math.inf):
+                    side_distances[neighbour] = candidate
+                    side_parents[neighbour] = arc
+                    heapq.heappush(queue, (candidate, neighbour))
+
+        if meeting is None:
+            return None
+
+        # Arcs de la hiérarchie : source -> meeting puis meeting -> target
+        path_arcs = []
+        node = meeting
+        while parents[0][node] != -1:
+            arc = parents[0][node]
+            path_arcs.append(arc)
+            node = self._arc_source[arc]
+        path_arcs.reverse()
+
+        node = meeting
+        while parents[1][node] != -1:
+            arc = parents[1][node]
+            path_arcs.append(arc)
+            node = self._arc_target[arc]
+
+        length = sum(self._arc_length[arc] for arc in path_arcs)
+        return self._unpack(source, path_arcs), best, length
+
+    def upward_search(self, start, backward=False):
+        """
+        Espace de recherche montant complet depuis `start`
+
+        Args:
+            backward: Parcourir les arcs descendants inversés (recherche depuis une destination)
+
+        Returns:
+            Dictionnaire nœud -> (durée, longueur) des nœuds non calés
+        """
+        (offsets, targets, weights, arcs), (stall_offsets, stall_targets, stall_weights, _) = (
+            (self._down, self._up) if backward else (self._up, self._down)
+        )
+        arc_length = self._arc_length
+
+        distances = {start: 0.0}
+        lengths = {start: 0.0}
+        queue = [(0.0, start)]
+        settled = {}
+        while queue:
+            distance, node = heapq.heappop(queue)
+            if distance > distances[node]:
+                continue
+
+            stalled = False
+            for i in range(stall_offsets[node], stall_offsets[node + 1]):
+                higher = distances.get(stall_targets[i])
+                if higher is not None and higher + stall_weights[i] < distance:
+                    stalled = True
+                    break
+            if stalled:
+                continue
+
+            length = lengths[node]
+            settled[node] = (distance, length)
+            start_index, end_index = offsets[node], offsets[node + 1]
+            for neighbour, weight, arc in zip(
+                targets[start_index:end_index], weights[start_index:end_index], arcs[start_index:end_index]
+            ):
+                candidate = distance + weight
+                if candidate < distances.get(neighbour, math.inf):
+                    distances[neighbour] = candidate
+                    lengths[neighbour] = length + arc_length[arc]
+                    heapq.heappush(queue, (candidate, neighbour))
+        return settled
+
+    def many_to_many(self, sources, targets):
+        """
+        Matrice des durées et longueurs entre deux listes de nœuds
+
+        Une recherche montante par destination dépose ses distances dans des
+        « seaux » aux nœuds atteints ; une recherche montante par source lit
+        ensuite les seaux des nœuds qu'elle atteint. Le coût est donc de
+        len(sources) + len(targets) recherches, et non de leur produit.
+
+        Returns:
+            (durées, longueurs) : tableaux NumPy de forme (len(sources), len(targets)),
+            inf quand la destination n'est pas atteignable
+        """
+        buckets = {}
+        for column, target in enumerate(targets):
+            for node, (duration, length) in self.upward_search(target, backward=True).items():
+                buckets.setdefault(node, []).append((column, duration, length))
+
+        durations = np.full((len(sources), len(targets)), np.inf)
+        lengths = np.full((len(sources), len(targets)), np.inf)
+        for row, source in enumerate(sources):
+            row_durations = [math.inf] * len(targets)
+            row_lengths = [math.inf] * len(targets)
+            for node, (duration, length) in self.upward_search(source).items():
+                for column, target_duration, target_length in buckets.get(node, ()):
+                    if duration + target_duration < row_durations[column]:
+                        row_durations[column] = duration + target_duration
+                        row_lengths[column] = length + target_length
+            durations[row] = row_durations
+            lengths[row] = row_lengths
+        return durations, lengths
+
+    def _unpack(self, source, path_arcs):
+        """
+        Déroule les raccourcis en nœuds du graphe d'origine
+        """
+        nodes = [source]
+        for arc in path_arcs:
+            stack = [arc]
+            while stack:
+                arc = stack.pop()
+                first = self._arc_first[arc]
+                if first < 0:
+                    nodes.append(self._arc_target[arc])
+                else:
+                    stack.append(self._arc_second[arc])
+                    stack.append(first)
+        return nodes
+
+
+class _HierarchyBuilder:
+    """
+    Contraction des nœuds par ordre de priorité
+
+    La priorité d'un nœud est recalculée quand un de ses voisins est contracté,
+    puis vérifiée une dernière fois au moment de le contracter.
+    """
+    def __init__(self, graph, witness_limit):
+        self.node_count = len(graph)
+        self.witness_limit = witness_limit
+
+        self.arc_source = []
+        self.arc_target = []
+        self.arc_time = []
+        self.arc_length = []
+        self.arc_first = []
+        self.arc_second = []
+
+        # Graphe restant : outgoing[u][w] = incoming[w][u] = (temps, arc)
+        self.outgoing = [{} for _ in range(self.node_count)]
+        self.incoming = [{} for _ in range(self.node_count)]
+        for source, target, length, duration in zip(*(array.tolist() for array in graph.edges())):
+            if source != target:
+                self._add_arc(source, target, duration, length, -1, -1)
+
+        self.contracted_neighbours = [0] * self.node_count
+        self.level = [0] * self.node_count
+
+    def _add_arc(self, source, target, duration, length, first, second):
+        existing = self.outgoing[source].get(target)
+        if existing is not None and existing[0] <= duration:
+            return
+        arc = len(self.arc_source)
+        self.arc_source.append(source)
+        self.arc_target.append(target)
+        self.arc_time.append(duration)
+        self.arc_length.append(length)
+        self.arc_first.append(first)
+        self.arc_second.append(second)
+        self.outgoing[source][target] = (duration, arc)
+        self.incoming[target][source] = (duration, arc)
+
+    def _witness_distances(self, start, excluded, max_distance, targets):
+        """
+        Dijkstra borné depuis `start` sans passer par `excluded`
+        """
+        distances = {start: 0.0}
+        queue = [(0.0, start)]
+        remaining = len(targets)
+        settled = 0
+        while queue and settled < self.witness_limit:
+            distance, node = heapq.heappop(queue)
+            if distance > distances[node]:
+                continue
+            if distance > max_distance:
+                break
+            settled += 1
+            if node in targets:
+                remaining -= 1
+                if remaining == 0:
+                    break
+            for neighbour, (duration, _) in self.outgoing[node].items():
+                if neighbour == excluded:
+                    continue
+                candidate = distance + duration
+                if candidate < distances.get(neighbour, math.inf):
+                    distances[neighbour] = candidate
+                    heapq.heappush(queue, (candidate, neighbour))
+        return distances
+
+    def _shortcuts(self, node):
+        """
+        Raccourcis (u, w, temps, arc u->v, arc v->w) nécessaires pour contracter `node`
+        """
+        shortcuts = []
+        outgoing = self.outgoing[node]
+        if not outgoing:
+            return shortcuts
+
+        for source, (in_time, in_arc) in self.incoming[node].items():
+            via = {
+                target: in_time + out_time
+                for target, (out_time, _) in outgoing.items()
+                if target != source
+            }
+            if not via:
+                continue
+            witnesses = self._witness_distances(source, node, max(via.values()), via)
+            for target, duration in via.items():
+                if witnesses.get(target, math.inf) > duration:
+                    shortcuts.append((source, target, duration, in_arc, outgoing[target][1]))
+        return shortcuts
+
+    def _priority(self, node):
+        """
+        Différence d'arcs + voisins déjà contractés + niveau : favorise une
+        contraction uniforme sur tout le réseau plutôt que par zones
+        """
+        shortcuts = self._shortcuts(node)
+        degree = len(self.incoming[node]) + len(self.outgoing[node])
+        priority = 2 * (len(shortcuts) - degree) + self.contracted_neighbours[node] + self.level[node]
+        return priority, shortcuts
+
+    def build(self, progress=None):
+        rank = [-1] * self.node_count
+        up = [()] * self.node_count
+        down = [()] * self.node_count
+
+        current = [self._priority(node)[0] for node in range(self.node_count)]
+        queue = [(priority, node) for node, priority in enumerate(current)]
+        heapq.heapify(queue)
+
+        order = 0
+        last_report = time.monotonic()
+        while queue:
+            priority, node = heapq.heappop(queue)
+            if rank[node] >= 0 or priority != current[node]:
+                continue
+
+            # Mise à jour paresseuse : la priorité a pu augmenter depuis l'insertion
+            priority, shortcuts = self._priority(node)
+            if queue and priority > queue[0][0]:
+                current[node] = priority
+                heapq.heappush(queue, (priority, node))
+                continue
+
+            rank[node] = order
+            order += 1
+
+            outgoing = self.outgoing[node]
+            incoming = self.incoming[node]
+            up[node] = [(target, duration, arc) for target, (duration, arc) in outgoing.items()]
+            down[node] = [(source, duration, arc) for source, (duration, arc) in incoming.items()]
+
+            for source, target, duration, in_arc, out_arc in shortcuts:
+                length = self.arc_length[in_arc] + self.arc_length[out_arc]
+                self._add_arc(source, target, duration, length, in_arc, out_arc)
+
+            neighbours = set(outgoing) | set(incoming)
+            for target in outgoing:
+                del self.incoming[target][node]
+            for source in incoming:
+                del self.outgoing[source][node]
+            self.outgoing[node] = {}
+            self.incoming[node] = {}
+
+            for neighbour in neighbours:
+                self.contracted_neighbours[neighbour] += 1
+                self.level[neighbour] = max(self.level[neighbour], self.level[node] + 1)
+                current[neighbour] = self._priority(neighbour)[0]
+                heapq.heappush(queue, (current[neighbour], neighbour))
+
+            if progress is not None and time.monotonic() - last_report >= 5:
+                progress(order, self.node_count)
+                last_report = time.monotonic()
+
+        up_offsets, up_targets, up_weights, up_arcs = self._flatten(up)
+        down_offsets, down_targets, down_weights, down_arcs = self._flatten(down)
+
+        return ContractionHierarchy({
+            'rank': np.array(rank, dtype=np.int32),
+            'up_offsets': up_offsets, 'up_targets': up_targets, 'up_weights': up_weights, 'up_arcs': up_arcs,
+            'down_offsets': down_offsets, 'down_targets': down_targets,
+            'down_weights': down_weights, 'down_arcs': down_arcs,
+            'arc_source': np.array(self.arc_source, dtype=np.int32),
+            'arc_target': np.array(self.arc_target, dtype=np.int32),
+            'arc_length': np.array(self.arc_length, dtype=np.float64),
+            'arc_first': np.array(self.arc_first, dtype=np.int32),
+            'arc_second': np.array(self.arc_second, dtype=np.int32),
+        })
+
+    @staticmethod
+    def _flatten(adjacency):
+        """
+        Listes d'adjacence -> (offsets, voisins, poids, arcs) au format CSR
+        """
+        offsets = np.zeros(len(adjacency) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(arcs) for arcs in adjacency])
+        entries = [entry for arcs in adjacency for entry in arcs]
+        return (
+            offsets,
+            np.array([entry[0] for entry in entries], dtype=np.int32),
+            np.array([entry[1] for entry in entries], dtype=np.float64),
+            np.array([entry[2] for entry in entries], dtype=np.int32),
+        )
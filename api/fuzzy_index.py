@@ -0,0 +1,168 @@
+"""
+Index de recherche tolérante aux fautes de frappe (dictionnaire de suppressions SymSpell)
+
+Chaque mot des clés de recherche normalisées est enregistré avec toutes ses
+variantes obtenues en supprimant jusqu'à `max_distance` caractères. Une
+requête génère les mêmes variantes : les mots candidats sont ceux qui
+partagent une variante, puis la distance d'édition n'est calculée que sur ces
+quelques candidats au lieu de l'ensemble des noms.
+"""
+from array import array
+
+from .normalization import normalize_search_key
+
+
+def edit_distance(source, target, max_distance):
+    """
+    Distance de Damerau-Levenshtein restreinte (transpositions adjacentes comprises)
+
+    Returns:
+        La distance, ou max_distance + 1 dès qu'elle dépasse max_distance
+    """
+    if abs(len(source) - len(target)) > max_distance:
+        return max_distance + 1
+
+    previous_previous = None
+    previous = list(range(len(target) + 1))
+    for i, source_char in enumerate(source, 1):
+        current = [i] + [0] * len(target)
+        for j, target_char in enumerate(target, 1):
+            cost = 0 if source_char == target_char else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous_previous is not None and i > 1 and j > 1
+                    and source_char == target[j - 2] and source[i - 2] == target_char):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    return min(previous[-1], max_distance + 1)
+
+
+class FuzzyLocationIndex:
+    """
+    Dictionnaire de suppressions sur les mots des noms de lieux
+    """
+    # Seuls les premiers caractères d'un mot servent à générer les suppressions,
+    # ce qui borne la taille du dictionnaire (la distance est vérifiée sur le mot entier)
+    PREFIX_LENGTH = 7
+
+    def __init__(self, rows, max_distance=2):
+        """
+        Construit l'index à partir de tuples
+        (id, name, longitude, latitude, location_type, search_key) triés par nom
+        """
+        self.max_distance = max_distance
+        self.names = []
+        self.coordinates = []
+
+        word_ids = {}
+        self._words = []
+        self._word_positions = []
+        for position, row in enumerate(rows):
+            name, longitude, latitude, search_key = row[1], row[2], row[3], row[5]
+            self.names.append(name)
+            self.coordinates.append((longitude, latitude))
+            for word in set((search_key or normalize_search_key(name)).split()):
+                word_id = word_ids.get(word)
+                if word_id is None:
+                    word_id = word_ids[word] = len(self._words)
+                    self._words.append(word)
+                    self._word_positions.append(array('i'))
+                self._word_positions[word_id].append(position)
+
+        self._deletes = {}
+        for word_id, word in enumerate(self._words):
+            for variant in self._variants(word[:self.PREFIX_LENGTH], max_distance):
+                self._deletes.setdefault(variant, []).append(word_id)
+
+    def __len__(self):
+        return len(self.names)
+
+    @staticmethod
+    def _variants(word, max_distance):
+        """
+        Retourne le mot et toutes ses variantes à max_distance suppressions au plus
+        """
+        variants = {word}
+        frontier = {word}
+        for _ in range(max_distance):
+            next_frontier = set()
+            for candidate in frontier:
+                if len(candidate) <= 1:
+                    continue
+                for i in range(len(candidate)):
+                    next_frontier.add(candidate[:i] + candidate[i + 1:])
+            next_frontier -= variants
+            variants |= next_frontier
+            frontier = next_frontier
+        return variants
+
+    def _allowed_distance(self, word):
+        # Les mots courts n'admettent que peu d'erreurs sans devenir ambigus
+        if len(word) <= 2:
+            return 0
+        if len(word) <= 5:
+            return min(1, self.max_distance)
+        return self.max_distance
+
+    def lookup_word(self, word):
+        """
+        Retourne {word_id: distance} des mots du vocabulaire proches de `word`
+        """
+        max_distance = self._allowed_distance(word)
+        prefix = word[:self.PREFIX_LENGTH]
+
+        matches = {}
+        for variant in self._variants(prefix, max_distance):
+            for word_id in self._deletes.get(variant, ()):
+                if word_id in matches:
+                    continue
+                distance = edit_distance(word, self._words[word_id], max_distance)
+                if distance <= max_distance:
+                    matches[word_id] = distance
+        return matches
+
+    def search_positions(self, query, limit=10):
+        """
+        Retourne les positions des lieux dont chaque mot de la requête est proche d'un mot du nom
+
+        Les lieux sont classés par distance totale croissante, puis par nom.
+        """
+        tokens = normalize_search_key(query).split()
+        if not tokens:
+            return []
+
+        scores = None
+        for token in tokens:
+            token_scores = {}
+            for word_id, distance in self.lookup_word(token).items():
+                for position in self._word_positions[word_id]:
+                    best = token_scores.get(position)
+                    if best is None or distance < best:
+                        token_scores[position] = distance
+
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {
+                    position: score + token_scores[position]
+                    for position, score in scores.items()
+                    if position in token_scores
+                }
+            if not scores:
+                return []
+
+        ranked = sorted(scores.items(), key=lambda item: (item[1], item[0]))
+        return [position for position, _ in ranked[:limit]]
+
+    def search(self, query, limit=10):
+        """
+        Recherche approchée des lieux
+
+        Returns:
+            Liste de dictionnaires {'name', 'coordinates'} du plus proche au moins proche
+        """
+        return [
+            {'name': self.names[position], 'coordinates': list(self.coordinates[position])}
+            for position in self.search_positions(query, limit)
+        ]
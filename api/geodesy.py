@@ -0,0 +1,106 @@
+"""
+Calculs géodésiques vectorisés sur des tableaux de points [longitude, latitude]
+
+Distances haversine (sphère de rayon moyen) et caps de tous les segments d'un
+tracé calculés en une opération NumPy, au lieu d'un appel scalaire par segment.
+Les fonctions acceptent des listes de points ou des tableaux (N, 2).
+"""
+import numpy as np
+
+EARTH_RADIUS = 6371000  # Rayon de la Terre en mètres
+
+
+def _points(path):
+    return np.asarray(path, dtype=np.float64).reshape(-1, 2)
+
+
+def haversine(lon1, lat1, lon2, lat2):
+    """
+    Distance à vol d'oiseau en mètres, élément par élément
+
+    Les arguments sont des scalaires ou des tableaux de formes compatibles.
+    """
+    lon1, lat1, lon2, lat2 = (np.radians(np.asarray(value, dtype=np.float64)) for value in (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def haversine_matrix(sources, targets):
+    """
+    Distances à vol d'oiseau (mètres) entre chaque source et chaque destination
+
+    Returns:
+        Tableau (len(sources), len(targets))
+    """
+    sources = _points(sources)
+    targets = _points(targets)
+    return haversine(sources[:, None, 0], sources[:, None, 1], targets[None, :, 0], targets[None, :, 1])
+
+
+def segment_lengths(path):
+    """
+    Longueur (mètres) de chaque segment du tracé, tableau (N - 1,)
+    """
+    points = _points(path)
+    return haversine(points[:-1, 0], points[:-1, 1], points[1:, 0], points[1:, 1])
+
+
+def cumulative_distance(path):
+    """
+    Distance (mètres) parcourue depuis le départ jusqu'à chaque point, tableau (N,)
+    """
+    return np.concatenate(([0.0], np.cumsum(segment_lengths(path))))
+
+
+def path_length(path):
+    """
+    Longueur totale du tracé en mètres
+    """
+    return float(segment_lengths(path).sum())
+
+
+def sinuosity(path, length=None):
+    """
+    Rapport entre la longueur du tracé et la distance directe entre ses extrémités
+
+    Args:
+        length: Longueur du tracé si elle est déjà connue
+
+    Returns:
+        Rapport (>= 1), None si le tracé a moins de deux points ou revient à son départ
+    """
+    points = _points(path)
+    if len(points) < 2:
+        return None
+    direct = float(haversine(points[0, 0], points[0, 1], points[-1, 0], points[-1, 1]))
+    if direct <= 0:
+        return None
+    if length is None:
+        length = path_length(points)
+    return length / direct
+
+
+def bearings(path):
+    """
+    Cap initial (degrés, 0 = nord, sens horaire) de chaque segment du tracé, tableau (N - 1,)
+    """
+    points = np.radians(_points(path))
+    lon1, lat1 = points[:-1, 0], points[:-1, 1]
+    lon2, lat2 = points[1:, 0], points[1:, 1]
+    dlon = lon2 - lon1
+    x = np.sin(dlon) * np.cos(lat2)
+    y = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(dlon)
+    return np.degrees(np.arctan2(x, y)) % 360
+
+
+def turn_angles(path):
+    """
+    Changement de cap (degrés, 0 à 180) entre segments consécutifs du tracé
+
+    Les segments de longueur nulle (points répétés) sont ignorés.
+    """
+    points = _points(path)
+    if len(points) < 3:
+        return np.empty(0)
+    headings = bearings(points)[segment_lengths(points) > 0]
+    return np.abs((np.diff(headings) + 180) % 360 - 180)
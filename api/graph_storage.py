@@ -0,0 +1,102 @@
+"""
+Stockage binaire des graphes routiers, ouvert par mmap
+
+Un fichier contient une suite de tableaux contigus (offsets CSR, voisins,
+poids, coordonnées) précédés d'un en-tête JSON qui décrit leur type et leur
+position. Les tableaux sont lus directement dans le fichier projeté en
+mémoire : aucun décodage au chargement, et tous les workers gunicorn qui
+ouvrent le même fichier partagent une seule copie dans le cache de pages du
+système.
+
+Format :
+    MAGIC (8 octets) | longueur de l'en-tête (uint64) | en-tête JSON | tableaux
+    chaque tableau est aligné sur ALIGNMENT octets
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+
+import numpy as np
+
+MAGIC = b'RFGRAPH1'
+ALIGNMENT = 64
+
+
+def _align(position):
+    return (position + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def save_arrays(path, arrays, metadata=None):
+    """
+    Écrit des tableaux NumPy 1-D dans un fichier projetable
+
+    Le fichier est écrit à côté puis renommé : les workers qui ont déjà
+    projeté l'ancienne version continuent de la lire sans erreur.
+
+    Args:
+        arrays: Dictionnaire nom -> tableau
+        metadata: Informations libres (sérialisables en JSON) conservées dans l'en-tête
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+
+    # Les positions dépendent de la taille de l'en-tête, qui dépend des positions :
+    # l'en-tête est réservé avec une marge puis complété par des espaces
+    entries = {}
+    header_size = _align(len(MAGIC) + 8 + 256 + 128 * len(arrays) + len(json.dumps(metadata or {})))
+    position = header_size
+    for name, array in arrays.items():
+        entries[name] = {'dtype': array.dtype.str, 'offset': position, 'length': len(array)}
+        position = _align(position + array.nbytes)
+
+    header = json.dumps({
+        'byteorder': sys.byteorder,
+        'arrays': entries,
+        'metadata': metadata or {},
+    }).encode('utf-8')
+    if len(MAGIC) + 8 + len(header) > header_size:
+        raise ValueError("En-tête trop long")
+
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'wb') as output:
+        output.write(MAGIC)
+        output.write(struct.pack('<Q', len(header)))
+        output.write(header)
+        for name, array in arrays.items():
+            output.seek(entries[name]['offset'])
+            output.write(array.tobytes())
+        output.truncate(max(position, header_size))
+    os.replace(temporary_path, path)
+
+
+class MappedArrays:
+    """
+    Tableaux d'un fichier écrit par save_arrays(), en lecture seule et sans copie
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as source:
+            # Le descripteur peut être fermé : la projection reste valide
+            self._mmap = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} n'est pas un graphe routier (en-tête {MAGIC!r} attendu)")
+        (header_length,) = struct.unpack_from('<Q', self._mmap, len(MAGIC))
+        start = len(MAGIC) + 8
+        header = json.loads(self._mmap[start:start + header_length].decode('utf-8'))
+
+        if header['byteorder'] != sys.byteorder:
+            raise ValueError(f"{path} a été écrit sur une machine {header['byteorder']}-endian")
+
+        self.metadata = header['metadata']
+        self.arrays = {
+            name: np.frombuffer(self._mmap, dtype=entry['dtype'], count=entry['length'], offset=entry['offset'])
+            for name, entry in header['arrays'].items()
+        }
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def __contains__(self, name):
+        return name in self.arrays
@@ -0,0 +1,258 @@
+"""
+Clients HTTP partagés pour les services externes (Valhalla, Nominatim)
+
+Chaque worker garde une session `requests` par service : les connexions TCP/TLS
+sont conservées (keep-alive) et réutilisées d'un appel à l'autre au lieu d'être
+renégociées à chaque itinéraire. Les URL de base et la taille des pools sont
+définies par le paramètre HTTP_SERVICES.
+
+Les vues asynchrones (mode ASGI) utilisent un client httpx par boucle
+d'événements, dont le pool (ASYNC_HTTP_MAX_CONNECTIONS) permet de garder des
+centaines d'appels en cours dans un seul processus.
+"""
+import asyncio
+import os
+import threading
+import time
+import weakref
+
+import requests
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from requests.adapters import HTTPAdapter
+
+from .instrumentation import observe
+
+try:
+    import httpx
+    AsyncHttpError = httpx.HTTPError
+except ImportError:
+    # httpx n'est requis que par les vues asynchrones (mode ASGI)
+    httpx = None
+
+    class AsyncHttpError(Exception):
+        pass
+
+
+class CallStats:
+    """
+    Statistiques de durée des appels d'un client
+    """
+    def __init__(self, stage=None):
+        """
+        Args:
+            stage: Étape de api/instrumentation.py à laquelle ajouter chaque durée
+        """
+        self.stage = stage
+        self._lock = threading.Lock()
+        self.count = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.last_seconds = 0.0
+
+    def record(self, elapsed, error=False):
+        with self._lock:
+            self.count += 1
+            self.errors += int(error)
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+            self.last_seconds = elapsed
+        if self.stage:
+            observe(self.stage, elapsed)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'count': self.count,
+                'errors': self.errors,
+                'mean_ms': round(self.total_seconds / self.count * 1000, 1) if self.count else 0.0,
+                'max_ms': round(self.max_seconds * 1000, 1),
+                'last_ms': round(self.last_seconds * 1000, 1),
+            }
+
+
+class HttpClient:
+    """
+    Session HTTP avec pool de connexions keep-alive vers un service
+    """
+    def __init__(self, name, base_url, pool_maxsize=10, pool_block=False, timeout=10, headers=None):
+        """
+        Args:
+            name: Nom du service (clé de HTTP_SERVICES)
+            base_url: URL de base, les chemins des appels y sont ajoutés
+            pool_maxsize: Nombre de connexions gardées ouvertes vers l'hôte ; au-delà,
+                les appels simultanés ouvrent des connexions supplémentaires,
+                fermées après usage (avertissement de urllib3)
+            pool_block: Attendre une connexion libre plutôt que d'en ouvrir une de
+                plus ; requests n'a pas de délai d'attente du pool : l'appel peut
+                alors bloquer sans limite, au-delà de `timeout` et du budget de
+                latence. À n'activer qu'avec pool_maxsize >= nombre de threads
+            timeout: Délai par défaut en secondes
+        """
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.stats = CallStats(f"upstream_{name}")
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, pool_block=pool_block)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({'User-Agent': 'RouteFinder/1.0'})
+        if headers:
+            self.session.headers.update(headers)
+
+    def url(self, path):
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def request(self, method, path, **kwargs):
+        """
+        Effectue un appel et enregistre sa durée
+
+        Les exceptions de `requests` sont propagées telles quelles.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, self.url(path), **kwargs)
+        except requests.exceptions.RequestException:
+            self.stats.record(time.perf_counter() - started, error=True)
+            raise
+        self.stats.record(time.perf_counter() - started, error=response.status_code >= 500)
+        return response
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncHttpClient:
+    """
+    Client httpx asynchrone vers un service, lié à une boucle d'événements
+    """
+    def __init__(self, name, base_url, max_connections=200, timeout=10, headers=None, **sync_options):
+        """
+        Args:
+            max_connections: Nombre maximal de connexions ouvertes vers l'hôte ;
+                au-delà, les appels attendent une connexion libre
+            sync_options: Options de HTTP_SERVICES propres au client synchrone (ignorées)
+        """
+        if httpx is None:
+            raise ImproperlyConfigured("Les vues asynchrones nécessitent le paquet httpx")
+
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.stats = CallStats(f"upstream_{name}")
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            headers={'User-Agent': 'RouteFinder/1.0', **(headers or {})}
+        )
+
+    def url(self, path):
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    async def request(self, method, path, **kwargs):
+        """
+        Effectue un appel et enregistre sa durée
+
+        Les exceptions de httpx (AsyncHttpError) sont propagées telles quelles.
+        """
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, '/' + path.lstrip('/'), **kwargs)
+        except AsyncHttpError:
+            self.stats.record(time.perf_counter() - started, error=True)
+            raise
+        self.stats.record(time.perf_counter() - started, error=response.status_code >= 500)
+        return response
+
+    async def get(self, path, **kwargs):
+        return await self.request('GET', path, **kwargs)
+
+    async def post(self, path, **kwargs):
+        return await self.request('POST', path, **kwargs)
+
+    async def close(self):
+        await self.client.aclose()
+
+
+_clients = {}
+_clients_pid = None
+_clients_lock = threading.Lock()
+# Clients asynchrones par boucle d'événements (un client httpx ne peut pas en changer)
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_http_client(name):
+    """
+    Retourne le client du service `name` pour le processus courant
+
+    Les sessions ne sont pas partagées entre processus : après un fork
+    (gunicorn avec preload_app), chaque worker ouvre ses propres connexions.
+    """
+    global _clients_pid
+    pid = os.getpid()
+    client = _clients.get(name)
+    if client is not None and _clients_pid == pid:
+        return client
+
+    with _clients_lock:
+        if _clients_pid != pid:
+            _clients.clear()
+            _clients_pid = pid
+        client = _clients.get(name)
+        if client is None:
+            config = settings.HTTP_SERVICES[name]
+            client = _clients[name] = HttpClient(name, **config)
+        return client
+
+
+def get_async_http_client(name):
+    """
+    Retourne le client asynchrone du service `name` pour la boucle d'événements courante
+    """
+    loop = asyncio.get_running_loop()
+    clients = _async_clients.get(loop)
+    if clients is None:
+        clients = _async_clients[loop] = {}
+
+    client = clients.get(name)
+    if client is None:
+        config = dict(settings.HTTP_SERVICES[name])
+        config['max_connections'] = getattr(settings, 'ASYNC_HTTP_MAX_CONNECTIONS', 200)
+        client = clients[name] = AsyncHttpClient(name, **config)
+    return client
+
+
+def http_client_stats():
+    """
+    Retourne les statistiques de durée des clients créés par ce processus
+    """
+    stats = {name: client.stats.snapshot() for name, client in _clients.items()}
+    for clients in list(_async_clients.values()):
+        for name, client in clients.items():
+            stats[f"{name} (async)"] = client.stats.snapshot()
+    return stats
+
+
+def _reset_http_clients(setting, **kwargs):
+    # Permet aux tests de rediriger les services avec override_settings(HTTP_SERVICES=...)
+    if setting == 'HTTP_SERVICES':
+        with _clients_lock:
+            for client in _clients.values():
+                client.close()
+            _clients.clear()
+            # Les clients asynchrones ne peuvent être fermés que dans leur boucle
+            _async_clients.clear()
+
+
+setting_changed.connect(_reset_http_clients)
@@ -0,0 +1,155 @@
+"""
+Mesure de la durée des étapes du traitement des requêtes
+
+Chaque étape (lecture du cache, appel amont, décodage de la polyline,
+ajustement au trafic, prédiction ML, écriture MongoDB, sérialisation) est
+chronométrée avec `timed(stage)` :
+
+- la durée alimente l'histogramme de l'étape, cumulé sur la vie du processus ;
+- elle est ajoutée au relevé de la requête en cours (variable de contexte,
+  propre à chaque thread ou tâche asyncio), que RequestTimingMiddleware
+  journalise au niveau DEBUG à la fin de la requête.
+
+Le relevé n'est mis en forme que si le niveau DEBUG est actif pour le logger
+`api.instrumentation` ; sinon seule la mise à jour des histogrammes a lieu.
+
+Les événements (requêtes par vue, consultations du cache, recours au calcul de
+secours...) sont comptés avec `increment(name, **labels)`. Histogrammes et
+compteurs sont exposés, additionnés sur tous les workers, par api/metrics.py.
+"""
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Bornes supérieures (secondes) des intervalles des histogrammes
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Relevé {étape: secondes} de la requête en cours, None hors requête
+_current_trace = contextvars.ContextVar('request_trace', default=None)
+
+
+class Histogram:
+    """
+    Répartition des durées d'une étape par intervalles
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self._lock = threading.Lock()
+        self.buckets = tuple(buckets)
+        # Un compteur par intervalle, le dernier pour les durées au-delà de la plus grande borne
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total_seconds = 0.0
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total_seconds += seconds
+
+    def snapshot(self):
+        """
+        Returns:
+            {'buckets': [(borne, nombre cumulé de durées <= borne), ..., ('+Inf', count)],
+            'count', 'sum'} au format des histogrammes Prometheus
+        """
+        with self._lock:
+            counts = list(self.counts)
+            count, total = self.count, self.total_seconds
+        cumulative = 0
+        buckets = []
+        for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+            cumulative += bucket_count
+            buckets.append((bound, cumulative))
+        return {'buckets': buckets, 'count': count, 'sum': total}
+
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+
+def _histogram(stage):
+    histogram = _histograms.get(stage)
+    if histogram is None:
+        with _histograms_lock:
+            histogram = _histograms.setdefault(stage, Histogram())
+    return histogram
+
+
+def observe(stage, seconds):
+    """
+    Enregistre une durée mesurée pour une étape
+    """
+    _histogram(stage).observe(seconds)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace[stage] = trace.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed(stage):
+    """
+    Chronomètre le bloc et enregistre sa durée pour l'étape (exceptions comprises)
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - started)
+
+
+def stage_histograms():
+    """
+    Retourne l'état des histogrammes de ce processus, par étape
+    """
+    with _histograms_lock:
+        histograms = dict(_histograms)
+    return {stage: histogram.snapshot() for stage, histogram in sorted(histograms.items())}
+
+
+_counters = {}
+_counters_lock = threading.Lock()
+
+
+def increment(name, amount=1, **labels):
+    """
+    Ajoute amount au compteur name pour la combinaison d'étiquettes donnée
+    """
+    key = (name, tuple(sorted((label, str(value)) for label, value in labels.items())))
+    with _counters_lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def counters():
+    """
+    Retourne les compteurs de ce processus : {(nom, ((étiquette, valeur), ...)): total}
+    """
+    with _counters_lock:
+        return dict(_counters)
+
+
+@contextmanager
+def request_trace(description):
+    """
+    Ouvre le relevé des étapes d'une requête
+
+    La durée totale est enregistrée sous l'étape 'request' ; le détail est
+    journalisé au niveau DEBUG.
+    """
+    trace = {}
+    token = _current_trace.set(trace)
+    started = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        elapsed = time.perf_counter() - started
+        _current_trace.reset(token)
+        _histogram('request').observe(elapsed)
+        if logger.isEnabledFor(logging.DEBUG):
+            stages = ' '.join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in trace.items())
+            logger.debug("%s %.1fms | %s", description, elapsed * 1000, stages or '-')
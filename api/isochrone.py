@@ -0,0 +1,192 @@
+"""
+Construction des polygones d'isochrones (zones atteignables en un temps donné)
+
+Les nœuds atteints par la recherche sont rastérisés sur une grille métrique :
+une cellule est atteignable si elle contient un nœud atteint dans le temps
+imparti, ou si elle touche une telle cellule (les rues entre deux nœuds sont
+ainsi couvertes). Les contours de la zone sont ensuite suivis le long des
+bords de cellules et renvoyés en coordonnées [longitude, latitude], au format
+des coordonnées GeoJSON MultiPolygon.
+"""
+import math
+
+import numpy as np
+
+from .geodesy import EARTH_RADIUS
+
+# Directions des bords de cellule (dx, dy), dans l'ordre anti-horaire
+_DIRECTIONS = ((1, 0), (0, 1), (-1, 0), (0, -1))
+
+
+def grid_contours(lons, lats, times, thresholds, cell_size=100):
+    """
+    Polygones des zones atteintes avant chaque seuil
+
+    Args:
+        lons, lats: Coordonnées des nœuds atteints
+        times: Temps d'arrivée des nœuds (mêmes unités que thresholds)
+        thresholds: Seuils de temps
+        cell_size: Taille des cellules de la grille en mètres
+
+    Returns:
+        Pour chaque seuil, une liste de polygones [anneau extérieur, trous...],
+        chaque anneau étant une liste fermée de [longitude, latitude]
+    """
+    lons = np.asarray(lons, dtype=np.float64)
+    lats = np.asarray(lats, dtype=np.float64)
+    times = np.asarray(times, dtype=np.float64)
+    if len(lons) == 0:
+        return [[] for _ in thresholds]
+
+    # Projection équirectangulaire autour de la latitude moyenne
+    x_scale = math.radians(1) * EARTH_RADIUS * math.cos(math.radians(lats.mean()))
+    y_scale = math.radians(1) * EARTH_RADIUS
+    min_lon, min_lat = lons.min(), lats.min()
+
+    # Une cellule de marge autour des nœuds pour la dilatation
+    columns = np.floor((lons - min_lon) * x_scale / cell_size).astype(np.int64) + 1
+    rows = np.floor((lats - min_lat) * y_scale / cell_size).astype(np.int64) + 1
+    shape = (rows.max() + 2, columns.max() + 2)
+
+    # Temps d'arrivée minimal par cellule
+    earliest = np.full(shape, np.inf)
+    np.minimum.at(earliest, (rows, columns), times)
+
+    def to_coordinates(column, row):
+        return [
+            min_lon + (column - 1) * cell_size / x_scale,
+            min_lat + (row - 1) * cell_size / y_scale
+        ]
+
+    contours = []
+    for threshold in thresholds:
+        mask = _dilate(earliest <= threshold)
+        polygons = [
+            [[to_coordinates(column, row) for column, row in ring] for ring in polygon]
+            for polygon in _trace_polygons(mask)
+        ]
+        contours.append(polygons)
+    return contours
+
+
+def circle_polygon(center, radius, segments=32):
+    """
+    Polygone approchant un cercle de `radius` mètres autour de [longitude, latitude]
+    """
+    lon, lat = center
+    angles = np.linspace(0, 2 * np.pi, segments, endpoint=False)
+    lons = lon + np.degrees(radius * np.cos(angles) / (EARTH_RADIUS * math.cos(math.radians(lat))))
+    lats = lat + np.degrees(radius * np.sin(angles) / EARTH_RADIUS)
+    ring = np.column_stack([lons, lats]).tolist()
+    return [ring + [ring[0]]]
+
+
+def _dilate(mask):
+    """
+    Dilatation 3x3 d'un masque booléen
+    """
+    padded = np.pad(mask, 1)
+    result = np.zeros_like(mask)
+    rows, columns = mask.shape
+    for dy in range(3):
+        for dx in range(3):
+            result |= padded[dy:dy + rows, dx:dx + columns]
+    return result
+
+
+def _trace_polygons(mask):
+    """
+    Suit les bords des cellules pleines du masque
+
+    Chaque bord entre une cellule pleine et une cellule vide est orienté de
+    sorte que la cellule pleine soit à sa gauche : les anneaux extérieurs sont
+    alors parcourus dans le sens anti-horaire et les trous dans le sens horaire.
+
+    Returns:
+        Liste de polygones [anneau extérieur, trous...] en coordonnées de grille (colonne, ligne)
+    """
+    padded = np.pad(mask, 1)
+    inner = padded[1:-1, 1:-1]
+
+    # Bords orientés (départ -> arrivée) en coordonnées de sommets de grille
+    outgoing = {}
+
+    def add_edges(boundary, start_offset, direction):
+        rows, columns = np.nonzero(boundary)
+        dx, dy = direction
+        for row, column in zip(rows.tolist(), columns.tolist()):
+            start = (column + start_offset[0], row + start_offset[1])
+            outgoing.setdefault(start, []).append((start[0] + dx, start[1] + dy))
+
+    add_edges(inner & ~padded[:-2, 1:-1], (0, 0), (1, 0))   # bord bas
+    add_edges(inner & ~padded[1:-1, 2:], (1, 0), (0, 1))    # bord droit
+    add_edges(inner & ~padded[2:, 1:-1], (1, 1), (-1, 0))   # bord haut
+    add_edges(inner & ~padded[1:-1, :-2], (0, 1), (0, -1))  # bord gauche
+
+    rings = []
+    while outgoing:
+        start = next(iter(outgoing))
+        ring = [start]
+        previous_direction = None
+        current = start
+        while True:
+            candidates = outgoing[current]
+            if len(candidates) == 1 or previous_direction is None:
+                following = candidates.pop(0)
+            else:
+                # Sommet touché par deux cellules en diagonale : tourner à gauche
+                # pour ne pas relier les deux cellules
+                following = min(candidates, key=lambda end: _turn_order(previous_direction, current, end))
+                candidates.remove(following)
+            if not candidates:
+                del outgoing[current]
+            previous_direction = (following[0] - current[0], following[1] - current[1])
+            current = following
+            if current == start:
+                break
+            ring.append(current)
+        rings.append(_remove_collinear(ring))
+
+    outers = [ring for ring in rings if _signed_area(ring) > 0]
+    holes = [ring for ring in rings if _signed_area(ring) < 0]
+    polygons = [[outer] for outer in outers]
+    for hole in holes:
+        for polygon in polygons:
+            if _contains(polygon[0], hole[0]):
+                polygon.append(hole)
+                break
+
+    # Anneaux fermés (premier sommet répété à la fin)
+    return [[ring + [ring[0]] for ring in polygon] for polygon in polygons]
+
+
+def _turn_order(previous_direction, current, end):
+    direction = (end[0] - current[0], end[1] - current[1])
+    # 0 = à gauche, 1 = tout droit, 2 = à droite
+    return (_DIRECTIONS.index(previous_direction) - _DIRECTIONS.index(direction) + 1) % 4
+
+
+def _remove_collinear(ring):
+    kept = []
+    size = len(ring)
+    for i, point in enumerate(ring):
+        before, after = ring[i - 1], ring[(i + 1) % size]
+        if (point[0] - before[0]) * (after[1] - point[1]) != (point[1] - before[1]) * (after[0] - point[0]):
+            kept.append(point)
+    return kept
+
+
+def _signed_area(ring):
+    return sum(a[0] * b[1] - b[0] * a[1] for a, b in zip(ring, ring[1:] + ring[:1])) / 2
+
+
+def _contains(ring, point):
+    """
+    Point dans un polygone (lancer de rayon), pour un point hors des bords de l'anneau
+    """
+    x, y = point[0] + 0.5, point[1] + 0.25
+    inside = False
+    for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]):
+        if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+    return inside
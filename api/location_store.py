@@ -0,0 +1,149 @@
+"""
+Copie en mémoire de la table PreExtractedLocation, partagée par les index du processus
+
+Chaque worker charge les lieux une seule fois puis construit à la demande les
+index enregistrés (recherche par nom, etc.). La signature de la table
+(nombre de lignes, identifiant maximal et, sous SQLite, compteur de
+modifications tenu par des triggers) est revérifiée périodiquement afin de
+reconstruire les index lorsqu'un autre processus a modifié les données :
+réimport, renommage dans l'admin, QuerySet.update() ou correction de
+coordonnées.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Max
+from django.db.models.signals import post_save
+
+from .models import PreExtractedLocation
+
+logger = logging.getLogger(__name__)
+
+# Compteur de modifications de la table (migration 0006)
+VERSION_TABLE = 'api_preextractedlocation_version'
+
+
+class LocationSnapshot:
+    """
+    Instantané immuable des lieux et des index construits à partir de celui-ci
+    """
+    def __init__(self, rows, signature):
+        # rows: liste de tuples (id, name, longitude, latitude, location_type, search_key)
+        # triés par nom
+        self.rows = rows
+        self.signature = signature
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def get_index(self, name, builder):
+        """
+        Retourne l'index `name`, construit une seule fois avec builder(rows)
+        """
+        index = self._indexes.get(name)
+        if index is None:
+            with self._lock:
+                index = self._indexes.get(name)
+                if index is None:
+                    started = time.perf_counter()
+                    index = builder(self.rows)
+                    self._indexes[name] = index
+                    elapsed_ms = (time.perf_counter() - started) * 1000
+                    logger.info("Index '%s' construit: %s lieux en %.0f ms", name, len(self.rows), elapsed_ms)
+        return index
+
+
+class LocationStore:
+    """
+    Point d'accès aux index en mémoire construits sur PreExtractedLocation
+    """
+    _builders = {}
+    _snapshot = None
+    _checked_at = 0.0
+    _lock = threading.Lock()
+
+    @classmethod
+    def register(cls, name, builder):
+        """
+        Enregistre un constructeur d'index appelé avec la liste des lieux
+        """
+        cls._builders[name] = builder
+
+    @classmethod
+    def get_index(cls, name):
+        """
+        Retourne l'index enregistré sous `name`, à jour par rapport à la table
+        """
+        return cls.snapshot().get_index(name, cls._builders[name])
+
+    @classmethod
+    def snapshot(cls):
+        """
+        Retourne l'instantané courant, rechargé si la table a changé
+        """
+        refresh_seconds = getattr(settings, 'LOCATION_INDEX_REFRESH_SECONDS', 60)
+        snapshot = cls._snapshot
+        if snapshot is not None and time.monotonic() - cls._checked_at < refresh_seconds:
+            return snapshot
+
+        with cls._lock:
+            # Un autre thread a pu recharger l'instantané pendant l'attente du verrou
+            if cls._snapshot is not None and time.monotonic() - cls._checked_at < refresh_seconds:
+                return cls._snapshot
+
+            signature = cls._table_signature()
+            if cls._snapshot is None or cls._snapshot.signature != signature:
+                cls._snapshot = LocationSnapshot(cls._load_rows(), signature)
+            cls._checked_at = time.monotonic()
+            return cls._snapshot
+
+    @classmethod
+    def invalidate(cls):
+        """
+        Force le rechargement des lieux et des index au prochain accès
+        """
+        cls._snapshot = None
+
+    @classmethod
+    def warm_up(cls):
+        """
+        Construit tous les index enregistrés (appelé au démarrage d'un worker)
+        """
+        snapshot = cls.snapshot()
+        for name, builder in cls._builders.items():
+            snapshot.get_index(name, builder)
+
+    @staticmethod
+    def _table_signature():
+        stats = PreExtractedLocation.objects.aggregate(count=Count('id'), max_id=Max('id'))
+        return (stats['count'], stats['max_id'], LocationStore._table_version())
+
+    @staticmethod
+    def _table_version():
+        # Hors SQLite (pas de triggers), seuls les ajouts et suppressions sont détectés
+        if connection.vendor != 'sqlite':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT version FROM {VERSION_TABLE} WHERE id = 1")
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _load_rows():
+        return list(
+            PreExtractedLocation.objects.order_by('name', 'id').values_list(
+                'id', 'name', 'longitude', 'latitude', 'location_type', 'search_key'
+            )
+        )
+
+
+def _invalidate_location_store(sender, **kwargs):
+    LocationStore.invalidate()
+
+
+# Rechargement immédiat dans le processus qui enregistre ; les autres le voient
+# par la signature. Les suppressions la modifient aussi : un récepteur post_delete
+# empêcherait la suppression en masse rapide utilisée par import_locations.py
+post_save.connect(_invalidate_location_store, sender=PreExtractedLocation)
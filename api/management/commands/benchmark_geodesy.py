@@ -0,0 +1,111 @@
+"""
+Compare les calculs géodésiques sur des tracés, boucle Python et version NumPy
+
+Usage:
+    python manage.py benchmark_geodesy --points 1000,10000,100000
+
+Pour chaque taille de tracé (marche aléatoire dans Fès), mesure la longueur
+totale, les distances cumulées et les caps des segments, calculés segment par
+segment avec math puis en une fois avec api.geodesy ; les résultats doivent
+être identiques à 1e-6 m près.
+"""
+import math
+import random
+import statistics
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from api import geodesy
+from api.stub_services import FES_CENTER
+
+
+class Command(BaseCommand):
+    help = "Benchmark des calculs géodésiques : boucle Python et NumPy sur des tracés de 1k à 100k points"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--points', default='1000,10000,100000', help="Tailles des tracés, séparées par des virgules")
+        parser.add_argument('--repeat', type=int, default=10, help="Nombre de mesures par calcul")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        for count in [int(value) for value in options['points'].split(',') if value.strip()]:
+            path = self._random_path(count, rng)
+
+            reference = self.cumulative_reference(path)
+            if not np.allclose(geodesy.cumulative_distance(path), reference, rtol=0, atol=1e-6):
+                raise CommandError("Les distances cumulées diffèrent")
+            headings = geodesy.bearings(path)
+            expected = self.bearings_reference(path)
+            if not np.allclose((headings - expected + 180) % 360 - 180, 0, atol=1e-6):
+                raise CommandError("Les caps diffèrent")
+
+            self.stdout.write(f"Tracé de {count} points ({reference[-1] / 1000:.1f} km)")
+            # Tracé déjà sous forme de tableau (polyline décodée) : sans conversion de la liste
+            points = np.asarray(path)
+            for label, loop, vectorized in (
+                ('Longueur', lambda: self.cumulative_reference(path)[-1], geodesy.path_length),
+                ('Distances cumulées', lambda: self.cumulative_reference(path), geodesy.cumulative_distance),
+                ('Caps', lambda: self.bearings_reference(path), geodesy.bearings),
+            ):
+                self._compare(
+                    label, loop, lambda: vectorized(path), lambda: vectorized(points), options['repeat']
+                )
+
+    @staticmethod
+    def _random_path(count, rng):
+        lng, lat = FES_CENTER
+        path = []
+        for _ in range(count):
+            lng += rng.uniform(-0.0001, 0.0001)
+            lat += rng.uniform(-0.0001, 0.0001)
+            path.append([lng, lat])
+        return path
+
+    @staticmethod
+    def cumulative_reference(path):
+        """
+        Distances cumulées segment par segment (implémentation de référence)
+        """
+        distances = [0.0]
+        for (lon1, lat1), (lon2, lat2) in zip(path, path[1:]):
+            lat1_rad, lat2_rad = math.radians(lat1), math.radians(lat2)
+            a = (math.sin((lat2_rad - lat1_rad) / 2) ** 2
+                 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+            distances.append(distances[-1] + 2 * geodesy.EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a))))
+        return distances
+
+    @staticmethod
+    def bearings_reference(path):
+        """
+        Caps segment par segment (implémentation de référence)
+        """
+        headings = []
+        for (lon1, lat1), (lon2, lat2) in zip(path, path[1:]):
+            lat1_rad, lat2_rad = math.radians(lat1), math.radians(lat2)
+            dlon = math.radians(lon2 - lon1)
+            x = math.sin(dlon) * math.cos(lat2_rad)
+            y = math.cos(lat1_rad) * math.sin(lat2_rad) - math.sin(lat1_rad) * math.cos(lat2_rad) * math.cos(dlon)
+            headings.append(math.degrees(math.atan2(x, y)) % 360)
+        return headings
+
+    def _compare(self, label, reference, from_list, from_array, repeat):
+        loop_time = self._measure(reference, repeat)
+        list_time = self._measure(from_list, repeat)
+        array_time = self._measure(from_array, repeat)
+        self.stdout.write(
+            f"  {label:<20} boucle {loop_time:9.2f} ms | NumPy (liste) {list_time:8.2f} ms "
+            f"x{loop_time / max(list_time, 1e-9):.0f} | NumPy (tableau) {array_time:8.2f} ms "
+            f"x{loop_time / max(array_time, 1e-9):.0f}"
+        )
+
+    @staticmethod
+    def _measure(function, repeat):
+        times = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            function()
+            times.append((time.perf_counter() - started) * 1000)
+        return statistics.median(times)
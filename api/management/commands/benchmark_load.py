@@ -0,0 +1,106 @@
+"""
+Mesure le débit et la latence de l'API sous charge, à plusieurs niveaux de concurrence
+
+Usage (Valhalla simulé avec 200 ms de latence, sans appel au service public) :
+    python manage.py run_stub_services --port 8081 --delay 0.2
+    VALHALLA_URL=http://127.0.0.1:8081 gunicorn -c gunicorn.conf.py route_finder.wsgi
+    python manage.py benchmark_load --url http://127.0.0.1:8000 --concurrency 1,10,50,100,200
+
+puis la même mesure avec SERVER_MODE=asgi pour le serveur. Chaque requête
+porte sur un trajet aléatoire différent dans l'emprise de Fès, afin de ne
+jamais être servie par le cache MongoDB des itinéraires.
+"""
+import asyncio
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Emprise de Fès [min_lon, min_lat, max_lon, max_lat]
+FES_BBOX = (-5.06, 33.99, -4.93, 34.08)
+
+
+class Command(BaseCommand):
+    help = "Benchmark de charge : débit et latence d'un endpoint selon le nombre de requêtes simultanées"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help="Adresse du serveur testé")
+        parser.add_argument('--path', default='/api/routes/calculate/')
+        parser.add_argument('--concurrency', default='1,10,50,100,200', help="Niveaux de concurrence, séparés par des virgules")
+        parser.add_argument('--requests', type=int, default=0, help="Requêtes par niveau (défaut : 5 par client, au moins 50)")
+        parser.add_argument('--timeout', type=float, default=60)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        try:
+            import httpx  # noqa: F401
+        except ImportError:
+            raise CommandError("Le benchmark de charge nécessite le paquet httpx")
+
+        levels = [int(level) for level in options['concurrency'].split(',') if level.strip()]
+        rng = random.Random(options['seed'])
+        self.stdout.write(f"{options['url']}{options['path']}")
+
+        for concurrency in levels:
+            count = options['requests'] or max(50, concurrency * 5)
+            payloads = [self._random_route(rng) for _ in range(count)]
+            elapsed, latencies, errors = asyncio.run(
+                self._run(options['url'], options['path'], payloads, concurrency, options['timeout'])
+            )
+            self._report(concurrency, count, elapsed, latencies, errors)
+
+    @staticmethod
+    def _random_route(rng):
+        min_lon, min_lat, max_lon, max_lat = FES_BBOX
+        return {
+            'start_point': [rng.uniform(min_lon, max_lon), rng.uniform(min_lat, max_lat)],
+            'end_point': [rng.uniform(min_lon, max_lon), rng.uniform(min_lat, max_lat)],
+        }
+
+    @staticmethod
+    async def _run(url, path, payloads, concurrency, timeout):
+        """
+        Envoie les requêtes avec au plus `concurrency` requêtes en cours
+
+        Returns:
+            (durée totale en secondes, latences en ms des réponses 200, nombre d'erreurs)
+        """
+        import httpx
+
+        queue = list(reversed(payloads))
+        latencies = []
+        errors = 0
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+        async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+            async def worker():
+                nonlocal errors
+                while queue:
+                    payload = queue.pop()
+                    started = time.perf_counter()
+                    try:
+                        response = await client.post(path, json=payload)
+                    except httpx.HTTPError:
+                        errors += 1
+                        continue
+                    if response.status_code == 200:
+                        latencies.append((time.perf_counter() - started) * 1000)
+                    else:
+                        errors += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            return time.perf_counter() - started, latencies, errors
+
+    def _report(self, concurrency, count, elapsed, latencies, errors):
+        if latencies:
+            ordered = sorted(latencies)
+            p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+            latency = f"p50 {statistics.median(latencies):8.1f} ms | p99 {p99:8.1f} ms"
+        else:
+            latency = "aucune réponse valide"
+        self.stdout.write(
+            f"concurrence {concurrency:>4} | {count:>5} requêtes | "
+            f"{len(latencies) / elapsed:8.1f} req/s | {latency} | erreurs {errors}"
+        )
@@ -0,0 +1,122 @@
+"""
+Compare la recherche de lieux par l'ORM (plage search_key puis LIKE '%q%')
+et par l'index n-grammes
+
+Usage:
+    python manage.py benchmark_location_search --rows 100000 --queries 500
+
+La table est complétée avec des lieux synthétiques jusqu'à --rows lignes dans
+une transaction annulée à la fin : la base n'est pas modifiée.
+"""
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.location_store import LocationStore
+from api.models import PreExtractedLocation
+from api.normalization import normalize_search_key
+from api.search import LocationSearchService
+from api.search_index import LocationSearchIndex
+
+
+class Command(BaseCommand):
+    help = "Benchmark de la recherche de lieux : ORM contre index n-grammes en mémoire"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help="Nombre minimal de lieux dans la table")
+        parser.add_argument('--queries', type=int, default=500, help="Nombre de requêtes mesurées")
+        parser.add_argument('--limit', type=int, default=10, help="Nombre de résultats par requête")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+
+        with transaction.atomic():
+            self._fill_table(options['rows'], rng)
+
+            started = time.perf_counter()
+            rows = LocationStore._load_rows()
+            index = LocationSearchIndex(rows)
+            build_ms = (time.perf_counter() - started) * 1000
+            self.stdout.write(f"Lieux: {len(index)} - index construit en {build_ms:.0f} ms")
+
+            queries = self._sample_queries(index.names, options['queries'], rng)
+            limit = options['limit']
+
+            orm_times, orm_results = self._measure(lambda q: LocationSearchService.search_orm(q, limit), queries)
+            index_times, index_results = self._measure(lambda q: index.search(q, limit), queries)
+
+            mismatches = sum(
+                1 for orm, indexed in zip(orm_results, index_results)
+                if [r['name'] for r in orm] != [r['name'] for r in indexed]
+            )
+
+            self._report('ORM search_key', orm_times)
+            self._report('Index n-grammes', index_times)
+            speedup = statistics.mean(orm_times) / max(statistics.mean(index_times), 1e-9)
+            self.stdout.write(f"Accélération moyenne: x{speedup:.0f}")
+            self.stdout.write(f"Résultats différents: {mismatches}/{len(queries)}")
+
+            transaction.set_rollback(True)
+
+    def _fill_table(self, target_rows, rng):
+        """
+        Complète la table avec des variantes des noms existants
+        """
+        existing = list(PreExtractedLocation.objects.values_list('name', 'longitude', 'latitude')[:5000])
+        if not existing:
+            existing = [("Bab Boujloud", -4.9837, 34.0617)]
+
+        missing = target_rows - PreExtractedLocation.objects.count()
+        batch = []
+        for i in range(max(missing, 0)):
+            name, longitude, latitude = rng.choice(existing)
+            synthetic_name = f"{name} {i}"
+            batch.append(PreExtractedLocation(
+                name=synthetic_name,
+                search_key=normalize_search_key(synthetic_name),
+                longitude=longitude + rng.uniform(-0.01, 0.01),
+                latitude=latitude + rng.uniform(-0.01, 0.01),
+                location_type='benchmark'
+            ))
+            if len(batch) >= 5000:
+                PreExtractedLocation.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            PreExtractedLocation.objects.bulk_create(batch)
+
+    @staticmethod
+    def _sample_queries(names, count, rng):
+        """
+        Tire des sous-chaînes et des préfixes de noms réels (2 à 8 caractères)
+        """
+        queries = []
+        while len(queries) < count:
+            name = rng.choice(names)
+            if len(name) < 2:
+                continue
+            size = rng.randint(2, min(8, len(name)))
+            start = 0 if rng.random() < 0.5 else rng.randint(0, len(name) - size)
+            queries.append(name[start:start + size])
+        return queries
+
+    @staticmethod
+    def _measure(search, queries):
+        times = []
+        results = []
+        for query in queries:
+            started = time.perf_counter()
+            results.append(search(query))
+            times.append((time.perf_counter() - started) * 1000)
+        return times, results
+
+    def _report(self, label, times):
+        ordered = sorted(times)
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        self.stdout.write(
+            f"{label:<16} moyenne {statistics.mean(times):8.3f} ms | "
+            f"p50 {statistics.median(times):8.3f} ms | p99 {p99:8.3f} ms"
+        )
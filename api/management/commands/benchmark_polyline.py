@@ -0,0 +1,101 @@
+"""
+Compare l'encodage et le décodage des polylines, boucle Python et version NumPy
+
+Usage:
+    python manage.py benchmark_polyline --points 10000
+
+La géométrie est une marche aléatoire dans Fès, au pas d'un point de route
+Valhalla (quelques mètres). Les deux implémentations doivent produire la même
+chaîne et les mêmes coordonnées. La taille de la réponse JSON est comparée
+entre les formats 'coordinates' et 'polyline6'.
+"""
+import json
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import polyline
+from api.stub_services import FES_CENTER, encode_polyline
+
+
+class Command(BaseCommand):
+    help = "Benchmark des polylines : boucle Python et NumPy, taille des réponses JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--points', type=int, default=10000, help="Nombre de points de la géométrie")
+        parser.add_argument('--repeat', type=int, default=20, help="Nombre de mesures par implémentation")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        path = self._random_path(options['points'], random.Random(options['seed']))
+        repeat = options['repeat']
+
+        encoded = encode_polyline(path)
+        if polyline.encode(path) != encoded:
+            raise CommandError("Les encodages diffèrent")
+        if polyline.decode(encoded).tolist() != self.decode_reference(encoded):
+            raise CommandError("Les décodages diffèrent")
+        self.stdout.write(f"Géométrie: {len(path)} points - polyline de {len(encoded)} caractères")
+
+        self._report('Décodage boucle Python', self._measure(lambda: self.decode_reference(encoded), repeat))
+        self._report('Décodage NumPy', self._measure(lambda: polyline.decode(encoded).tolist(), repeat))
+        self._report('Encodage boucle Python', self._measure(lambda: encode_polyline(path), repeat))
+        self._report('Encodage NumPy', self._measure(lambda: polyline.encode(path), repeat))
+
+        # Coordonnées telles que renvoyées par Valhalla (arrondies à la précision 6)
+        decoded = polyline.decode(encoded).tolist()
+        coordinates_size = len(json.dumps({'path': decoded}))
+        polyline_size = len(json.dumps({'polyline': encoded}))
+        self.stdout.write(
+            f"Réponse JSON: coordinates {coordinates_size / 1024:.1f} Ko | "
+            f"polyline6 {polyline_size / 1024:.1f} Ko | x{coordinates_size / polyline_size:.1f}"
+        )
+
+    @staticmethod
+    def _random_path(count, rng):
+        lng, lat = FES_CENTER
+        path = []
+        for _ in range(count):
+            lng += rng.uniform(-0.0001, 0.0001)
+            lat += rng.uniform(-0.0001, 0.0001)
+            path.append([lng, lat])
+        return path
+
+    @staticmethod
+    def decode_reference(encoded, precision=6):
+        """
+        Décodage caractère par caractère (implémentation de référence)
+        """
+        coordinates = []
+        index = lat = lng = 0
+        factor = 10 ** precision
+        while index < len(encoded):
+            deltas = []
+            for _ in range(2):
+                shift = result = 0
+                while True:
+                    byte = ord(encoded[index]) - 63
+                    index += 1
+                    result |= (byte & 0x1f) << shift
+                    shift += 5
+                    if byte < 0x20:
+                        break
+                deltas.append(~(result >> 1) if (result & 1) else (result >> 1))
+            lat += deltas[0]
+            lng += deltas[1]
+            coordinates.append([lng / factor, lat / factor])
+        return coordinates
+
+    @staticmethod
+    def _measure(function, repeat):
+        times = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            function()
+            times.append((time.perf_counter() - started) * 1000)
+        return times
+
+    def _report(self, label, times):
+        self.stdout.write(f"{label:<24} médiane {statistics.median(times):8.2f} ms | min {min(times):8.2f} ms")
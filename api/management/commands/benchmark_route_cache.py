@@ -0,0 +1,99 @@
+"""
+Mesure le taux de succès du cache d'itinéraires selon le rattachement des clés
+
+Usage:
+    python manage.py benchmark_route_cache --requests 10000 --hotspots 50 --jitter 15
+
+Simule des demandes entre des lieux fréquents de Fès, chaque point étant
+dispersé autour de son lieu (clic, GPS : écart-type --jitter mètres), puis
+compte les demandes dont la clé (MongoDBManager.route_key) a déjà été vue,
+pour chaque mode de ROUTE_CACHE_SNAP. Le mode 'node' n'est mesuré que si le
+graphe routier local existe.
+"""
+import math
+import os
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from api import geodesy
+from api.models import MongoDBManager
+from api.stub_services import FES_CENTER
+
+
+class Command(BaseCommand):
+    help = "Taux de succès du cache d'itinéraires avec clés exactes, sur grille ou rattachées au graphe"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=10000, help="Nombre de demandes simulées")
+        parser.add_argument('--hotspots', type=int, default=50, help="Nombre de lieux fréquents")
+        parser.add_argument('--jitter', type=float, default=15, help="Écart-type (mètres) des points autour de leur lieu")
+        parser.add_argument('--precisions', default='3,4,5', help="Précisions de grille mesurées, séparées par des virgules")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        requests = self._requests(rng, options['requests'], options['hotspots'], options['jitter'])
+        self.stdout.write(
+            f"{len(requests)} demandes entre {options['hotspots']} lieux, dispersion {options['jitter']:.0f} m"
+        )
+
+        configurations = [('none', {'ROUTE_CACHE_SNAP': 'none'})]
+        for precision in [int(value) for value in options['precisions'].split(',') if value.strip()]:
+            configurations.append((
+                f"grid {precision}",
+                {'ROUTE_CACHE_SNAP': 'grid', 'ROUTE_CACHE_GRID_PRECISION': precision}
+            ))
+        if os.path.exists(str(settings.ROAD_GRAPH_PATH)):
+            configurations.append(('node', {'ROUTE_CACHE_SNAP': 'node'}))
+        else:
+            self.stdout.write("Graphe routier absent : mode 'node' non mesuré")
+
+        for label, overrides in configurations:
+            with override_settings(**overrides):
+                self._measure(label, requests)
+
+    @staticmethod
+    def _requests(rng, count, hotspot_count, jitter):
+        lng, lat = FES_CENTER
+        hotspots = [
+            (lng + rng.uniform(-0.04, 0.04), lat + rng.uniform(-0.03, 0.03)) for _ in range(hotspot_count)
+        ]
+        # Conversion de l'écart-type en degrés à la latitude de Fès
+        jitter_lat = math.degrees(jitter / geodesy.EARTH_RADIUS)
+        jitter_lng = jitter_lat / max(0.1, math.cos(math.radians(lat)))
+
+        def scatter(point):
+            return [point[0] + rng.gauss(0, jitter_lng), point[1] + rng.gauss(0, jitter_lat)]
+
+        requests = []
+        for _ in range(count):
+            start, end = rng.sample(hotspots, 2)
+            requests.append((scatter(start), scatter(end)))
+        return requests
+
+    def _measure(self, label, requests):
+        seen = {}
+        hits = 0
+        gaps = []
+        started = time.perf_counter()
+        for start, end in requests:
+            key = MongoDBManager.route_key(start, end)
+            cached = seen.get(key)
+            if cached is None:
+                seen[key] = (start, end)
+                continue
+            hits += 1
+            # Longueur du raccord entre les points demandés et ceux de l'itinéraire en cache
+            gaps.append(float(geodesy.haversine(start[0], start[1], cached[0][0], cached[0][1])))
+            gaps.append(float(geodesy.haversine(end[0], end[1], cached[1][0], cached[1][1])))
+        elapsed = (time.perf_counter() - started) * 1e6 / len(requests)
+        gaps.sort()
+        median_gap = gaps[len(gaps) // 2] if gaps else 0.0
+        self.stdout.write(
+            f"  {label:<8} succès {hits / len(requests):6.1%} | {len(seen):6d} itinéraires calculés | "
+            f"raccord médian {median_gap:5.1f} m | clé {elapsed:5.1f} µs"
+        )
@@ -0,0 +1,127 @@
+"""
+Compare les moteurs d'itinéraire locaux sur des trajets entre lieux réels
+
+Usage:
+    python manage.py benchmark_routing --pairs 500
+
+Les origines et destinations sont tirées au hasard parmi les lieux de
+PreExtractedLocation et rattachées au nœud le plus proche du graphe. Chaque
+trajet est calculé par Dijkstra simple (référence), A* bidirectionnel et
+hiérarchie de contraction ; les durées doivent être identiques.
+"""
+import heapq
+import math
+import os
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.contraction_hierarchy import ContractionHierarchy
+from api.models import PreExtractedLocation
+from api.routing_engine import RoadGraph
+
+
+class Command(BaseCommand):
+    help = "Benchmark du calcul d'itinéraire local : Dijkstra, A* bidirectionnel et hiérarchie de contraction"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pairs', type=int, default=200, help="Nombre de trajets mesurés")
+        parser.add_argument('--max-snap', type=float, default=500, help="Écart maximal (m) entre un lieu et le graphe")
+        parser.add_argument('--graph', default=settings.ROAD_GRAPH_PATH)
+        parser.add_argument('--hierarchy', default=settings.ROAD_GRAPH_CH_PATH)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        for path in (options['graph'], options['hierarchy']):
+            if not os.path.exists(path):
+                raise CommandError(f"Fichier introuvable: {path}")
+
+        graph = RoadGraph.load(options['graph'])
+        hierarchy = ContractionHierarchy.load(options['hierarchy'])
+        if len(hierarchy) != len(graph):
+            raise CommandError("La hiérarchie ne correspond pas au graphe : relancer build_contraction_hierarchy")
+
+        pairs = self._sample_pairs(graph, options['pairs'], options['max_snap'], random.Random(options['seed']))
+        if not pairs:
+            raise CommandError("Aucun lieu de PreExtractedLocation n'est proche du graphe")
+        self.stdout.write(f"Graphe: {len(graph)} nœuds - {len(pairs)} trajets")
+
+        dijkstra_times, reference = self._measure(lambda s, t: self.dijkstra(graph, s, t), pairs)
+        astar_times, astar_results = self._measure(graph.shortest_path, pairs)
+        hierarchy_times, hierarchy_results = self._measure(hierarchy.shortest_path, pairs)
+
+        self._report('Dijkstra', dijkstra_times)
+        self._report('A* bidirectionnel', astar_times)
+        self._report('Hiérarchie (CH)', hierarchy_times)
+        speedup = statistics.mean(dijkstra_times) / max(statistics.mean(hierarchy_times), 1e-9)
+        self.stdout.write(f"Accélération moyenne CH / Dijkstra: x{speedup:.0f}")
+
+        for label, results in (('A*', astar_results), ('CH', hierarchy_results)):
+            mismatches = sum(
+                1 for expected, result in zip(reference, results)
+                if (expected is None) != (result is None)
+                or (expected is not None and not math.isclose(expected, result[1], rel_tol=1e-9, abs_tol=1e-6))
+            )
+            self.stdout.write(f"Durées différentes de Dijkstra ({label}): {mismatches}/{len(pairs)}")
+
+    @staticmethod
+    def _sample_pairs(graph, count, max_snap, rng):
+        """
+        Tire des couples de lieux distincts rattachés à des nœuds du graphe
+        """
+        locations = list(PreExtractedLocation.objects.values_list('longitude', 'latitude'))
+        nodes = []
+        for longitude, latitude in rng.sample(locations, min(len(locations), count * 4)):
+            node, gap = graph.nearest_node(longitude, latitude)
+            if node is not None and gap <= max_snap:
+                nodes.append(node)
+
+        pairs = []
+        while len(nodes) >= 2 and len(pairs) < count:
+            source, target = rng.sample(nodes, 2)
+            if source != target:
+                pairs.append((source, target))
+        return pairs
+
+    @staticmethod
+    def dijkstra(graph, source, target):
+        """
+        Dijkstra unidirectionnel de référence : durée du trajet le plus rapide, ou None
+        """
+        distances = {source: 0.0}
+        queue = [(0.0, source)]
+        while queue:
+            distance, node = heapq.heappop(queue)
+            if node == target:
+                return distance
+            if distance > distances[node]:
+                continue
+            offsets, targets, times, _ = graph.forward
+            for i in range(offsets[node], offsets[node + 1]):
+                neighbour = targets[i]
+                candidate = distance + times[i]
+                if candidate < distances.get(neighbour, math.inf):
+                    distances[neighbour] = candidate
+                    heapq.heappush(queue, (candidate, neighbour))
+        return None
+
+    @staticmethod
+    def _measure(route, pairs):
+        times = []
+        results = []
+        for source, target in pairs:
+            started = time.perf_counter()
+            results.append(route(source, target))
+            times.append((time.perf_counter() - started) * 1000)
+        return times, results
+
+    def _report(self, label, times):
+        ordered = sorted(times)
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        self.stdout.write(
+            f"{label:<18} moyenne {statistics.mean(times):8.3f} ms | "
+            f"p50 {statistics.median(times):8.3f} ms | p99 {p99:8.3f} ms"
+        )
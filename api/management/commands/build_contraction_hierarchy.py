@@ -0,0 +1,57 @@
+"""
+Prétraite le graphe routier local en hiérarchie de contraction
+
+Usage:
+    python manage.py build_road_graph
+    python manage.py build_contraction_hierarchy
+
+La hiérarchie (ordre des nœuds, raccourcis et graphes montant/descendant en
+tableaux plats) est enregistrée dans ROAD_GRAPH_CH_PATH. Elle doit être
+reconstruite à chaque nouvelle extraction du graphe : son en-tête retient
+l'empreinte du graphe contracté, et une hiérarchie qui ne correspond plus au
+graphe est ignorée au chargement.
+"""
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.contraction_hierarchy import ContractionHierarchy
+from api.routing_engine import RoadGraph
+
+
+class Command(BaseCommand):
+    help = "Construit la hiérarchie de contraction du graphe routier local"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--graph', default=settings.ROAD_GRAPH_PATH, help="Graphe produit par build_road_graph")
+        parser.add_argument('--output', default=settings.ROAD_GRAPH_CH_PATH)
+        parser.add_argument(
+            '--witness-limit', type=int, default=100,
+            help="Nœuds visités au plus par recherche de témoin"
+        )
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['graph']):
+            raise CommandError(f"Graphe introuvable: {options['graph']} (python manage.py build_road_graph)")
+
+        graph = RoadGraph.load(options['graph'])
+        self.stdout.write(f"Contraction de {len(graph)} nœuds, {graph.edge_count} arcs")
+
+        started = time.perf_counter()
+        hierarchy = ContractionHierarchy.build(
+            graph,
+            witness_limit=options['witness_limit'],
+            progress=lambda done, total: self.stdout.write(f"  {done}/{total} nœuds contractés")
+        )
+
+        os.makedirs(os.path.dirname(options['output']) or '.', exist_ok=True)
+        hierarchy.save(options['output'])
+
+        elapsed = time.perf_counter() - started
+        shortcuts = int((hierarchy.arc_first >= 0).sum())
+        self.stdout.write(self.style.SUCCESS(
+            f"Hiérarchie enregistrée dans {options['output']}: {shortcuts} raccourcis, "
+            f"{len(hierarchy.up_targets) + len(hierarchy.down_targets)} arcs de recherche ({elapsed:.0f} s)"
+        ))
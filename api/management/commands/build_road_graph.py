@@ -0,0 +1,80 @@
+"""
+Extrait le graphe routier carrossable de Fès depuis OpenStreetMap pour le moteur local
+
+Usage:
+    python manage.py build_road_graph
+    python manage.py build_road_graph --graphml fes_drive.graphml
+
+Le graphe est réduit à sa plus grande composante fortement connexe, puis
+enregistré dans ROAD_GRAPH_PATH au format CSR projetable en mémoire
+(voir api/graph_storage.py).
+"""
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.routing_engine import RoadGraph
+
+
+class Command(BaseCommand):
+    help = "Construit le graphe routier utilisé par le moteur d'itinéraire local"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--place', default=settings.ROAD_GRAPH_PLACE, help="Lieu à extraire (osmnx)")
+        parser.add_argument('--graphml', help="Charger un graphe osmnx déjà téléchargé au lieu d'interroger OSM")
+        parser.add_argument('--output', default=settings.ROAD_GRAPH_PATH)
+
+    def handle(self, *args, **options):
+        import osmnx as ox
+
+        started = time.perf_counter()
+        if options['graphml']:
+            G = ox.load_graphml(options['graphml'])
+        else:
+            self.stdout.write(f"Téléchargement du réseau carrossable: {options['place']}")
+            G = ox.graph_from_place(options['place'], network_type="drive")
+
+        # Écarter les îlots non reliés au reste du réseau
+        G = ox.truncate.largest_component(G, strongly=True)
+        G = ox.add_edge_speeds(G)
+        G = ox.add_edge_travel_times(G)
+
+        graph = self.to_road_graph(G)
+
+        os.makedirs(os.path.dirname(options['output']) or '.', exist_ok=True)
+        graph.save(options['output'])
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Graphe enregistré dans {options['output']}: {len(graph)} nœuds, "
+            f"{graph.edge_count} arcs ({elapsed:.0f} s)"
+        ))
+
+    @staticmethod
+    def to_road_graph(G):
+        """
+        Convertit un MultiDiGraph osmnx en RoadGraph (arc le plus rapide entre deux nœuds)
+        """
+        node_index = {node: i for i, node in enumerate(G.nodes)}
+        node_x = [G.nodes[node]['x'] for node in G.nodes]
+        node_y = [G.nodes[node]['y'] for node in G.nodes]
+
+        fastest = {}
+        for u, v, data in G.edges(data=True):
+            if u == v:
+                continue
+            key = (node_index[u], node_index[v])
+            travel_time = float(data['travel_time'])
+            if key not in fastest or travel_time < fastest[key][1]:
+                fastest[key] = (float(data['length']), travel_time)
+
+        edges = sorted(fastest.items())
+        return RoadGraph.from_edges(
+            node_x, node_y,
+            [source for (source, _), _ in edges],
+            [target for (_, target), _ in edges],
+            [length for _, (length, _) in edges],
+            [travel_time for _, (_, travel_time) in edges]
+        )
@@ -0,0 +1,30 @@
+"""
+Reconstruit l'index plein texte FTS5 des lieux pré-extraits
+
+Usage:
+    python manage.py rebuild_location_fts
+
+Les triggers de la migration 0002 tiennent l'index à jour au fil des écritures ;
+cette commande sert après une modification directe de la base ou pour
+compacter l'index après un import massif.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api.search import FTS_TABLE
+
+
+class Command(BaseCommand):
+    help = "Reconstruit et optimise l'index plein texte FTS5 des lieux"
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("L'index FTS5 n'est disponible qu'avec SQLite")
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+            cursor.execute(f"SELECT COUNT(*) FROM {FTS_TABLE}")
+            count = cursor.fetchone()[0]
+
+        self.stdout.write(self.style.SUCCESS(f"Index FTS5 reconstruit: {count} lieux indexés"))
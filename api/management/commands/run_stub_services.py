@@ -0,0 +1,30 @@
+"""
+Lance les services HTTP locaux imitant Nominatim et Valhalla
+
+Usage:
+    python manage.py run_stub_services --port 8081 --delay 0.2
+    VALHALLA_URL=http://127.0.0.1:8081 NOMINATIM_URL=http://127.0.0.1:8081 python manage.py runserver
+"""
+from django.core.management.base import BaseCommand
+
+from api.stub_services import StubServer, StubServiceHandler
+
+
+class Command(BaseCommand):
+    help = "Lance un serveur local imitant les API externes (Nominatim, Valhalla)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8081)
+        parser.add_argument('--delay', type=float, default=0.0, help="Latence simulée par réponse (secondes)")
+
+    def handle(self, *args, **options):
+        handler = type('StubServiceHandler', (StubServiceHandler,), {'delay': options['delay']})
+        server = StubServer((options['host'], options['port']), handler)
+        self.stdout.write(f"Services simulés sur http://{options['host']}:{options['port']}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
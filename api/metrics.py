@@ -0,0 +1,336 @@
+"""
+Exposition des métriques au format texte de Prometheus (GET /metrics/)
+
+Compteurs et histogrammes de durée des étapes (api/instrumentation.py) sont
+tenus en mémoire par chaque worker gunicorn. Pour que /metrics/ donne les
+totaux de la machine quel que soit le worker qui répond :
+
+- chaque worker écrit l'état complet de ses métriques dans METRICS_DIR/<pid>.json
+  toutes les METRICS_FLUSH_INTERVAL secondes (thread lancé à sa première requête) ;
+- quand un worker s'arrête (recyclage max_requests, timeout), son fichier est
+  fusionné dans archive.json (hooks gunicorn worker_exit et child_exit) : les
+  compteurs ne diminuent pas et le nombre de fichiers reste borné ;
+- /metrics/ additionne l'archive, les fichiers des autres workers et l'état en
+  mémoire du worker qui répond.
+
+Le coût par requête se limite à l'incrément d'un compteur. Chaque maître
+gunicorn utilise son propre sous-répertoire de METRICS_DIR (gunicorn-<pid>,
+créé au démarrage, supprimé à l'arrêt) : plusieurs instances sur une même
+machine (déploiement bleu/vert) ne mélangent ni n'effacent leurs métriques.
+
+Sans maître gunicorn (runserver, uvicorn --workers N), les processus écrivent
+directement dans METRICS_DIR et personne n'archive leurs fichiers : /metrics/
+n'additionne que ceux des processus encore en vie et supprime les autres, pour
+que les compteurs ne cumulent pas les exécutions précédentes.
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .instrumentation import counters, stage_histograms
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Préfixe des noms de métriques exposés
+NAMESPACE = 'route_finder'
+
+ARCHIVE_FILE = 'archive.json'
+
+# Sous-répertoire de l'instance, fixé par le maître gunicorn et hérité par ses workers
+INSTANCE_ENV = 'ROUTE_FINDER_METRICS_INSTANCE'
+
+# Description des compteurs (ligne # HELP)
+COUNTER_HELP = {
+    'requests_total': "Requêtes HTTP traitées, par vue, méthode et statut",
+    'route_cache_requests_total': "Consultations du cache MongoDB des itinéraires (hit / miss)",
+    'valhalla_routes_total': "Itinéraires demandés à Valhalla : obtenus (success) ou calculés en secours (fallback)",
+    'fallback_routes_total': "Itinéraires calculés par la méthode de secours",
+}
+
+STAGE_HELP = "Durée des étapes du traitement des requêtes (upstream_valhalla, upstream_nominatim, ml_prediction...)"
+
+# Processus dont le thread d'écriture est lancé (un nouveau est nécessaire après un fork)
+_flusher_pid = None
+_flusher_lock = threading.Lock()
+
+# Vrai une fois les métriques du processus archivées : plus aucune écriture de
+# son fichier, qui serait sinon compté une seconde fois
+_retired = False
+_flush_lock = threading.Lock()
+
+
+def _directory():
+    instance = os.environ.get(INSTANCE_ENV)
+    return os.path.join(settings.METRICS_DIR, instance) if instance else settings.METRICS_DIR
+
+
+def _worker_file(pid):
+    return os.path.join(_directory(), f"{pid}.json")
+
+
+def _process_alive(pid):
+    if os.name == 'nt':
+        # Sous Windows, le signal 0 est CTRL_C_EVENT : pas de vérification
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Processus d'un autre utilisateur
+        return True
+    return True
+
+
+def local_state():
+    """
+    État des métriques de ce processus, sérialisable en JSON
+    """
+    return {
+        'counters': [
+            [name, [list(label) for label in labels], value]
+            for (name, labels), value in counters().items()
+        ],
+        'histograms': stage_histograms(),
+    }
+
+
+def _merge(states):
+    """
+    Additionne des états de métriques (compteurs et intervalles des histogrammes)
+    """
+    totals = {}
+    histograms = {}
+    for state in states:
+        for name, labels, value in state['counters']:
+            key = (name, tuple(tuple(label) for label in labels))
+            totals[key] = totals.get(key, 0) + value
+        for stage, histogram in state['histograms'].items():
+            total = histograms.get(stage)
+            if total is None:
+                histograms[stage] = {
+                    'buckets': [list(bucket) for bucket in histogram['buckets']],
+                    'count': histogram['count'],
+                    'sum': histogram['sum'],
+                }
+                continue
+            for bucket, (_, count) in zip(total['buckets'], histogram['buckets']):
+                bucket[1] += count
+            total['count'] += histogram['count']
+            total['sum'] += histogram['sum']
+    return {
+        'counters': [[name, [list(label) for label in labels], value] for (name, labels), value in totals.items()],
+        'histograms': histograms,
+    }
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("Fichier de métriques illisible %s: %s", path, e)
+        return None
+
+
+def _write(path, state):
+    # Écriture dans un fichier temporaire puis renommage : un lecteur ne voit
+    # jamais de fichier à moitié écrit
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, 'w') as f:
+        json.dump(state, f)
+    os.replace(temporary, path)
+
+
+@contextmanager
+def _directory_lock(exclusive):
+    """
+    Verrou du répertoire : exclut la lecture de l'ensemble des fichiers pendant
+    qu'un fichier de worker est déplacé dans l'archive (sinon compté deux fois)
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(_directory(), '.lock'), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def flush():
+    """
+    Écrit l'état des métriques de ce processus dans son fichier
+    """
+    with _flush_lock:
+        if _retired:
+            return
+        try:
+            os.makedirs(_directory(), exist_ok=True)
+            _write(_worker_file(os.getpid()), local_state())
+        except OSError as e:
+            logger.warning("Écriture des métriques impossible: %s", e)
+
+
+def _flush_periodically(interval):
+    while True:
+        time.sleep(interval)
+        flush()
+
+
+def start_flusher():
+    """
+    Lance, une fois par processus, le thread qui écrit ses métriques toutes les
+    METRICS_FLUSH_INTERVAL secondes (appelé à chaque requête)
+    """
+    global _flusher_pid
+    pid = os.getpid()
+    if _flusher_pid == pid:
+        return
+    with _flusher_lock:
+        if _flusher_pid == pid:
+            return
+        interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+        threading.Thread(
+            target=_flush_periodically, args=(interval,), name='metrics-flusher', daemon=True
+        ).start()
+        _flusher_pid = pid
+
+
+def retire(pid=None):
+    """
+    Fusionne dans l'archive les métriques d'un worker qui s'arrête
+
+    Args:
+        pid: Worker terminé (hook child_exit du maître) ; None pour le processus
+            courant, dont l'état est d'abord écrit (hook worker_exit)
+    """
+    global _retired
+    if pid is None:
+        pid = os.getpid()
+        flush()
+        with _flush_lock:
+            _retired = True
+    try:
+        with _directory_lock(exclusive=True):
+            state = _read(_worker_file(pid))
+            if state is None:
+                return
+            archive_path = os.path.join(_directory(), ARCHIVE_FILE)
+            archive = _read(archive_path)
+            _write(archive_path, _merge([archive, state]) if archive else state)
+            os.remove(_worker_file(pid))
+    except OSError as e:
+        logger.warning("Archivage des métriques du worker %s impossible: %s", pid, e)
+
+
+def start_instance():
+    """
+    Attribue au maître gunicorn (et à ses futurs workers) un répertoire de
+    métriques vide, propre à l'instance
+    """
+    os.environ[INSTANCE_ENV] = f"gunicorn-{os.getpid()}"
+    remove_instance()
+
+
+def remove_instance():
+    """
+    Supprime le répertoire de métriques de l'instance (arrêt du maître gunicorn)
+    """
+    if os.environ.get(INSTANCE_ENV):
+        shutil.rmtree(_directory(), ignore_errors=True)
+
+
+def collect():
+    """
+    Métriques additionnées sur tous les workers de la machine
+    """
+    states = [local_state()]
+    directory = _directory()
+    own_file = f"{os.getpid()}.json"
+    # Sous gunicorn, le fichier d'un worker arrêté est archivé par le maître
+    archived = bool(os.environ.get(INSTANCE_ENV))
+    if os.path.isdir(directory):
+        with _directory_lock(exclusive=False):
+            for name in os.listdir(directory):
+                if not name.endswith('.json') or name == own_file:
+                    continue
+                path = os.path.join(directory, name)
+                pid = name[:-len('.json')]
+                if not archived and pid.isdigit() and not _process_alive(int(pid)):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                    continue
+                state = _read(path)
+                if state is not None:
+                    states.append(state)
+    return _merge(states)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{label}="{_escape(value)}"' for label, value in labels) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(state):
+    """
+    Met un état de métriques au format texte d'exposition de Prometheus
+    """
+    lines = []
+    by_name = {}
+    for name, labels, value in state['counters']:
+        by_name.setdefault(name, []).append((labels, value))
+    for name in sorted(by_name):
+        metric = f"{NAMESPACE}_{name}"
+        if name in COUNTER_HELP:
+            lines.append(f"# HELP {metric} {COUNTER_HELP[name]}")
+        lines.append(f"# TYPE {metric} counter")
+        for labels, value in sorted(by_name[name]):
+            lines.append(f"{metric}{_labels(labels)} {_number(value)}")
+
+    if state['histograms']:
+        metric = f"{NAMESPACE}_stage_duration_seconds"
+        lines.append(f"# HELP {metric} {STAGE_HELP}")
+        lines.append(f"# TYPE {metric} histogram")
+        for stage in sorted(state['histograms']):
+            histogram = state['histograms'][stage]
+            for bound, count in histogram['buckets']:
+                le = bound if bound == '+Inf' else _number(float(bound))
+                lines.append(f"{metric}_bucket{_labels([('stage', stage), ('le', le)])} {count}")
+            lines.append(f"{metric}_sum{_labels([('stage', stage)])} {_number(float(histogram['sum']))}")
+            lines.append(f"{metric}_count{_labels([('stage', stage)])} {histogram['count']}")
+    return '\n'.join(lines) + '\n'
+
+
+def exposition():
+    """
+    Texte de la réponse de /metrics/
+    """
+    return render(collect())
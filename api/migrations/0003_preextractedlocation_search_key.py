@@ -0,0 +1,91 @@
+from django.db import migrations, models
+
+from api.normalization import normalize_search_key
+
+FTS_TABLE = 'api_preextractedlocation_fts'
+
+
+def fts_sql(column):
+    """
+    Table FTS5 et triggers de synchronisation indexant la colonne donnée
+    """
+    return [
+        f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+        f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+        f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+        f"DROP TABLE IF EXISTS {FTS_TABLE}",
+        f"""
+        CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+            {column},
+            content='api_preextractedlocation',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+        """,
+        f"""
+        CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON api_preextractedlocation BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, {column}) VALUES (new.id, new.{column});
+        END
+        """,
+        f"""
+        CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON api_preextractedlocation BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {column}) VALUES ('delete', old.id, old.{column});
+        END
+        """,
+        f"""
+        CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON api_preextractedlocation BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {column}) VALUES ('delete', old.id, old.{column});
+            INSERT INTO {FTS_TABLE}(rowid, {column}) VALUES (new.id, new.{column});
+        END
+        """,
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+    ]
+
+
+def populate_search_keys(apps, schema_editor):
+    PreExtractedLocation = apps.get_model('api', 'PreExtractedLocation')
+    batch = []
+    for location in PreExtractedLocation.objects.only('id', 'name').iterator(chunk_size=2000):
+        location.search_key = normalize_search_key(location.name)
+        batch.append(location)
+        if len(batch) >= 2000:
+            PreExtractedLocation.objects.bulk_update(batch, ['search_key'])
+            batch = []
+    if batch:
+        PreExtractedLocation.objects.bulk_update(batch, ['search_key'])
+
+
+def index_search_key_fts(apps, schema_editor):
+    # La recherche FTS5 porte désormais sur la clé normalisée
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in fts_sql('search_key'):
+        schema_editor.execute(sql)
+
+
+def index_name_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in fts_sql('name'):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_preextractedlocation_fts'),
+    ]
+
+    # Sous SQLite, AddField/RemoveField recréent la table et suppriment ses
+    # triggers : la table FTS5 est donc recréée après chaque modification
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, index_name_fts),
+        migrations.AddField(
+            model_name='preextractedlocation',
+            name='search_key',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=500),
+        ),
+        migrations.RunPython(populate_search_keys, migrations.RunPython.noop),
+        migrations.RunPython(index_search_key_fts, migrations.RunPython.noop),
+    ]
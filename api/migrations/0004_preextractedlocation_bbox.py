@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_preextractedlocation_search_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='preextractedlocation',
+            name='bbox',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
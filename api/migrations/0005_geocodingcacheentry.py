@@ -0,0 +1,20 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_preextractedlocation_bbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodingCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query_key', models.CharField(max_length=600, unique=True)),
+                ('results', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
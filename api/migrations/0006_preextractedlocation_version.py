@@ -0,0 +1,57 @@
+from django.db import migrations
+
+# Compteur de modifications de la table des lieux, incrémenté par des triggers
+# à chaque insertion, modification ou suppression (QuerySet.update() et
+# modifications hors de Django comprises) : les workers comparent sa valeur
+# pour savoir si leurs index en mémoire sont à jour (api/location_store.py)
+VERSION_TABLE = 'api_preextractedlocation_version'
+
+CREATE_SQL = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {VERSION_TABLE} (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )
+    """,
+    f"INSERT OR IGNORE INTO {VERSION_TABLE}(id, version) VALUES (1, 0)",
+] + [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {VERSION_TABLE}_{suffix} AFTER {event} ON api_preextractedlocation BEGIN
+        UPDATE {VERSION_TABLE} SET version = version + 1 WHERE id = 1;
+    END
+    """
+    for suffix, event in (('ai', 'INSERT'), ('au', 'UPDATE'), ('ad', 'DELETE'))
+]
+
+DROP_SQL = [
+    f"DROP TRIGGER IF EXISTS {VERSION_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {VERSION_TABLE}_au",
+    f"DROP TRIGGER IF EXISTS {VERSION_TABLE}_ad",
+    f"DROP TABLE IF EXISTS {VERSION_TABLE}",
+]
+
+
+def create_version_table(apps, schema_editor):
+    # Comme la table FTS5, le compteur n'existe que sous SQLite
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in CREATE_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_version_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_geocodingcacheentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_version_table, drop_version_table),
+    ]
@@ -2,11 +2,15 @@
 Module pour l'intégration du modèle de machine learning
 Version simplifiée sans modèle ML pour éviter les erreurs I/O
 """
+import logging
 import os
+from .instrumentation import timed
 from .utils import RoutingService, TrafficDataService
 from datetime import datetime
 import math
 
+logger = logging.getLogger(__name__)
+
 class MLIntegration:
     """
     Classe pour l'intégration du modèle de machine learning
@@ -17,7 +21,7 @@ class MLIntegration:
         Initialise l'intégration sans charger le modèle ML
         """
         self.model_loaded = False
-        print("MLIntegration initialisé en mode heuristique (sans modèle ML)")
+        logger.debug("MLIntegration initialisé en mode heuristique (sans modèle ML)")
     
     def predict_optimal_route(self, start_point, end_point):
         """
@@ -31,60 +35,77 @@ class MLIntegration:
         Returns:
             Dictionnaire avec les informations de l'itinéraire optimisé
         """
-        # Obtenir l'heure et le jour actuels
-        current_hour = datetime.now().hour
-        current_day = datetime.now().weekday()
-        
         try:
             # Calculer l'itinéraire de base avec l'API OSRM
             route = RoutingService.get_route(start_point, end_point)
-            
-            # Obtenir les facteurs d'ajustement
-            traffic_factor = TrafficDataService.get_traffic_factor(None, current_hour)
-            road_type_factor = TrafficDataService.get_road_type_factor(route['path'])
-            
-            # LOGIQUE CORRIGÉE : Calcul cohérent de la durée finale
-            # 1. Calculer une durée de base réaliste
-            base_duration = self._calculate_realistic_base_duration(route['distance'])
-            
-            # 2. Appliquer le facteur de trafic
-            # traffic_factor > 1 = trafic dense = plus lent
-            # traffic_factor < 1 = trafic fluide = plus rapide
-            duration_with_traffic = base_duration * traffic_factor
-            
-            # 3. Appliquer le facteur de type de route
-            # road_type_factor > 1 = route rapide = temps réduit
-            # road_type_factor < 1 = route lente = temps augmenté
-            final_duration = duration_with_traffic / road_type_factor
-            
-            # 4. Validation et limites de sécurité
-            final_duration = self._validate_duration(final_duration, route['distance'])
-            
-            # Mettre à jour la durée prédite
-            route['duration'] = final_duration
-            route['traffic_factor'] = traffic_factor
-            route['road_type_factor'] = road_type_factor
-            
-            # Formatage du temps en minutes et secondes
-            minutes = int(route['duration'] // 60)
-            seconds = int(route['duration'] % 60)
-            route['duration_text'] = f"{minutes} min {seconds:02d} sec"
-            
-            # Ajouter des informations de debug
-            route['debug_info'] = {
-                'base_duration_sec': base_duration,
-                'duration_with_traffic_sec': duration_with_traffic,
-                'final_duration_sec': final_duration,
-                'average_speed_kmh': round((route['distance'] / 1000) / (final_duration / 3600), 1),
-                'calculation_method': 'heuristic'
-            }
-            
-            return route
+            with timed('ml_prediction'):
+                return self._adjust_route(route)
         except Exception as e:
-            print(f"Erreur lors de la prédiction de l'itinéraire optimal: {e}")
+            logger.exception("Erreur lors de la prédiction de l'itinéraire optimal: %s", e)
             # En cas d'erreur, utiliser le service de routage standard
             return RoutingService.get_route(start_point, end_point)
     
+    async def apredict_optimal_route(self, start_point, end_point):
+        """
+        Version asynchrone de predict_optimal_route
+        """
+        try:
+            route = await RoutingService.aget_route(start_point, end_point)
+            with timed('ml_prediction'):
+                return self._adjust_route(route)
+        except Exception as e:
+            logger.exception("Erreur lors de la prédiction de l'itinéraire optimal: %s", e)
+            return await RoutingService.aget_route(start_point, end_point)
+    
+    def _adjust_route(self, route):
+        """
+        Remplace la durée de l'itinéraire par la prédiction heuristique
+        """
+        # Obtenir l'heure actuelle
+        current_hour = datetime.now().hour
+        
+        # Obtenir les facteurs d'ajustement
+        traffic_factor = TrafficDataService.get_traffic_factor(None, current_hour)
+        road_type_factor = TrafficDataService.get_road_type_factor(route['path'])
+        
+        # LOGIQUE CORRIGÉE : Calcul cohérent de la durée finale
+        # 1. Calculer une durée de base réaliste
+        base_duration = self._calculate_realistic_base_duration(route['distance'])
+        
+        # 2. Appliquer le facteur de trafic
+        # traffic_factor > 1 = trafic dense = plus lent
+        # traffic_factor < 1 = trafic fluide = plus rapide
+        duration_with_traffic = base_duration * traffic_factor
+        
+        # 3. Appliquer le facteur de type de route
+        # road_type_factor > 1 = route rapide = temps réduit
+        # road_type_factor < 1 = route lente = temps augmenté
+        final_duration = duration_with_traffic / road_type_factor
+        
+        # 4. Validation et limites de sécurité
+        final_duration = self._validate_duration(final_duration, route['distance'])
+        
+        # Mettre à jour la durée prédite
+        route['duration'] = final_duration
+        route['traffic_factor'] = traffic_factor
+        route['road_type_factor'] = road_type_factor
+        
+        # Formatage du temps en minutes et secondes
+        minutes = int(route['duration'] // 60)
+        seconds = int(route['duration'] % 60)
+        route['duration_text'] = f"{minutes} min {seconds:02d} sec"
+        
+        # Ajouter des informations de debug
+        route['debug_info'] = {
+            'base_duration_sec': base_duration,
+            'duration_with_traffic_sec': duration_with_traffic,
+            'final_duration_sec': final_duration,
+            'average_speed_kmh': round((route['distance'] / 1000) / (final_duration / 3600), 1),
+            'calculation_method': 'heuristic'
+        }
+        
+        return route
+    
     def _calculate_realistic_base_duration(self, distance):
         """
         Calcule une durée de base réaliste basée sur la distance
@@ -137,7 +158,7 @@ class MLIntegration:
         if abs(validated_duration - duration) > 10:  # Plus de 10 secondes de différence
             original_speed = (distance / 1000) / (duration / 3600)
             new_speed = (distance / 1000) / (validated_duration / 3600)
-            print(f"Durée ajustée: {original_speed:.1f} km/h -> {new_speed:.1f} km/h")
+            logger.debug("Durée ajustée: %.1f km/h -> %.1f km/h", original_speed, new_speed)
         
         return validated_duration
 
@@ -1,5 +1,8 @@
 """
 Module pour générer des données d'entraînement pour le modèle de machine learning
+
+Usage (depuis la racine du projet) :
+    python -m api.ml_model.data_generator
 """
 import numpy as np
 import pandas as pd
@@ -8,6 +11,8 @@ import math
 import os
 from datetime import datetime, timedelta
 
+from ..geodesy import haversine
+
 class DataGenerator:
     """
     Classe pour générer des données d'entraînement pour le modèle de machine learning
@@ -50,15 +55,17 @@ class DataGenerator:
         """
         data = []
         
+        # Générer deux points aléatoires par échantillon
+        points = np.array([
+            self.generate_random_point() + self.generate_random_point()
+            for _ in range(num_samples)
+        ]).reshape(-1, 4)
+        
+        # Distances à vol d'oiseau de tous les échantillons, en une opération
+        distances = haversine(points[:, 1], points[:, 0], points[:, 3], points[:, 2])
+        
         # Générer des données pour différentes heures de la journée
-        for _ in range(num_samples):
-            # Générer deux points aléatoires
-            start_lat, start_lon = self.generate_random_point()
-            end_lat, end_lon = self.generate_random_point()
-            
-            # Calculer la distance à vol d'oiseau
-            distance = self.haversine_distance(start_lat, start_lon, end_lat, end_lon)
-            
+        for (start_lat, start_lon, end_lat, end_lon), distance in zip(points.tolist(), distances.tolist()):
             # Heure aléatoire de la journée
             hour = random.randint(0, 23)
             
@@ -77,7 +84,7 @@ class DataGenerator:
             speed = 50 / traffic_factor
             
             # Durée du trajet (en minutes)
-            duration = (distance / 1000) / speed * 60
+            duration = distance / 1000 / speed * 60
             
             # Ajouter un peu de bruit aléatoire
             duration = duration * random.uniform(0.9, 1.1)
@@ -117,29 +124,6 @@ class DataGenerator:
         
         return df
 
-    def haversine_distance(self, lat1, lon1, lat2, lon2):
-        """
-        Calcule la distance à vol d'oiseau entre deux points en mètres
-        """
-        R = 6371000  # Rayon de la Terre en mètres
-        
-        # Conversion en radians
-        lat1_rad = math.radians(lat1)
-        lon1_rad = math.radians(lon1)
-        lat2_rad = math.radians(lat2)
-        lon2_rad = math.radians(lon2)
-        
-        # Différence de latitude et longitude
-        dlat = lat2_rad - lat1_rad
-        dlon = lon2_rad - lon1_rad
-        
-        # Formule de Haversine
-        a = math.sin(dlat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon/2)**2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        distance = R * c
-        
-        return distance
-
 if __name__ == "__main__":
     # Générer des données d'entraînement
     # Utiliser un chemin absolu pour éviter les problèmes de chemin relatif
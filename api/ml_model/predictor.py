@@ -5,7 +5,8 @@ import joblib
 import os
 import numpy as np
 from datetime import datetime
-import math
+
+from ..geodesy import turn_angles
 
 class RoutePredictor:
     """
@@ -181,39 +182,10 @@ class RoutePredictor:
         if len(path) < 3:
             return 0
         
-        complexity = 0
-        
-        # Calculer les angles entre les segments consécutifs
-        for i in range(1, len(path) - 1):
-            # Calculer les vecteurs entre les points
-            v1 = [path[i][0] - path[i-1][0], path[i][1] - path[i-1][1]]
-            v2 = [path[i+1][0] - path[i][0], path[i+1][1] - path[i][1]]
-            
-            # Normaliser les vecteurs
-            v1_norm = math.sqrt(v1[0]**2 + v1[1]**2)
-            v2_norm = math.sqrt(v2[0]**2 + v2[1]**2)
-            
-            if v1_norm == 0 or v2_norm == 0:
-                continue
-            
-            v1 = [v1[0]/v1_norm, v1[1]/v1_norm]
-            v2 = [v2[0]/v2_norm, v2[1]/v2_norm]
-            
-            # Calculer le produit scalaire
-            dot_product = v1[0]*v2[0] + v1[1]*v2[1]
-            
-            # Limiter le produit scalaire à [-1, 1] pour éviter les erreurs numériques
-            dot_product = max(-1, min(1, dot_product))
-            
-            # Calculer l'angle en radians
-            angle = math.acos(dot_product)
-            
-            # Convertir en degrés
-            angle_deg = math.degrees(angle)
-            
-            # Ajouter à la complexité si l'angle est significatif (> 20 degrés)
-            if angle_deg > 20:
-                complexity += angle_deg / 90.0  # Normaliser par rapport à un virage à 90 degrés
+        # Changements de cap entre segments consécutifs, en degrés
+        angles = turn_angles(path)
         
-        return complexity
+        # Seuls les virages significatifs (> 20 degrés) comptent, normalisés
+        # par rapport à un virage à 90 degrés
+        return float(angles[angles > 20].sum() / 90.0)
 
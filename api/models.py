@@ -1,8 +1,14 @@
+import asyncio
+import weakref
 from django.db import models
-from pymongo import MongoClient
+from pymongo import AsyncMongoClient, MongoClient, UpdateOne
 from django.conf import settings
 import json
 from datetime import datetime
+from .instrumentation import timed
+from .normalization import normalize_search_key
+from .route_cache import point_key
+from .simplification import simplify_levels
 
 # Connexion à MongoDB
 client = MongoClient(settings.MONGODB_URI)
@@ -13,6 +19,19 @@ locations_collection = db['locations']
 routes_collection = db['routes']
 traffic_data_collection = db['traffic_data']
 
+# Clients asynchrones par boucle d'événements (vues asynchrones du mode ASGI)
+_async_clients = weakref.WeakKeyDictionary()
+
+def get_async_collection(name):
+    """
+    Retourne la collection `name` via le client AsyncMongoClient de la boucle courante
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = AsyncMongoClient(settings.MONGODB_URI)
+    return client[settings.MONGODB_NAME][name]
+
 class PreExtractedLocation(models.Model):
     """
     Modèle pour stocker les lieux pré-extraits de Fès depuis OpenStreetMap
@@ -21,6 +40,10 @@ class PreExtractedLocation(models.Model):
     longitude = models.FloatField()
     latitude = models.FloatField()
     location_type = models.CharField(max_length=100, null=True, blank=True)
+    # Nom normalisé (sans accents ni casse, arabe normalisé) calculé à l'import
+    search_key = models.CharField(max_length=500, db_index=True, blank=True, default='')
+    # Emprise [min_lon, min_lat, max_lon, max_lat] des rues issues de la fusion des tronçons
+    bbox = models.JSONField(null=True, blank=True)
     
     # Index pour améliorer les performances de recherche
     class Meta:
@@ -32,11 +55,26 @@ class PreExtractedLocation(models.Model):
     def __str__(self):
         return f"{self.name} ({self.location_type})"
     
+    def save(self, *args, **kwargs):
+        self.search_key = normalize_search_key(self.name)
+        super().save(*args, **kwargs)
+    
     @property
     def coordinates(self):
         """Retourne les coordonnées au format [longitude, latitude]"""
         return [self.longitude, self.latitude]
 
+class GeocodingCacheEntry(models.Model):
+    """
+    Résultats de géocodage distant (Nominatim) mis en cache, indexés par requête normalisée
+    """
+    query_key = models.CharField(max_length=600, unique=True)
+    results = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return self.query_key
+
 class MongoDBManager:
     """
     Gestionnaire pour les opérations MongoDB
@@ -78,27 +116,24 @@ class MongoDBManager:
         }))
     
     @staticmethod
-    def save_route(start_point, end_point, path, distance, duration, duration_text=''):
+    def route_key(start_point, end_point):
         """
-        Enregistre un itinéraire dans MongoDB
-        
-        Args:
-            start_point: Point de départ [longitude, latitude]
-            end_point: Point d'arrivée [longitude, latitude]
-            path: Liste de coordonnées [[lon1, lat1], [lon2, lat2], ...]
-            distance: Distance en mètres
-            duration: Durée en secondes
-            duration_text: Durée formatée en texte (ex: "5 min 30 sec")
+        Identifiant d'un itinéraire entre deux points [longitude, latitude]
+
+        Les points sont rattachés à une grille ou au graphe routier
+        (ROUTE_CACHE_SNAP, api/route_cache.py) : des points voisins partagent
+        le même itinéraire en cache.
         """
-        # Convertir les points en chaînes pour éviter l'erreur "cannot index parallel arrays"
+        # Points convertis en chaînes pour éviter l'erreur "cannot index parallel arrays"
+        return f"{point_key(start_point)}_to_{point_key(end_point)}"
+    
+    @staticmethod
+    def _route_document(start_point, end_point, path, distance, duration, duration_text=''):
         start_point_str = f"{start_point[0]},{start_point[1]}"
         end_point_str = f"{end_point[0]},{end_point[1]}"
         
-        # Créer un identifiant unique pour l'itinéraire
-        route_id = f"{start_point_str}_to_{end_point_str}"
-        
-        route_data = {
-            'route_id': route_id,
+        return {
+            'route_id': MongoDBManager.route_key(start_point, end_point),
             'start_point_str': start_point_str,
             'end_point_str': end_point_str,
             'start_point_lon': start_point[0],
@@ -106,42 +141,141 @@ class MongoDBManager:
             'end_point_lon': end_point[0],
             'end_point_lat': end_point[1],
             'path': path,
+            # Tracés simplifiés par zoom : servis sans recalcul aux requêtes avec `zoom`
+            'simplified_paths': MongoDBManager._simplified_paths(path),
             'distance': distance,
             'duration': duration,
             'duration_text': duration_text,
             'created_at': datetime.now()
         }
+    
+    @staticmethod
+    def _simplified_paths(path):
+        with timed('simplification'):
+            return simplify_levels(path, settings.ROUTE_SIMPLIFICATION_ZOOMS)
+    
+    @staticmethod
+    def save_route(start_point, end_point, path, distance, duration, duration_text=''):
+        """
+        Enregistre un itinéraire dans MongoDB
+        
+        Args:
+            start_point: Point de départ [longitude, latitude]
+            end_point: Point d'arrivée [longitude, latitude]
+            path: Liste de coordonnées [[lon1, lat1], [lon2, lat2], ...]
+            distance: Distance en mètres
+            duration: Durée en secondes
+            duration_text: Durée formatée en texte (ex: "5 min 30 sec")
+        """
+        route_data = MongoDBManager._route_document(
+            start_point, end_point, path, distance, duration, duration_text
+        )
         
         # Utiliser upsert pour éviter les doublons
-        return routes_collection.update_one(
-            {'route_id': route_id},
-            {'$set': route_data},
-            upsert=True
-        ).upserted_id
+        with timed('mongo_write'):
+            return routes_collection.update_one(
+                {'route_id': route_data['route_id']},
+                {'$set': route_data},
+                upsert=True
+            ).upserted_id
+    
+    @staticmethod
+    def save_routes(routes):
+        """
+        Enregistre plusieurs itinéraires en une seule écriture groupée
+        
+        Args:
+            routes: Liste de dictionnaires au format de RoutingService.get_route
+        """
+        operations = []
+        for route in routes:
+            route_data = MongoDBManager._route_document(
+                route['start_point'], route['end_point'], route['path'],
+                route['distance'], route['duration'], route.get('duration_text', '')
+            )
+            operations.append(UpdateOne({'route_id': route_data['route_id']}, {'$set': route_data}, upsert=True))
+        
+        if not operations:
+            return None
+        # Écritures non ordonnées : un échec n'interrompt pas les suivantes
+        with timed('mongo_write'):
+            return routes_collection.bulk_write(operations, ordered=False)
+    
+    @staticmethod
+    def _with_points(route):
+        # Reconstruire les points à partir des coordonnées stockées
+        route['start_point'] = [route['start_point_lon'], route['start_point_lat']]
+        route['end_point'] = [route['end_point_lon'], route['end_point_lat']]
+        return route
     
     @staticmethod
     def find_route(start_point, end_point):
         """
         Recherche un itinéraire existant entre deux points
         """
-        # Convertir les points en chaînes pour la recherche
-        start_point_str = f"{start_point[0]},{start_point[1]}"
-        end_point_str = f"{end_point[0]},{end_point[1]}"
+        with timed('cache_lookup'):
+            route = routes_collection.find_one({
+                'route_id': MongoDBManager.route_key(start_point, end_point)
+            })
+        
+        if route:
+            MongoDBManager._with_points(route)
         
-        # Créer un identifiant unique pour l'itinéraire
-        route_id = f"{start_point_str}_to_{end_point_str}"
+        return route
+    
+    @staticmethod
+    def find_routes(pairs):
+        """
+        Recherche en une requête les itinéraires existants pour plusieurs paires de points
         
-        route = routes_collection.find_one({
-            'route_id': route_id
-        })
+        Args:
+            pairs: Liste de couples (start_point, end_point)
+        
+        Returns:
+            Dictionnaire {route_key: itinéraire} des itinéraires trouvés
+        """
+        keys = list({MongoDBManager.route_key(start, end) for start, end in pairs})
+        if not keys:
+            return {}
+        
+        with timed('cache_lookup'):
+            return {
+                route['route_id']: MongoDBManager._with_points(route)
+                for route in routes_collection.find({'route_id': {'$in': keys}})
+            }
+    
+    @staticmethod
+    async def afind_route(start_point, end_point):
+        """
+        Version asynchrone de find_route
+        """
+        with timed('cache_lookup'):
+            route = await get_async_collection('routes').find_one({
+                'route_id': MongoDBManager.route_key(start_point, end_point)
+            })
         
         if route:
-            # Reconstruire les points à partir des coordonnées stockées
-            route['start_point'] = [route['start_point_lon'], route['start_point_lat']]
-            route['end_point'] = [route['end_point_lon'], route['end_point_lat']]
+            MongoDBManager._with_points(route)
         
         return route
     
+    @staticmethod
+    async def asave_route(start_point, end_point, path, distance, duration, duration_text=''):
+        """
+        Version asynchrone de save_route
+        """
+        route_data = MongoDBManager._route_document(
+            start_point, end_point, path, distance, duration, duration_text
+        )
+        
+        with timed('mongo_write'):
+            result = await get_async_collection('routes').update_one(
+                {'route_id': route_data['route_id']},
+                {'$set': route_data},
+                upsert=True
+            )
+        return result.upserted_id
+    
     @staticmethod
     def save_traffic_data(segment, timestamp, speed, congestion_level):
         """
@@ -0,0 +1,42 @@
+"""
+Normalisation des noms de lieux pour la recherche
+
+Les noms OSM de Fès mélangent français, arabe et translittérations. La clé de
+recherche supprime ce qui ne doit pas empêcher une correspondance :
+diacritiques, casse, variantes orthographiques de l'arabe et ponctuation.
+"""
+import re
+import unicodedata
+
+# Variantes de lettres arabes ramenées à une forme canonique. Les hamzas
+# (أ إ آ ؤ ئ) et les voyelles courtes sont déjà traitées par la décomposition
+# NFKD suivie de la suppression des caractères combinants.
+ARABIC_TRANSLATION = str.maketrans({
+    'ٱ': 'ا',   # alif wasla
+    'ى': 'ي',   # alif maqsura
+    'ی': 'ي',   # ya persan
+    'ة': 'ه',   # ta marbuta
+    'ک': 'ك',   # kaf persan
+    'گ': 'ك',
+    'ڤ': 'ف',   # ve (translittérations maghrébines)
+    'ـ': None,  # tatweel
+    **{chr(0x0660 + digit): str(digit) for digit in range(10)},  # chiffres arabes-indiens
+    **{chr(0x06F0 + digit): str(digit) for digit in range(10)},  # chiffres persans
+})
+
+SEPARATORS = re.compile(r'[\W_]+')
+
+
+def normalize_search_key(text):
+    """
+    Calcule la clé de recherche d'un nom ou d'une requête
+
+    Exemple: "Bāb Bou-Jeloud" -> "bab bou jeloud", "باب بوجلود" -> "باب بوجلود"
+    """
+    if not text:
+        return ''
+
+    decomposed = unicodedata.normalize('NFKD', text)
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    folded = stripped.casefold().translate(ARABIC_TRANSLATION)
+    return SEPARATORS.sub(' ', folded).strip()
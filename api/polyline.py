@@ -0,0 +1,69 @@
+"""
+Encodage et décodage vectorisés des polylines (format Google, précision 6 pour Valhalla)
+
+Chaque coordonnée est codée par l'écart à la précédente, multiplié par
+10^precision, en groupes de 5 bits (bit 0x20 : un groupe suit) décalés de 63.
+Les boucles caractère par caractère sont remplacées par des opérations NumPy
+sur tout le tableau d'octets.
+"""
+import numpy as np
+
+# Groupes de 5 bits au plus par valeur (écarts jusqu'à 2^35 / 10^precision)
+MAX_CHUNKS = 7
+
+
+def decode(encoded, precision=6):
+    """
+    Décode une polyline
+
+    Returns:
+        Tableau (N, 2) de [longitude, latitude]
+
+    Raises:
+        ValueError: Chaîne tronquée ou caractère invalide
+    """
+    data = np.frombuffer(encoded.encode('ascii'), dtype=np.uint8).astype(np.int64) - 63
+    if len(data) == 0:
+        return np.empty((0, 2))
+    if data.min() < 0 or data.max() > 0x3f:
+        raise ValueError("Caractère hors de l'alphabet des polylines")
+
+    # Dernier groupe de chaque valeur : bit de continuation absent
+    last = data < 0x20
+    if not last[-1]:
+        raise ValueError("Polyline tronquée")
+    starts = np.flatnonzero(np.concatenate(([True], last[:-1])))
+    if len(starts) % 2:
+        raise ValueError("Nombre impair de valeurs")
+
+    # Rang de chaque groupe dans sa valeur, puis assemblage des groupes par OU binaire
+    value_index = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(data))))
+    shifts = 5 * (np.arange(len(data)) - starts[value_index])
+    values = np.bitwise_or.reduceat((data & 0x1f) << shifts, starts)
+
+    # Décodage zigzag des écarts, puis cumul : (latitude, longitude) par point
+    deltas = (values >> 1) ^ -(values & 1)
+    points = np.cumsum(deltas.reshape(-1, 2), axis=0)
+    return points[:, ::-1] / (10 ** precision)
+
+
+def encode(coordinates, precision=6):
+    """
+    Encode une liste ou un tableau de [longitude, latitude]
+    """
+    points = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    if len(points) == 0:
+        return ''
+
+    # Écarts entiers (latitude, longitude) successifs, arrondis comme round()
+    scaled = np.round(points[:, ::-1] * (10 ** precision)).astype(np.int64)
+    deltas = np.diff(scaled, axis=0, prepend=0).ravel()
+    values = (deltas << 1) ^ (deltas >> 63)
+
+    # Groupes de 5 bits de chaque valeur, bit de continuation sauf sur le dernier
+    chunks = (values[:, None] >> (5 * np.arange(MAX_CHUNKS))) & 0x1f
+    remaining = values[:, None] >> (5 * np.arange(1, MAX_CHUNKS + 1))
+    used = np.concatenate((np.ones((len(values), 1), dtype=bool), remaining[:, :-1] > 0), axis=1)
+    chunks |= np.where(remaining > 0, 0x20, 0)
+
+    return (chunks[used] + 63).astype(np.uint8).tobytes().decode('ascii')
@@ -0,0 +1,15 @@
+"""
+Rendus des réponses de l'API
+"""
+from rest_framework.renderers import JSONRenderer
+
+from .instrumentation import timed
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """
+    Rendu JSON de DRF dont la durée est enregistrée sous l'étape 'serialization'
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed('serialization'):
+            return super().render(data, accepted_media_type, renderer_context)
@@ -0,0 +1,103 @@
+"""
+Fusion des tronçons de route extraits d'OpenStreetMap
+
+osmnx découpe chaque rue en arêtes entre intersections (dans les deux sens
+pour un réseau non orienté) : extract_locations.py produit donc une entrée
+par arête. Ce module regroupe les arêtes d'un même nom qui se touchent en
+une seule entrée par rue, avec un point représentatif et une emprise.
+"""
+
+
+def is_road_segment(location):
+    """
+    Indique si une entrée est une arête brute [[lon1, lat1], [lon2, lat2]]
+    """
+    coordinates = location.get('coordinates') or []
+    return (
+        len(coordinates) == 2
+        and all(isinstance(point, (list, tuple)) and len(point) == 2 for point in coordinates)
+    )
+
+
+def merge_road_segments(locations):
+    """
+    Fusionne les arêtes portant le même nom et reliées entre elles
+
+    Deux rues homonymes sans point commun (ex: « Rue 12 » dans deux quartiers)
+    restent distinctes. Les entrées qui ne sont pas des arêtes sont conservées
+    telles quelles.
+
+    Args:
+        locations: Liste d'entrées {'name', 'coordinates', 'type'}
+
+    Returns:
+        Liste d'entrées où chaque rue est décrite par
+        {'name', 'coordinates': [lon, lat], 'type', 'bbox': [min_lon, min_lat, max_lon, max_lat], 'segments'}
+    """
+    merged = []
+    segments_by_name = {}
+
+    for location in locations:
+        if is_road_segment(location) and location.get('name'):
+            segments_by_name.setdefault(location['name'], []).append(location)
+        else:
+            merged.append(location)
+
+    for name, segments in segments_by_name.items():
+        for component in _connected_components(segments):
+            merged.append(_merge_component(name, component))
+
+    return merged
+
+
+def _connected_components(segments):
+    """
+    Regroupe les arêtes partageant une extrémité (union-find sur les points)
+    """
+    parent = {}
+
+    def find(point):
+        root = point
+        while parent[root] != root:
+            root = parent[root]
+        while parent[point] != root:
+            parent[point], point = root, parent[point]
+        return root
+
+    for segment in segments:
+        start, end = (tuple(point) for point in segment['coordinates'])
+        parent.setdefault(start, start)
+        parent.setdefault(end, end)
+        start_root, end_root = find(start), find(end)
+        if start_root != end_root:
+            parent[end_root] = start_root
+
+    components = {}
+    for segment in segments:
+        start = tuple(segment['coordinates'][0])
+        components.setdefault(find(start), []).append(segment)
+    return list(components.values())
+
+
+def _merge_component(name, segments):
+    points = {tuple(point) for segment in segments for point in segment['coordinates']}
+    longitudes = [lon for lon, _ in points]
+    latitudes = [lat for _, lat in points]
+    bbox = [min(longitudes), min(latitudes), max(longitudes), max(latitudes)]
+
+    # Le sommet le plus proche du centre de l'emprise reste sur la rue,
+    # contrairement au centre lui-même pour une rue courbe
+    center_lon = (bbox[0] + bbox[2]) / 2
+    center_lat = (bbox[1] + bbox[3]) / 2
+    representative = min(
+        sorted(points),
+        key=lambda point: (point[0] - center_lon) ** 2 + (point[1] - center_lat) ** 2
+    )
+
+    return {
+        'name': name,
+        'coordinates': list(representative),
+        'type': segments[0].get('type') or 'highway',
+        'bbox': bbox,
+        'segments': len(segments)
+    }
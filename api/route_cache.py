@@ -0,0 +1,163 @@
+"""
+Clés du cache MongoDB des itinéraires et raccord des tracés aux points demandés
+
+Deux demandes dont les points ne diffèrent que de quelques mètres, ou d'un
+arrondi de sérialisation (-5.0 et -5.00000001), partagent le même itinéraire en
+cache : pour la clé seulement, chaque point est rattaché selon ROUTE_CACHE_SNAP à
+
+- 'grid' : la grille de ROUTE_CACHE_GRID_PRECISION décimales (4 : ~11 m en latitude, 3 : ~110 m) ;
+- 'node' : le nœud le plus proche du graphe routier local, s'il est à moins de
+  ROUTE_CACHE_NODE_RADIUS mètres (sinon, ou sans graphe, la grille) ; la clé
+  porte l'empreinte du graphe, les indices de nœuds changeant d'une extraction
+  à l'autre ;
+- 'none' : les coordonnées exactes.
+
+Un itinéraire lu dans le cache n'est utilisé que si ses points sont à moins de
+max_offset() des points demandés (fits_route). Son tracé, comme celui d'un
+itinéraire calculé pour une autre demande de la même clé, est ensuite raccordé
+aux points exacts de la demande par fit_route, qui corrige aussi distance et
+durée.
+"""
+import os
+
+from django.conf import settings
+
+from .geodesy import haversine, path_length
+
+
+def point_key(point):
+    """
+    Partie de la clé de cache correspondant à un point [longitude, latitude]
+    """
+    mode = getattr(settings, 'ROUTE_CACHE_SNAP', 'grid')
+    if mode == 'none':
+        return f"{point[0]},{point[1]}"
+    if mode == 'node' and os.path.exists(str(settings.ROAD_GRAPH_PATH)):
+        from .routing_engine import get_road_graph
+        graph = get_road_graph()
+        if graph is not None:
+            node, gap = graph.nearest_node(point[0], point[1])
+            if node is not None and gap <= getattr(settings, 'ROUTE_CACHE_NODE_RADIUS', 50):
+                return f"n{graph.fingerprint}:{node}"
+    precision = getattr(settings, 'ROUTE_CACHE_GRID_PRECISION', 4)
+    # + 0.0 : -0.0 et 0.0 donnent la même clé
+    return f"{round(point[0], precision) + 0.0:.{precision}f},{round(point[1], precision) + 0.0:.{precision}f}"
+
+
+def max_offset(latitude):
+    """
+    Écart maximal (mètres) entre deux points de même clé près de cette latitude
+
+    'grid' : la diagonale d'une cellule ; 'node' : deux fois ROUTE_CACHE_NODE_RADIUS
+    (ou la diagonale, pour les points rattachés à la grille faute de nœud proche) ;
+    'none' : aucun écart.
+    """
+    mode = getattr(settings, 'ROUTE_CACHE_SNAP', 'grid')
+    if mode == 'none':
+        return 0.0
+    cell = 10.0 ** -getattr(settings, 'ROUTE_CACHE_GRID_PRECISION', 4)
+    # Bord de la cellule le plus proche de l'équateur : le plus long en longitude
+    latitude = max(abs(latitude) - cell, 0.0)
+    diagonal = float(haversine(0.0, latitude, cell, latitude + cell))
+    if mode == 'node':
+        return max(diagonal, 2 * getattr(settings, 'ROUTE_CACHE_NODE_RADIUS', 50))
+    return diagonal
+
+
+def fits_route(route, start_point, end_point):
+    """
+    Indique si un itinéraire du cache peut servir pour ces points
+
+    Un itinéraire dont un point est plus loin que max_offset() du point demandé
+    (clé d'un ancien graphe, changement de ROUTE_CACHE_SNAP...) partirait
+    d'ailleurs : fit_route ne ferait que le relier par un long segment en ligne
+    droite. Il est traité comme absent du cache.
+    """
+    old_start, old_end = route.get('start_point'), route.get('end_point')
+    if old_start is None or old_end is None:
+        return False
+    offsets = haversine(
+        [old_start[0], old_end[0]], [old_start[1], old_end[1]],
+        [start_point[0], end_point[0]], [start_point[1], end_point[1]]
+    )
+    return bool(offsets[0] <= max_offset(start_point[1]) and offsets[1] <= max_offset(end_point[1]))
+
+
+def _fit_path(path, old_start, old_end, start_point, end_point):
+    """
+    Remplace les extrémités du tracé qui sont les anciens points demandés, et
+    ajoute les nouveaux points devant/derrière les autres (point rattaché à la
+    route par Valhalla)
+
+    Returns:
+        (tracé raccordé, portion du tracé d'origine conservée telle quelle)
+    """
+    kept = path[1:] if list(path[0]) == list(old_start) else path
+    if kept and list(path[-1]) == list(old_end):
+        kept = kept[:-1]
+    return [list(start_point)] + list(kept) + [list(end_point)], kept
+
+
+def _length_change(path, fitted, kept):
+    """
+    Différence de longueur (mètres) entre le tracé raccordé et le tracé d'origine
+
+    Seuls les segments d'extrémité changent : les raccords ajoutés comptent en
+    plus, les segments dont un ancien point demandé a été retiré en moins.
+    """
+    if len(kept) < 2:
+        # Tracé de quelques points : comparaison directe
+        return path_length(fitted) - path_length(path)
+    added = path_length([fitted[0], kept[0]]) + path_length([kept[-1], fitted[-1]])
+    removed = 0.0
+    if list(kept[0]) != list(path[0]):
+        removed += path_length([path[0], kept[0]])
+    if list(kept[-1]) != list(path[-1]):
+        removed += path_length([kept[-1], path[-1]])
+    return added - removed
+
+
+def fit_route(route, start_point, end_point):
+    """
+    Itinéraire raccordé aux points exacts de la demande
+
+    Args:
+        route: Itinéraire dont les points start_point / end_point peuvent
+            différer de ceux demandés (même clé de cache) ; un itinéraire lu
+            dans le cache a été vérifié par fits_route
+
+    Returns:
+        L'itinéraire inchangé si ses points sont ceux demandés, sinon une copie
+        dont le tracé (et ses niveaux simplifiés) part de start_point et arrive
+        à end_point ; la distance est corrigée de la longueur des raccords et
+        des segments remplacés, la durée à proportion
+    """
+    old_start, old_end = route.get('start_point'), route.get('end_point')
+    path = route.get('path')
+    if not path or old_start is None or old_end is None:
+        return route
+    if list(old_start) == list(start_point) and list(old_end) == list(end_point):
+        return route
+
+    fitted = dict(route)
+    fitted['path'], kept = _fit_path(path, old_start, old_end, start_point, end_point)
+    fitted['start_point'] = start_point
+    fitted['end_point'] = end_point
+    # La polyline de Valhalla ne correspond plus au tracé
+    fitted.pop('polyline', None)
+    if route.get('simplified_paths'):
+        fitted['simplified_paths'] = {
+            zoom: _fit_path(level, old_start, old_end, start_point, end_point)[0]
+            for zoom, level in route['simplified_paths'].items() if level
+        }
+
+    distance = route['distance']
+    new_distance = max(0.0, distance + _length_change(path, fitted['path'], kept))
+    fitted['distance'] = new_distance
+    if distance > 0:
+        duration = route['duration'] * new_distance / distance
+        minutes = int(duration // 60)
+        seconds = int(duration % 60)
+        fitted['duration'] = duration
+        fitted['duration_text'] = f"{minutes} min {seconds:02d} sec"
+    return fitted
@@ -0,0 +1,475 @@
+"""
+Moteur de calcul d'itinéraire local sur le graphe routier de Fès
+
+Le graphe carrossable est extrait une fois d'OpenStreetMap par
+`python manage.py build_road_graph` et enregistré sous forme de tableaux
+CSR contigus. Chaque worker le projette en mémoire (mmap) une seule fois, les
+pages étant partagées entre workers ; les itinéraires les plus
+rapides sont ensuite calculés en mémoire, sans appel réseau : par la hiérarchie
+de contraction si `build_contraction_hierarchy` a été exécuté, sinon par A*
+bidirectionnel.
+"""
+import hashlib
+import heapq
+import logging
+import math
+import os
+import threading
+
+import numpy as np
+from django.conf import settings
+
+from .contraction_hierarchy import ContractionHierarchy
+from .graph_storage import MappedArrays, save_arrays
+from .isochrone import grid_contours
+from .spatial_index import GridIndex
+
+logger = logging.getLogger(__name__)
+
+
+class RoadGraph:
+    """
+    Graphe routier orienté au format CSR (compressed sparse row)
+
+    Les arcs sortants du nœud v sont forward_*[forward_offsets[v]:forward_offsets[v + 1]],
+    les arcs entrants backward_*[backward_offsets[v]:backward_offsets[v + 1]].
+    Les tableaux sont projetés en mémoire depuis le fichier (voir graph_storage) :
+    un worker n'en garde aucune copie.
+    """
+    ARRAYS = (
+        'node_x', 'node_y',
+        'forward_offsets', 'forward_targets', 'forward_times', 'forward_lengths',
+        'backward_offsets', 'backward_targets', 'backward_times', 'backward_lengths',
+    )
+
+    def __init__(self, arrays):
+        """
+        Args:
+            arrays: Tableaux ARRAYS (dictionnaire ou MappedArrays) ; node_x et
+                node_y sont la longitude et la latitude des nœuds, *_times les
+                temps de parcours en secondes, *_lengths les longueurs en mètres
+        """
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+
+        # Vues memoryview : lecture élément par élément sans copie ni objet NumPy
+        self.forward = tuple(memoryview(getattr(self, f'forward_{name}')) for name in ('offsets', 'targets', 'times', 'lengths'))
+        self.backward = tuple(memoryview(getattr(self, f'backward_{name}')) for name in ('offsets', 'targets', 'times', 'lengths'))
+        self._node_x = memoryview(self.node_x)
+        self._node_y = memoryview(self.node_y)
+
+        # ContractionHierarchy associée, attachée par get_road_graph() si disponible
+        self.hierarchy = None
+        self._grid = None
+        # Empreinte enregistrée dans l'en-tête du fichier (calculée au besoin sinon)
+        self._fingerprint = getattr(arrays, 'metadata', {}).get('fingerprint')
+
+        # Vitesse maximale du graphe (m/s) : borne inférieure admissible du temps restant
+        speeds = self.forward_lengths / np.maximum(self.forward_times, 1e-3)
+        self.max_speed = float(speeds.max()) if len(speeds) else 1.0
+
+        # Projection exprimée en secondes à vitesse maximale : la distance euclidienne
+        # entre deux nœuds est alors directement une borne du temps de parcours
+        # (marge de 1 % pour l'écart entre projection et géodésique)
+        mean_lat = float(self.node_y.mean()) if len(self.node_y) else 0.0
+        self._time_y_scale = 0.99 * math.radians(1) * 6371000 / self.max_speed
+        self._time_x_scale = self._time_y_scale * math.cos(math.radians(mean_lat))
+
+    def __len__(self):
+        return len(self.node_x)
+
+    @property
+    def edge_count(self):
+        return len(self.forward_targets)
+
+    @property
+    def fingerprint(self):
+        """
+        Identifiant du graphe : nombre d'arcs et somme de contrôle des tableaux
+
+        Les indices des nœuds ne valent que pour une extraction : une nouvelle
+        exécution de build_road_graph peut donner le même indice à un autre
+        carrefour. Les clés du cache des itinéraires et la hiérarchie de
+        contraction sont donc rattachées à cette empreinte.
+        """
+        if self._fingerprint is None:
+            checksum = hashlib.blake2b(digest_size=8)
+            for name in ('node_x', 'node_y', 'forward_offsets', 'forward_targets', 'forward_times'):
+                checksum.update(np.ascontiguousarray(getattr(self, name)))
+            self._fingerprint = f"{self.edge_count}-{checksum.hexdigest()}"
+        return self._fingerprint
+
+    @classmethod
+    def from_edges(cls, node_x, node_y, edge_source, edge_target, edge_length, edge_time):
+        """
+        Construit le graphe à partir d'une liste d'arcs
+
+        Args:
+            node_x, node_y: Longitude et latitude des nœuds
+            edge_source, edge_target: Indices des extrémités de chaque arc
+            edge_length: Longueur des arcs en mètres
+            edge_time: Temps de parcours des arcs en secondes
+        """
+        node_count = len(node_x)
+        edge_source = np.asarray(edge_source, dtype=np.int32)
+        edge_target = np.asarray(edge_target, dtype=np.int32)
+        edge_length = np.asarray(edge_length, dtype=np.float32)
+        edge_time = np.asarray(edge_time, dtype=np.float32)
+
+        arrays = {
+            'node_x': np.asarray(node_x, dtype=np.float64),
+            'node_y': np.asarray(node_y, dtype=np.float64),
+        }
+        for direction, origin, destination in (
+            ('forward', edge_source, edge_target),
+            ('backward', edge_target, edge_source),
+        ):
+            order = np.argsort(origin, kind='stable')
+            offsets = np.zeros(node_count + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum(np.bincount(origin, minlength=node_count))
+            arrays[f'{direction}_offsets'] = offsets
+            arrays[f'{direction}_targets'] = destination[order]
+            arrays[f'{direction}_times'] = edge_time[order]
+            arrays[f'{direction}_lengths'] = edge_length[order]
+        return cls(arrays)
+
+    def edges(self):
+        """
+        Retourne les arcs (sources, destinations, longueurs, temps) sous forme de tableaux
+        """
+        sources = np.repeat(np.arange(len(self), dtype=np.int32), np.diff(self.forward_offsets))
+        return sources, self.forward_targets, self.forward_lengths, self.forward_times
+
+    @classmethod
+    def load(cls, path):
+        """
+        Ouvre un graphe enregistré par save() (projection mémoire, sans lecture complète)
+        """
+        return cls(MappedArrays(path))
+
+    def save(self, path):
+        """
+        Enregistre le graphe au format binaire de graph_storage, avec son empreinte
+        """
+        save_arrays(path, {name: getattr(self, name) for name in self.ARRAYS}, {'fingerprint': self.fingerprint})
+
+    @property
+    def grid(self):
+        # Index des nœuds pour le rattachement des points demandés, construit au premier usage
+        if self._grid is None:
+            self._grid = GridIndex(zip(self.node_x.tolist(), self.node_y.tolist()), cell_size=100)
+        return self._grid
+
+    def nearest_node(self, lon, lat):
+        """
+        Retourne (nœud le plus proche, distance en mètres), ou (None, None) si le graphe est vide
+        """
+        nearest = self.grid.nearest(lon, lat, k=1)
+        if not nearest:
+            return None, None
+        distance, node = nearest[0]
+        return node, distance
+
+    def _lower_bound(self, node, target):
+        # Temps minimal pour rejoindre target à la vitesse maximale du graphe
+        return math.hypot(
+            (self._node_x[node] - self._node_x[target]) * self._time_x_scale,
+            (self._node_y[node] - self._node_y[target]) * self._time_y_scale
+        )
+
+    def shortest_path(self, source, target):
+        """
+        Itinéraire le plus rapide par A* bidirectionnel
+
+        Les deux recherches utilisent le potentiel moyen
+        p(v) = (h_cible(v) - h_source(v)) / 2, cohérent dans les deux sens :
+        la recherche s'arrête dès que la somme des minima des deux files
+        atteint la meilleure longueur connue.
+
+        Returns:
+            (liste des nœuds, durée en secondes, longueur en mètres), ou None sans chemin
+        """
+        if source == target:
+            return [source], 0.0, 0.0
+
+        potentials = {}
+
+        def potential(node):
+            value = potentials.get(node)
+            if value is None:
+                value = (self._lower_bound(node, target) - self._lower_bound(source, node)) / 2
+                potentials[node] = value
+            return value
+
+        # Par direction : distances (temps), parents (nœud, longueur de l'arc), file de priorité
+        distances = ({source: 0.0}, {target: 0.0})
+        parents = ({source: None}, {target: None})
+        queues = ([(potential(source), source)], [(-potential(target), target)])
+        settled = (set(), set())
+        adjacency = (self.forward, self.backward)
+        signs = (1, -1)
+
+        best = math.inf
+        meeting = None
+
+        while queues[0] and queues[1]:
+            if queues[0][0][0] + queues[1][0][0] >= best:
+                break
+
+            # Avancer la direction dont la file est la plus petite
+            side = 0 if len(queues[0]) <= len(queues[1]) else 1
+            other = 1 - side
+            _, node = heapq.heappop(queues[side])
+            if node in settled[side]:
+                continue
+            settled[side].add(node)
+
+            node_distance = distances[side][node]
+            offsets, targets, times, lengths = adjacency[side]
+            start, end = offsets[node], offsets[node + 1]
+            for neighbour, duration, length in zip(targets[start:end], times[start:end], lengths[start:end]):
+                candidate = node_distance + duration
+                if candidate < distances[side].get(neighbour, math.inf):
+                    distances[side][neighbour] = candidate
+                    parents[side][neighbour] = (node, length)
+                    heapq.heappush(queues[side], (candidate + signs[side] * potential(neighbour), neighbour))
+
+                    other_distance = distances[other].get(neighbour)
+                    if other_distance is not None and candidate + other_distance < best:
+                        best = candidate + other_distance
+                        meeting = neighbour
+
+        if meeting is None:
+            return None
+
+        # Reconstitution : source -> meeting puis meeting -> target
+        nodes = []
+        length_total = 0.0
+        node = meeting
+        while parents[0][node] is not None:
+            nodes.append(node)
+            node, length = parents[0][node]
+            length_total += length
+        nodes.append(node)
+        nodes.reverse()
+
+        node = meeting
+        while parents[1][node] is not None:
+            node, length = parents[1][node]
+            length_total += length
+            nodes.append(node)
+
+        return nodes, best, length_total
+
+    def search(self, source, targets=None, max_duration=None):
+        """
+        Dijkstra depuis `source` sur les arcs sortants
+
+        Args:
+            targets: Arrêter dès que tous ces nœuds sont atteints
+            max_duration: Ne pas dépasser cette durée (secondes)
+
+        Returns:
+            Dictionnaire nœud -> (durée, longueur) des nœuds atteints définitivement
+        """
+        offsets, neighbours, times, lengths = self.forward
+        remaining = set(targets) if targets is not None else None
+        limit = math.inf if max_duration is None else max_duration
+
+        distances = {source: 0.0}
+        path_lengths = {source: 0.0}
+        queue = [(0.0, source)]
+        settled = {}
+        while queue:
+            distance, node = heapq.heappop(queue)
+            if node in settled:
+                continue
+            if distance > limit:
+                break
+            length = path_lengths[node]
+            settled[node] = (distance, length)
+
+            if remaining is not None:
+                remaining.discard(node)
+                if not remaining:
+                    break
+
+            start, end = offsets[node], offsets[node + 1]
+            for neighbour, duration, arc_length in zip(neighbours[start:end], times[start:end], lengths[start:end]):
+                candidate = distance + duration
+                if candidate < distances.get(neighbour, math.inf):
+                    distances[neighbour] = candidate
+                    path_lengths[neighbour] = length + arc_length
+                    heapq.heappush(queue, (candidate, neighbour))
+        return settled
+
+    def many_to_many(self, sources, targets):
+        """
+        Matrice des durées et longueurs par une recherche un-vers-plusieurs par source
+
+        Returns:
+            (durées, longueurs) : tableaux NumPy de forme (len(sources), len(targets)),
+            inf quand la destination n'est pas atteignable
+        """
+        durations = np.full((len(sources), len(targets)), np.inf)
+        lengths = np.full((len(sources), len(targets)), np.inf)
+        for row, source in enumerate(sources):
+            settled = self.search(source, targets=targets)
+            for column, target in enumerate(targets):
+                if target in settled:
+                    durations[row, column], lengths[row, column] = settled[target]
+        return durations, lengths
+
+    def path_coordinates(self, nodes):
+        return [[self._node_x[node], self._node_y[node]] for node in nodes]
+
+
+_road_graph = None
+_road_graph_lock = threading.Lock()
+
+
+def get_road_graph():
+    """
+    Retourne le graphe routier du worker, chargé au premier appel (None s'il n'a pas été construit)
+    """
+    global _road_graph
+    if _road_graph is None:
+        with _road_graph_lock:
+            if _road_graph is None:
+                path = str(settings.ROAD_GRAPH_PATH)
+                if not os.path.exists(path):
+                    logger.warning("Graphe routier absent: %s (python manage.py build_road_graph)", path)
+                    return None
+                graph = RoadGraph.load(path)
+                logger.info("Graphe routier chargé: %s nœuds, %s arcs", len(graph), graph.edge_count)
+
+                hierarchy_path = str(settings.ROAD_GRAPH_CH_PATH)
+                if os.path.exists(hierarchy_path):
+                    hierarchy = ContractionHierarchy.load(hierarchy_path)
+                    # Une hiérarchie d'une autre extraction (même de même taille) donnerait des chemins faux
+                    if hierarchy.graph_fingerprint == graph.fingerprint:
+                        graph.hierarchy = hierarchy
+                        logger.info("Hiérarchie de contraction chargée: %s arcs", len(hierarchy.arc_source))
+                    else:
+                        logger.warning("Hiérarchie de contraction ignorée: construite pour un autre graphe (%s, python manage.py build_contraction_hierarchy)", hierarchy_path)
+                _road_graph = graph
+    return _road_graph
+
+
+class LocalRoutingEngine:
+    """
+    Calcul d'itinéraire sur le graphe routier local
+    """
+    # Vitesse supposée (m/s) entre un point demandé et le nœud du graphe le plus proche
+    ACCESS_SPEED = 30 / 3.6
+
+    @staticmethod
+    def get_route(start_point, end_point, traffic_factor=1.0):
+        """
+        Calcule l'itinéraire le plus rapide entre deux points [longitude, latitude]
+
+        Returns:
+            Dictionnaire au format de RoutingService.get_route, ou None si le
+            graphe est indisponible ou si aucun chemin n'existe
+        """
+        graph = get_road_graph()
+        if graph is None:
+            return None
+
+        source, source_gap = graph.nearest_node(start_point[0], start_point[1])
+        target, target_gap = graph.nearest_node(end_point[0], end_point[1])
+        if source is None or target is None:
+            return None
+
+        if graph.hierarchy is not None:
+            result = graph.hierarchy.shortest_path(source, target)
+        else:
+            result = graph.shortest_path(source, target)
+        if result is None:
+            return None
+        nodes, duration, distance = result
+
+        access_distance = source_gap + target_gap
+        distance += access_distance
+        duration = (duration + access_distance / LocalRoutingEngine.ACCESS_SPEED) * traffic_factor
+
+        minutes = int(duration // 60)
+        seconds = int(duration % 60)
+
+        return {
+            "path": [list(start_point)] + graph.path_coordinates(nodes) + [list(end_point)],
+            "distance": distance,
+            "duration": duration,
+            "duration_text": f"{minutes} min {seconds:02d} sec",
+            "start_point": start_point,
+            "end_point": end_point,
+            "traffic_factor": traffic_factor,
+            "success": True,
+            "provider": "local"
+        }
+
+    @staticmethod
+    def get_matrix(sources, targets):
+        """
+        Durées (secondes, sans facteur de trafic) et distances (mètres) entre
+        chaque source et chaque destination [longitude, latitude]
+
+        Les points sont rattachés à leur nœud le plus proche, et chaque nœud
+        distinct n'est recherché qu'une fois.
+
+        Returns:
+            (durées, distances) : tableaux NumPy (len(sources), len(targets)), inf
+            quand aucun chemin n'existe ; None si le graphe est indisponible
+        """
+        graph = get_road_graph()
+        if graph is None or len(graph) == 0:
+            return None
+
+        source_nodes, source_gaps = zip(*(graph.nearest_node(lon, lat) for lon, lat in sources))
+        target_nodes, target_gaps = zip(*(graph.nearest_node(lon, lat) for lon, lat in targets))
+
+        unique_sources, source_index = np.unique(source_nodes, return_inverse=True)
+        unique_targets, target_index = np.unique(target_nodes, return_inverse=True)
+        engine = graph.hierarchy if graph.hierarchy is not None else graph
+        durations, distances = engine.many_to_many(unique_sources.tolist(), unique_targets.tolist())
+        durations = durations[np.ix_(source_index, target_index)]
+        distances = distances[np.ix_(source_index, target_index)]
+
+        # Trajets d'accès entre les points demandés et le graphe
+        access = np.add.outer(np.asarray(source_gaps), np.asarray(target_gaps))
+        return durations + access / LocalRoutingEngine.ACCESS_SPEED, distances + access
+
+    @staticmethod
+    def get_isochrone(point, thresholds, traffic_factor=1.0):
+        """
+        Zones atteignables depuis `point` [longitude, latitude] avant chaque seuil
+
+        Une seule recherche bornée par le plus grand seuil est effectuée ; les
+        durées tiennent compte du trajet d'accès au graphe et du facteur de trafic.
+
+        Args:
+            thresholds: Seuils en secondes
+
+        Returns:
+            Pour chaque seuil, la liste des polygones (voir isochrone.grid_contours) ;
+            None si le graphe est indisponible
+        """
+        graph = get_road_graph()
+        if graph is None or len(graph) == 0:
+            return None
+
+        source, gap = graph.nearest_node(point[0], point[1])
+        access_duration = gap / LocalRoutingEngine.ACCESS_SPEED
+        max_duration = max(thresholds) / traffic_factor - access_duration
+        if max_duration < 0:
+            return [[] for _ in thresholds]
+
+        settled = graph.search(source, max_duration=max_duration)
+        nodes = np.fromiter(settled.keys(), dtype=np.int64, count=len(settled))
+        durations = np.fromiter((duration for duration, _ in settled.values()), dtype=np.float64, count=len(settled))
+        durations = (durations + access_duration) * traffic_factor
+
+        return grid_contours(
+            graph.node_x[nodes], graph.node_y[nodes], durations, thresholds,
+            cell_size=getattr(settings, 'ISOCHRONE_CELL_SIZE', 100)
+        )
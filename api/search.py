@@ -0,0 +1,188 @@
+"""
+Service de recherche de lieux dans les données pré-extraites
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+
+from .location_store import LocationStore
+from .models import PreExtractedLocation
+from .normalization import normalize_search_key
+from .fuzzy_index import FuzzyLocationIndex
+from .search_index import LocationSearchIndex
+from .spatial_index import NearestLocationIndex
+
+LocationStore.register('search', LocationSearchIndex)
+LocationStore.register('nearest', NearestLocationIndex)
+LocationStore.register(
+    'fuzzy',
+    lambda rows: FuzzyLocationIndex(rows, getattr(settings, 'LOCATION_FUZZY_MAX_DISTANCE', 2))
+)
+
+# Table FTS5 créée par la migration 0002 (SQLite uniquement)
+FTS_TABLE = 'api_preextractedlocation_fts'
+
+
+class LocationSearchService:
+    """
+    Recherche de lieux par nom, via l'index en mémoire ou directement via l'ORM
+
+    Le backend est choisi par le paramètre LOCATION_SEARCH_BACKEND :
+    'index' (par défaut), 'fts5' ou 'orm'.
+    """
+    @staticmethod
+    def search(query, limit=10, fuzzy=False):
+        """
+        Recherche les lieux correspondant à la requête (normalisée par normalize_search_key)
+
+        Args:
+            fuzzy: Compléter les correspondances exactes par des noms proches
+                (fautes de frappe), classés après celles-ci
+
+        Returns:
+            Liste de dictionnaires {'name', 'coordinates'} : préfixes puis autres
+            correspondances triés par nom (backends 'index' et 'orm'), ou classés
+            par pertinence (backend 'fts5')
+        """
+        return LocationSearchService._searcher(limit, fuzzy)(query)
+
+    @staticmethod
+    def search_many(queries, limit=10, fuzzy=False):
+        """
+        Recherche une liste de requêtes en une seule passe
+
+        Les index sont résolus une seule fois pour tout le lot et les requêtes
+        identiques après normalisation ne sont calculées qu'une fois.
+
+        Yields:
+            Pour chaque requête, dans l'ordre, la liste de résultats de search()
+        """
+        search = LocationSearchService._searcher(limit, fuzzy)
+        computed = {}
+        for query in queries:
+            key = normalize_search_key(query)
+            if key not in computed:
+                computed[key] = search(query)
+            yield computed[key]
+
+    @staticmethod
+    def _searcher(limit, fuzzy):
+        """
+        Retourne une fonction de recherche liée au backend et aux index courants
+        """
+        backend = getattr(settings, 'LOCATION_SEARCH_BACKEND', 'index')
+
+        if backend == 'orm':
+            exact_search = lambda query: LocationSearchService.search_orm(query, limit)
+        elif backend == 'fts5':
+            exact_search = lambda query: LocationSearchService.search_fts(query, limit)
+        else:
+            index = LocationStore.get_index('search')
+            exact_search = lambda query: index.search(query, limit)
+
+        fuzzy_index = LocationStore.get_index('fuzzy') if fuzzy else None
+
+        def search(query):
+            results = exact_search(query)
+
+            if fuzzy_index is not None and len(results) < limit:
+                seen = {(result['name'], tuple(result['coordinates'])) for result in results}
+                for result in fuzzy_index.search(query, limit + len(results)):
+                    if (result['name'], tuple(result['coordinates'])) not in seen:
+                        results.append(result)
+                        if len(results) >= limit:
+                            break
+
+            return results
+
+        return search
+
+    @staticmethod
+    def nearest(coordinates, k=5, max_distance=None):
+        """
+        Retourne les k lieux nommés les plus proches de [longitude, latitude]
+
+        Returns:
+            Liste de dictionnaires {'name', 'coordinates', 'distance'} (mètres)
+        """
+        return LocationStore.get_index('nearest').nearest(coordinates, k, max_distance)
+
+    @staticmethod
+    def search_orm(query, limit=10):
+        """
+        Recherche sur la clé normalisée : préfixe par l'index, puis sous-chaîne
+
+        Les noms commençant par la requête sont trouvés par une plage sur
+        l'index search_key ; la table n'est balayée (LIKE '%q%') que si
+        cette première recherche renvoie moins de `limit` lieux.
+        """
+        key = normalize_search_key(query)
+        if not key:
+            return []
+
+        # Plage [key, key + U+FFFF[ : contrairement à LIKE 'key%', utilisable par l'index b-tree
+        locations = list(
+            PreExtractedLocation.objects.filter(
+                search_key__gte=key, search_key__lt=key + '\uffff'
+            ).order_by('name', 'id')[:limit]
+        )
+
+        if len(locations) < limit:
+            found_ids = [location.id for location in locations]
+            locations += list(
+                PreExtractedLocation.objects.filter(search_key__contains=key)
+                .exclude(id__in=found_ids)
+                .order_by('name', 'id')[:limit - len(locations)]
+            )
+
+        return [
+            {'name': location.name, 'coordinates': location.coordinates}
+            for location in locations
+        ]
+
+    @staticmethod
+    def search_fts(query, limit=10):
+        """
+        Recherche plein texte FTS5 classée par pertinence (BM25)
+
+        Chaque mot de la requête doit apparaître dans le nom ; le dernier mot
+        est traité comme un préfixe pour l'autocomplétion.
+        """
+        match = LocationSearchService.fts_match_expression(normalize_search_key(query))
+        if not match:
+            return []
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT location.name, location.longitude, location.latitude
+                FROM {FTS_TABLE}
+                JOIN api_preextractedlocation AS location ON location.id = {FTS_TABLE}.rowid
+                WHERE {FTS_TABLE} MATCH %s
+                ORDER BY bm25({FTS_TABLE}), location.name
+                LIMIT %s
+                """,
+                [match, limit]
+            )
+            rows = cursor.fetchall()
+
+        return [
+            {'name': name, 'coordinates': [longitude, latitude]}
+            for name, longitude, latitude in rows
+        ]
+
+    @staticmethod
+    def fts_match_expression(query):
+        """
+        Construit une expression MATCH FTS5 sûre à partir d'une saisie libre
+
+        Exemple: "bab bou" -> '"bab" "bou"*'
+        """
+        tokens = re.findall(r'\w+', query)
+        if not tokens:
+            return ''
+
+        terms = [f'"{token}"' for token in tokens]
+        terms[-1] += '*'
+        return ' '.join(terms)
@@ -0,0 +1,134 @@
+"""
+Index n-grammes en mémoire pour la recherche de lieux par nom
+
+Remplace le balayage `name__icontains` (LIKE '%q%' sur toute la table) par des
+listes de positions par n-gramme. Les lieux sont numérotés dans l'ordre
+alphabétique des noms, si bien que chaque liste est déjà triée comme
+`order_by('name')` et que la recherche s'arrête dès que `limit` résultats
+sont trouvés. Les clés triées permettent en plus de servir les préfixes par
+recherche dichotomique, classés avant les autres correspondances.
+"""
+import heapq
+from array import array
+from bisect import bisect_left
+
+from .normalization import normalize_search_key
+
+
+class LocationSearchIndex:
+    """
+    Index des sous-chaînes (1 à 3 caractères) des clés de recherche normalisées
+    """
+    GRAM_SIZE = 3
+
+    def __init__(self, rows):
+        """
+        Construit l'index à partir de tuples
+        (id, name, longitude, latitude, location_type, search_key) triés par nom
+        """
+        self.names = []
+        self.coordinates = []
+        self.keys = []
+        postings = {}
+
+        for position, row in enumerate(rows):
+            name, longitude, latitude, search_key = row[1], row[2], row[3], row[5]
+            key = search_key or self.normalize(name)
+            self.names.append(name)
+            self.coordinates.append((longitude, latitude))
+            self.keys.append(key)
+
+            for gram in self._grams(key):
+                positions = postings.get(gram)
+                if positions is None:
+                    postings[gram] = positions = array('i')
+                positions.append(position)
+
+        self._postings = postings
+
+        # Clés triées (et positions associées) pour les recherches par préfixe
+        order = sorted(range(len(self.keys)), key=self.keys.__getitem__)
+        self._sorted_keys = [self.keys[position] for position in order]
+        self._sorted_positions = array('i', order)
+
+    def __len__(self):
+        return len(self.names)
+
+    @staticmethod
+    def normalize(text):
+        """
+        Normalise un nom ou une requête (casse, accents, variantes de l'arabe)
+        """
+        return normalize_search_key(text)
+
+    def _grams(self, key):
+        """
+        Retourne l'ensemble des n-grammes (1 à GRAM_SIZE caractères) d'une clé
+        """
+        grams = set()
+        length = len(key)
+        for size in range(1, self.GRAM_SIZE + 1):
+            for start in range(length - size + 1):
+                grams.add(key[start:start + size])
+        return grams
+
+    def search_positions(self, query, limit=10):
+        """
+        Retourne les positions des lieux dont la clé contient la requête
+
+        Les clés commençant par la requête viennent en premier, puis les autres
+        correspondances ; chaque groupe est trié par nom.
+        """
+        key = self.normalize(query)
+        if not key:
+            return []
+
+        prefixed = self._prefix_positions(key, limit)
+        if len(prefixed) >= limit:
+            return prefixed
+
+        return prefixed + self._substring_positions(key, limit - len(prefixed), set(prefixed))
+
+    def _prefix_positions(self, key, limit):
+        start = bisect_left(self._sorted_keys, key)
+        end = bisect_left(self._sorted_keys, key + '\uffff', start)
+        return heapq.nsmallest(limit, self._sorted_positions[start:end])
+
+    def _substring_positions(self, key, limit, excluded):
+        if len(key) <= self.GRAM_SIZE:
+            # La requête est elle-même un n-gramme indexé : aucune vérification nécessaire
+            candidates = self._postings.get(key, ())
+            verify = False
+        else:
+            # Parcourir la liste la plus courte parmi les trigrammes de la requête
+            # et vérifier la sous-chaîne complète sur chaque candidat
+            candidates = None
+            for start in range(len(key) - self.GRAM_SIZE + 1):
+                positions = self._postings.get(key[start:start + self.GRAM_SIZE])
+                if positions is None:
+                    return []
+                if candidates is None or len(positions) < len(candidates):
+                    candidates = positions
+            verify = True
+
+        keys = self.keys
+        results = []
+        for position in candidates:
+            if position in excluded or (verify and key not in keys[position]):
+                continue
+            results.append(position)
+            if len(results) >= limit:
+                break
+        return results
+
+    def search(self, query, limit=10):
+        """
+        Recherche les lieux dont le nom normalisé contient la requête
+
+        Returns:
+            Liste de dictionnaires {'name', 'coordinates'}, préfixes en premier
+        """
+        return [
+            {'name': self.names[position], 'coordinates': list(self.coordinates[position])}
+            for position in self.search_positions(query, limit)
+        ]
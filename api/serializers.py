@@ -27,6 +27,15 @@ class RouteRequestSerializer(serializers.Serializer):
     )
     start_name = serializers.CharField(max_length=255, required=False)
     end_name = serializers.CharField(max_length=255, required=False)
+    # 'polyline6' : géométrie renvoyée en polyline encodée (précision 6) à la place de path
+    format = serializers.ChoiceField(
+        choices=['coordinates', 'polyline6'],
+        default='coordinates'
+    )
+    # Simplification du tracé : tolérance en mètres, ou niveau de zoom de la carte
+    # (tolérance d'un pixel) ; tolerance l'emporte si les deux sont fournis
+    tolerance = serializers.FloatField(min_value=0, required=False)
+    zoom = serializers.IntegerField(min_value=0, max_value=22, required=False)
 
 class RouteResponseSerializer(serializers.Serializer):
     """
@@ -53,9 +62,109 @@ class RouteResponseSerializer(serializers.Serializer):
         max_length=2
     )
 
+class BatchRouteSerializer(serializers.Serializer):
+    """
+    Sérialiseur pour le calcul de plusieurs itinéraires en une requête
+    """
+    routes = serializers.ListField(
+        child=RouteRequestSerializer(),
+        min_length=1,
+        max_length=1000
+    )
+
 class SearchLocationSerializer(serializers.Serializer):
     """
     Sérialiseur pour la recherche de lieux
     """
     query = serializers.CharField(max_length=255)
+    fuzzy = serializers.BooleanField(default=False)  # tolérer les fautes de frappe
 
+class BatchSearchLocationSerializer(serializers.Serializer):
+    """
+    Sérialiseur pour la recherche de plusieurs lieux en une requête
+    """
+    queries = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        min_length=1,
+        max_length=10000
+    )
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=10)
+    fuzzy = serializers.BooleanField(default=False)
+
+class NearestLocationSerializer(serializers.Serializer):
+    """
+    Sérialiseur pour la recherche des lieux les plus proches d'un point
+    """
+    coordinates = serializers.ListField(
+        child=serializers.FloatField(),
+        min_length=2,
+        max_length=2
+    )  # [longitude, latitude]
+    k = serializers.IntegerField(min_value=1, max_value=50, default=5)
+    max_distance = serializers.FloatField(min_value=0, required=False)  # en mètres
+
+class RouteMatrixSerializer(serializers.Serializer):
+    """
+    Sérialiseur pour les matrices de durées et distances entre plusieurs points
+    """
+    sources = serializers.ListField(
+        child=serializers.ListField(
+            child=serializers.FloatField(),
+            min_length=2,
+            max_length=2
+        ),
+        min_length=1,
+        max_length=100
+    )  # liste de [longitude, latitude]
+    targets = serializers.ListField(
+        child=serializers.ListField(
+            child=serializers.FloatField(),
+            min_length=2,
+            max_length=2
+        ),
+        min_length=1,
+        max_length=100
+    )
+    hour = serializers.IntegerField(min_value=0, max_value=23, required=False)  # heure de départ pour le trafic
+
+class MultiStopRouteSerializer(serializers.Serializer):
+    """
+    Sérialiseur pour les tournées à plusieurs arrêts
+    """
+    start_point = serializers.ListField(
+        child=serializers.FloatField(),
+        min_length=2,
+        max_length=2
+    )
+    stops = serializers.ListField(
+        child=serializers.ListField(
+            child=serializers.FloatField(),
+            min_length=2,
+            max_length=2
+        ),
+        min_length=1,
+        max_length=50
+    )  # arrêts à visiter, dans un ordre quelconque
+    end_point = serializers.ListField(
+        child=serializers.FloatField(),
+        min_length=2,
+        max_length=2,
+        required=False
+    )  # sans point d'arrivée, la tournée se termine au dernier arrêt visité
+
+class IsochroneSerializer(serializers.Serializer):
+    """
+    Sérialiseur pour les zones atteignables depuis un point
+    """
+    point = serializers.ListField(
+        child=serializers.FloatField(),
+        min_length=2,
+        max_length=2
+    )  # [longitude, latitude]
+    minutes = serializers.ListField(
+        child=serializers.FloatField(min_value=1, max_value=60),
+        min_length=1,
+        max_length=6,
+        default=[10, 15, 20]
+    )
+    hour = serializers.IntegerField(min_value=0, max_value=23, required=False)  # heure de départ pour le trafic
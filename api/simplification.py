@@ -0,0 +1,142 @@
+"""
+Simplification des géométries d'itinéraires (Douglas-Peucker vectorisé)
+
+Une tolérance en mètres est l'écart maximal admis entre le tracé simplifié et
+le tracé complet. Un niveau de zoom est converti en tolérance d'un pixel de
+tuile web (256 px) à la latitude du trajet.
+
+Au lieu de traiter les segments un par un, chaque passe de l'algorithme
+calcule en une fois les écarts de tous les points encore à examiner à leur
+segment, puis coupe tous les segments dont le point le plus éloigné dépasse
+la tolérance : le nombre de passes est la profondeur de la récursion, et non
+le nombre de points conservés.
+"""
+import math
+
+import numpy as np
+
+from .geodesy import EARTH_RADIUS
+
+# Mètres par pixel au zoom 0 sur l'équateur (tuiles de 256 px)
+ZOOM0_METERS_PER_PIXEL = 2 * math.pi * EARTH_RADIUS / 256
+
+
+def zoom_tolerance(zoom, latitude):
+    """
+    Tolérance (mètres) correspondant à un pixel au niveau de zoom donné
+    """
+    return ZOOM0_METERS_PER_PIXEL * math.cos(math.radians(latitude)) / 2 ** zoom
+
+
+def simplify(path, tolerance):
+    """
+    Simplifie une liste de [longitude, latitude] avec une tolérance en mètres
+
+    Returns:
+        Liste de [longitude, latitude], extrémités toujours conservées
+    """
+    points = np.asarray(path, dtype=np.float64).reshape(-1, 2)
+    if len(points) < 3 or tolerance <= 0:
+        return points.tolist()
+    return points[significance(points, tolerance) > tolerance].tolist()
+
+
+def significance(points, tolerance):
+    """
+    Tolérance en deçà de laquelle chaque point est conservé par Douglas-Peucker
+
+    Un point est gardé à la tolérance t si son écart au segment qu'il coupe et
+    ceux de tous les points qui ont créé ce segment dépassent t : sa valeur est
+    le minimum de ces écarts. Une seule exécution à la plus petite tolérance
+    donne ainsi le résultat de toutes les tolérances supérieures.
+
+    Args:
+        points: Tableau (N, 2) de [longitude, latitude]
+        tolerance: Plus petite tolérance (mètres) utile ; 0 pour les points abandonnés
+
+    Returns:
+        Tableau (N,) en mètres, infini pour les extrémités
+    """
+    # Projection équirectangulaire locale, en mètres
+    scale = math.radians(1) * EARTH_RADIUS
+    xy = points * [scale * math.cos(math.radians(points[:, 1].mean())), scale]
+
+    values = np.zeros(len(points))
+    values[[0, -1]] = np.inf
+    keep = values > 0
+    # Points intérieurs à un segment non encore validé
+    pending = ~keep
+
+    while pending.any():
+        anchors = np.flatnonzero(keep)
+        candidates = np.flatnonzero(pending)
+        # Segment de chaque candidat (indice de son point de départ dans anchors)
+        segment = np.searchsorted(anchors, candidates) - 1
+        distances = _segment_distances(xy[candidates], xy[anchors[segment]], xy[anchors[segment + 1]])
+
+        # Candidats triés, donc groupés par segment : point le plus éloigné de chaque groupe
+        bounds = np.flatnonzero(np.diff(segment, prepend=-1))
+        maxima = np.repeat(np.maximum.reduceat(distances, bounds), np.diff(np.append(bounds, len(candidates))))
+        farthest = np.flatnonzero(distances == maxima)
+        farthest = farthest[np.unique(segment[farthest], return_index=True)[1]]
+
+        split = farthest[distances[farthest] > tolerance]
+        new_points = candidates[split]
+        values[new_points] = np.minimum(
+            distances[split],
+            np.minimum(values[anchors[segment[split]]], values[anchors[segment[split] + 1]])
+        )
+        keep[new_points] = True
+        pending[new_points] = False
+        # Segments assez proches du tracé : leurs points intérieurs sont abandonnés
+        closed = np.setdiff1d(segment[farthest], segment[split])
+        pending[candidates[np.isin(segment, closed)]] = False
+
+    return values
+
+
+def _segment_distances(points, starts, ends):
+    """
+    Distance de chaque point au segment [start, end] correspondant
+    """
+    direction = ends - starts
+    length2 = np.einsum('ij,ij->i', direction, direction)
+    offset = points - starts
+    t = np.divide(
+        np.einsum('ij,ij->i', offset, direction), length2,
+        out=np.zeros(len(points)), where=length2 > 0
+    )
+    return np.hypot(*(offset - np.clip(t, 0, 1)[:, None] * direction).T)
+
+
+def simplify_levels(path, zooms):
+    """
+    Tracés simplifiés précalculés pour chaque niveau de zoom
+
+    Returns:
+        Dictionnaire {str(zoom): tracé} (clés texte pour MongoDB)
+    """
+    points = np.asarray(path, dtype=np.float64).reshape(-1, 2)
+    if len(points) < 3 or not zooms:
+        return {}
+    tolerances = {zoom: zoom_tolerance(zoom, points[0, 1]) for zoom in zooms}
+    values = significance(points, min(tolerances.values()))
+    return {str(zoom): points[values > tolerance].tolist() for zoom, tolerance in tolerances.items()}
+
+
+def route_path(route, zoom=None, tolerance=None):
+    """
+    Tracé d'un itinéraire à la tolérance ou au zoom demandé
+
+    Le niveau précalculé `simplified_paths` de l'itinéraire est utilisé quand il
+    existe pour ce zoom ; le tracé complet est renvoyé sans zoom ni tolérance.
+    """
+    path = route['path']
+    if tolerance is None:
+        if zoom is None:
+            return path
+        levels = route.get('simplified_paths') or {}
+        if str(zoom) in levels:
+            return levels[str(zoom)]
+        tolerance = zoom_tolerance(zoom, path[0][1] if path else 0)
+    return simplify(path, tolerance)
@@ -0,0 +1,227 @@
+"""
+Regroupement des calculs identiques simultanés (single-flight)
+
+Quand plusieurs requêtes demandent au même moment un itinéraire absent du
+cache, une seule (le meneur) le calcule ; les autres attendent son résultat
+au lieu d'appeler Valhalla et d'écrire dans MongoDB chacune de leur côté.
+
+- Dans un worker, les suiveurs attendent le meneur en mémoire (Event pour les
+  vues synchrones, Future pour les vues asynchrones).
+- Entre les workers d'une même machine, le meneur tient un verrou de fichier
+  (fcntl.flock) ; les autres workers attendent sa libération puis relisent le
+  cache (`recheck`) avant de calculer eux-mêmes.
+
+Chaque clé a son propre fichier de verrou (nommé par son empreinte sha1),
+supprimé par le meneur à la fin du calcul : des itinéraires différents ne
+s'attendent jamais. Un worker qui obtient le verrou d'un fichier déjà supprimé
+sait que le meneur a terminé. Sans fcntl (Windows), seul le regroupement dans
+le worker est actif.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Intervalle (secondes) entre deux tentatives de prise d'un verrou de fichier occupé
+LOCK_POLL_INTERVAL = 0.02
+
+
+class _Call:
+    """
+    Calcul en cours dans ce worker
+    """
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+
+
+class SingleFlight:
+    """
+    Exécute une seule fois à la fois le calcul associé à une clé
+    """
+    def __init__(self, name):
+        """
+        Args:
+            name: Préfixe des fichiers de verrou (un groupe de clés par instance)
+        """
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._async_calls = {}
+
+    def do(self, key, compute, recheck=None):
+        """
+        Retourne compute(), calculé une seule fois pour les appels simultanés de même clé
+
+        Args:
+            compute: Fonction sans argument effectuant le calcul (et son enregistrement)
+            recheck: Fonction sans argument relisant le cache, appelée par un worker
+                qui a attendu le meneur d'un autre worker ; None si rien n'y figure
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if call.event.wait(self._timeout()) and call.result is not None:
+                return call.result
+            # Meneur trop lent ou en échec : calculer sans attendre davantage
+            return compute()
+
+        try:
+            call.result = self._run_locked(key, compute, recheck)
+            return call.result
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    async def ado(self, key, compute, recheck=None):
+        """
+        Version asynchrone de do() : compute et recheck sont des fonctions coroutines
+        """
+        loop = asyncio.get_running_loop()
+        future = self._async_calls.get(key)
+        if future is not None and future.get_loop() is loop:
+            try:
+                result = await asyncio.wait_for(asyncio.shield(future), self._timeout())
+            except asyncio.TimeoutError:
+                result = None
+            if result is not None:
+                return result
+            return await compute()
+
+        future = self._async_calls[key] = loop.create_future()
+        result = None
+        try:
+            result = await self._arun_locked(key, compute, recheck)
+            return result
+        finally:
+            if self._async_calls.get(key) is future:
+                del self._async_calls[key]
+            # None si le meneur a échoué : les suiveurs calculent eux-mêmes
+            future.set_result(result)
+
+    @staticmethod
+    def _timeout():
+        # Au-delà du budget de latence d'un calcul, le meneur est considéré comme bloqué
+        return getattr(settings, 'ROUTING_LATENCY_BUDGET', 20) + 5
+
+    def _lock_path(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(settings.SINGLE_FLIGHT_LOCK_DIR, f"{self.name}-{digest}.lock")
+
+    @staticmethod
+    def _open_lock(path):
+        """
+        Ouvre le fichier de verrou ; None si les verrous de fichier sont indisponibles
+        """
+        if fcntl is None:
+            return None
+        try:
+            os.makedirs(settings.SINGLE_FLIGHT_LOCK_DIR, exist_ok=True)
+            return os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        except OSError as e:
+            logger.warning("Verrou single-flight indisponible: %s", e)
+            return None
+
+    @staticmethod
+    def _try_lock(fd):
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    @staticmethod
+    def _is_current(fd, path):
+        """
+        Indique si le descripteur verrouillé est encore le fichier de verrou de
+        la clé (sinon le meneur l'a supprimé en terminant)
+        """
+        try:
+            current = os.stat(path)
+        except FileNotFoundError:
+            return False
+        opened = os.fstat(fd)
+        return (current.st_dev, current.st_ino) == (opened.st_dev, opened.st_ino)
+
+    @staticmethod
+    def _release(fd, path):
+        # Supprimer le fichier avant de le fermer (ce qui libère le verrou) :
+        # les workers en attente constatent qu'il n'est plus le fichier courant
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+        os.close(fd)
+
+    def _run_locked(self, key, compute, recheck):
+        path = self._lock_path(key)
+        fd = self._open_lock(path)
+        if fd is None:
+            return compute()
+
+        if self._try_lock(fd) and self._is_current(fd, path):
+            try:
+                return compute()
+            finally:
+                self._release(fd, path)
+
+        try:
+            # Un autre worker calcule : attendre qu'il ait terminé puis relire le cache
+            deadline = time.monotonic() + self._timeout()
+            while not self._try_lock(fd):
+                if time.monotonic() >= deadline:
+                    return compute()
+                time.sleep(LOCK_POLL_INTERVAL)
+        finally:
+            os.close(fd)
+        if recheck is not None:
+            result = recheck()
+            if result is not None:
+                return result
+        return compute()
+
+    async def _arun_locked(self, key, compute, recheck):
+        path = self._lock_path(key)
+        fd = self._open_lock(path)
+        if fd is None:
+            return await compute()
+
+        if self._try_lock(fd) and self._is_current(fd, path):
+            try:
+                return await compute()
+            finally:
+                self._release(fd, path)
+
+        try:
+            deadline = time.monotonic() + self._timeout()
+            while not self._try_lock(fd):
+                if time.monotonic() >= deadline:
+                    return await compute()
+                await asyncio.sleep(LOCK_POLL_INTERVAL)
+        finally:
+            os.close(fd)
+        if recheck is not None:
+            result = await recheck()
+            if result is not None:
+                return result
+        return await compute()
+
+
+# Calculs d'itinéraires, indexés par MongoDBManager.route_key
+route_flights = SingleFlight('route')
@@ -0,0 +1,163 @@
+"""
+Index spatial en grille pour les recherches de plus proches voisins
+
+Les points sont projetés (équirectangulaire autour de la latitude moyenne) puis
+rangés dans des cellules carrées. Une requête parcourt les anneaux de cellules
+autour du point jusqu'à ce que l'anneau suivant ne puisse plus contenir de
+point plus proche que le k-ième trouvé, sans appel réseau ni balayage complet.
+"""
+import heapq
+import math
+
+from .geodesy import EARTH_RADIUS
+
+
+class GridIndex:
+    """
+    Grille uniforme de points [longitude, latitude]
+    """
+    def __init__(self, points, cell_size=250):
+        """
+        Args:
+            points: Liste de points [longitude, latitude]
+            cell_size: Taille d'une cellule en mètres
+        """
+        self.cell_size = cell_size
+        self.points = [(float(lon), float(lat)) for lon, lat in points]
+
+        mean_lat = sum(lat for _, lat in self.points) / len(self.points) if self.points else 0.0
+        self._x_scale = math.radians(1) * EARTH_RADIUS * math.cos(math.radians(mean_lat))
+        self._y_scale = math.radians(1) * EARTH_RADIUS
+
+        self._projected = []
+        self._cells = {}
+        for position, (lon, lat) in enumerate(self.points):
+            x, y = self._project(lon, lat)
+            self._projected.append((x, y))
+            self._cells.setdefault(self._cell(x, y), []).append(position)
+
+        if self._cells:
+            columns = [cell[0] for cell in self._cells]
+            rows = [cell[1] for cell in self._cells]
+            self._bounds = (min(columns), min(rows), max(columns), max(rows))
+
+    def __len__(self):
+        return len(self.points)
+
+    def _project(self, lon, lat):
+        return lon * self._x_scale, lat * self._y_scale
+
+    def _cell(self, x, y):
+        return int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size))
+
+    def _max_ring(self, column, row):
+        # Au-delà de cet anneau, plus aucune cellule n'est occupée
+        min_column, min_row, max_column, max_row = self._bounds
+        return max(column - min_column, max_column - column, row - min_row, max_row - row)
+
+    def nearest(self, lon, lat, k=1, max_distance=None):
+        """
+        Retourne les k points les plus proches
+
+        Returns:
+            Liste de tuples (distance en mètres, position) triés par distance
+        """
+        if not self._cells or k <= 0:
+            return []
+
+        x, y = self._project(lon, lat)
+        column, row = self._cell(x, y)
+        max_ring = self._max_ring(column, row)
+        if max_distance is not None:
+            max_ring = min(max_ring, int(max_distance // self.cell_size) + 1)
+
+        # Tas max (distances négatives) des k meilleurs candidats, en distance projetée au carré
+        best = []
+        ring = 0
+        while ring <= max_ring:
+            for cell in self._ring_cells(column, row, ring):
+                for position in self._cells.get(cell, ()):
+                    px, py = self._projected[position]
+                    squared = (px - x) ** 2 + (py - y) ** 2
+                    if len(best) < k:
+                        heapq.heappush(best, (-squared, position))
+                    elif squared < -best[0][0]:
+                        heapq.heapreplace(best, (-squared, position))
+
+            # Tout point d'un anneau suivant est à plus de ring * cell_size mètres
+            if len(best) >= k and (ring * self.cell_size) ** 2 >= -best[0][0]:
+                break
+            ring += 1
+
+        results = []
+        for _, position in best:
+            distance = self.distance(lon, lat, *self.points[position])
+            if max_distance is None or distance <= max_distance:
+                results.append((distance, position))
+        results.sort()
+        return results
+
+    @staticmethod
+    def _ring_cells(column, row, ring):
+        if ring == 0:
+            yield column, row
+            return
+        for offset in range(-ring, ring + 1):
+            yield column + offset, row - ring
+            yield column + offset, row + ring
+        for offset in range(-ring + 1, ring):
+            yield column - ring, row + offset
+            yield column + ring, row + offset
+
+    @staticmethod
+    def distance(lon1, lat1, lon2, lat2):
+        """
+        Distance haversine en mètres entre deux points
+        """
+        lat1_rad, lat2_rad = math.radians(lat1), math.radians(lat2)
+        dlat = lat2_rad - lat1_rad
+        dlon = math.radians(lon2 - lon1)
+        a = math.sin(dlat / 2) ** 2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2) ** 2
+        return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+class NearestLocationIndex:
+    """
+    Lieux nommés de PreExtractedLocation indexés par position
+    """
+    def __init__(self, rows):
+        """
+        Construit l'index à partir de tuples
+        (id, name, longitude, latitude, location_type, search_key)
+        """
+        self.names = []
+        self.coordinates = []
+        for row in rows:
+            name, longitude, latitude, search_key = row[1], row[2], row[3], row[5]
+            # Ignorer les lieux sans nom exploitable (valeurs 'nan' héritées de l'extraction)
+            if not search_key or search_key == 'nan':
+                continue
+            self.names.append(name)
+            self.coordinates.append((longitude, latitude))
+
+        self.grid = GridIndex(self.coordinates)
+
+    def __len__(self):
+        return len(self.names)
+
+    def nearest(self, coordinates, k=5, max_distance=None):
+        """
+        Retourne les k lieux nommés les plus proches de [longitude, latitude]
+
+        Returns:
+            Liste de dictionnaires {'name', 'coordinates', 'distance'} triés par distance
+        """
+        lon, lat = coordinates
+        return [
+            {
+                'name': self.names[position],
+                'coordinates': list(self.coordinates[position]),
+                'distance': round(distance, 1)
+            }
+            for distance, position in self.grid.nearest(lon, lat, k, max_distance)
+        ]
@@ -0,0 +1,210 @@
+"""
+Services HTTP locaux imitant les API externes (Nominatim, Valhalla) pour les tests
+
+Exemple:
+    server = start_stub_server()
+    services = {name: dict(config, base_url=server.url) for name, config in settings.HTTP_SERVICES.items()}
+    with override_settings(HTTP_SERVICES=services):
+        ...
+    server.shutdown()
+"""
+import json
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Centre approximatif de Fès [longitude, latitude]
+FES_CENTER = [-5.0000, 34.0333]
+
+
+def encode_polyline(coordinates, precision=6):
+    """
+    Encode une liste de [longitude, latitude] au format polyline (Valhalla)
+    """
+    factor = 10 ** precision
+    encoded = []
+    previous_lat = previous_lng = 0
+    for lng, lat in coordinates:
+        lat_value, lng_value = round(lat * factor), round(lng * factor)
+        for delta in (lat_value - previous_lat, lng_value - previous_lng):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                encoded.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            encoded.append(chr(value + 63))
+        previous_lat, previous_lng = lat_value, lng_value
+    return ''.join(encoded)
+
+
+class StubServer(ThreadingHTTPServer):
+    """
+    Serveur multi-thread acceptant de nombreuses connexions simultanées (benchmarks de charge)
+    """
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class StubServiceHandler(BaseHTTPRequestHandler):
+    """
+    Répond aux requêtes /search au format Nominatim, /route, /sources_to_targets
+    et /isochrone au format Valhalla
+    """
+    # Connexions keep-alive, comme les vrais services ; sans Nagle, les en-têtes
+    # et le corps envoyés séparément ne retardent pas la réponse
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    # Latence simulée (secondes) ajoutée à chaque réponse
+    delay = 0.0
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.rstrip('/') == '/search':
+            params = parse_qs(url.query)
+            self._send_json(self._nominatim_results(params))
+        else:
+            self._send_json({'error': 'Not found'}, status=404)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self._send_json({'error': 'Invalid JSON'}, status=400)
+            return
+
+        if url.path.rstrip('/') == '/route':
+            self._send_json(self._valhalla_route(payload))
+        elif url.path.rstrip('/') == '/sources_to_targets':
+            self._send_json(self._valhalla_matrix(payload))
+        elif url.path.rstrip('/') == '/isochrone':
+            self._send_json(self._valhalla_isochrone(payload))
+        else:
+            self._send_json({'error': 'Not found'}, status=404)
+
+    def _valhalla_route(self, payload):
+        """
+        Trajet en ligne droite entre chaque position et la suivante (un tronçon par paire), à 40 km/h
+        """
+        locations = payload.get('locations', [])
+        if len(locations) < 2:
+            return {'error': 'Insufficiently specified required parameter'}
+
+        steps = 20
+        legs = []
+        for start, end in zip(locations, locations[1:]):
+            path = [
+                [start['lon'] + (end['lon'] - start['lon']) * i / steps,
+                 start['lat'] + (end['lat'] - start['lat']) * i / steps]
+                for i in range(steps + 1)
+            ]
+            legs.append({'shape': encode_polyline(path), 'summary': self._summary(start, end)})
+
+        return {
+            'trip': {
+                'legs': legs,
+                'summary': {
+                    'length': sum(leg['summary']['length'] for leg in legs),
+                    'time': sum(leg['summary']['time'] for leg in legs),
+                },
+                'status': 0
+            }
+        }
+
+    def _valhalla_matrix(self, payload):
+        """
+        Matrice en ligne droite à 40 km/h entre chaque source et chaque destination
+        """
+        sources = payload.get('sources', [])
+        targets = payload.get('targets', [])
+        if not sources or not targets:
+            return {'error': 'Insufficiently specified required parameter'}
+
+        return {
+            'sources_to_targets': [
+                [self._matrix_cell(source, target, i, j) for j, target in enumerate(targets)]
+                for i, source in enumerate(sources)
+            ],
+            'units': 'kilometers'
+        }
+
+    def _valhalla_isochrone(self, payload):
+        """
+        Octogones parcourus à 40 km/h, du plus grand contour au plus petit
+        """
+        locations = payload.get('locations', [])
+        contours = payload.get('contours', [])
+        if not locations or not contours:
+            return {'error': 'Insufficiently specified required parameter'}
+
+        center = locations[0]
+        features = []
+        for contour in sorted(contours, key=lambda c: -c['time']):
+            radius_km = 40 * contour['time'] / 60
+            ring = [
+                [center['lon'] + math.degrees(radius_km / 6371 * math.cos(angle) / math.cos(math.radians(center['lat']))),
+                 center['lat'] + math.degrees(radius_km / 6371 * math.sin(angle))]
+                for angle in (i * math.pi / 4 for i in range(8))
+            ]
+            features.append({
+                'type': 'Feature',
+                'properties': {'contour': contour['time'], 'metric': 'time'},
+                'geometry': {'type': 'Polygon', 'coordinates': [ring + [ring[0]]]}
+            })
+        return {'type': 'FeatureCollection', 'features': features}
+
+    def _matrix_cell(self, source, target, i, j):
+        summary = self._summary(source, target)
+        return {'distance': summary['length'], 'time': summary['time'], 'from_index': i, 'to_index': j}
+
+    @staticmethod
+    def _summary(start, end):
+        dlat = math.radians(end['lat'] - start['lat'])
+        dlon = math.radians(end['lon'] - start['lon']) * math.cos(math.radians(start['lat']))
+        length_km = 6371 * math.hypot(dlat, dlon)
+        return {'length': length_km, 'time': length_km / 40 * 3600}
+
+    def _nominatim_results(self, params):
+        query = params.get('q', [''])[0]
+        limit = int(params.get('limit', ['1'])[0])
+        # Résultat déterministe : un point décalé selon le hash de la requête
+        offset = (sum(query.encode('utf-8')) % 100) / 10000
+        return [
+            {
+                'display_name': f"{query} ({i + 1})",
+                'lon': str(FES_CENTER[0] + offset + i / 1000),
+                'lat': str(FES_CENTER[1] + offset),
+            }
+            for i in range(min(limit, 3))
+        ]
+
+    def _send_json(self, data, status=200):
+        if self.delay:
+            time.sleep(self.delay)
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Pas de journal par requête
+        pass
+
+
+def start_stub_server(host='127.0.0.1', port=0, delay=0.0):
+    """
+    Démarre le serveur dans un thread et retourne l'instance (attribut `url`)
+
+    Args:
+        delay: Latence simulée en secondes pour chaque réponse
+    """
+    handler = type('StubServiceHandler', (StubServiceHandler,), {'delay': delay})
+    server = StubServer((host, port), handler)
+    server.url = f"http://{host}:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,85 @@
+"""
+Graphes routiers de test et Dijkstra de référence
+"""
+import heapq
+import math
+import random
+
+from api.geodesy import haversine
+from api.routing_engine import RoadGraph
+
+
+def grid_road_graph(size=12, seed=0, one_way=0.2, missing=0.1):
+    """
+    Quadrillage de size x size carrefours (~100 m) autour de Fès
+
+    Chaque rue a une vitesse aléatoire ; une part des rues est à sens unique
+    et une autre part absente, si bien que certains nœuds peuvent être
+    inatteignables.
+    """
+    rng = random.Random(seed)
+    node_x, node_y = [], []
+    for row in range(size):
+        for column in range(size):
+            node_x.append(-5.0 + column * 0.0011 + rng.uniform(-0.0002, 0.0002))
+            node_y.append(34.03 + row * 0.0009 + rng.uniform(-0.0002, 0.0002))
+
+    sources, targets, lengths, times = [], [], [], []
+    for row in range(size):
+        for column in range(size):
+            node = row * size + column
+            for neighbour in ((node + 1) if column + 1 < size else None, (node + size) if row + 1 < size else None):
+                if neighbour is None or rng.random() < missing:
+                    continue
+                length = float(haversine(node_x[node], node_y[node], node_x[neighbour], node_y[neighbour]))
+                speed = rng.choice([20, 30, 50, 70]) / 3.6
+                directions = [(node, neighbour), (neighbour, node)]
+                if rng.random() < one_way:
+                    directions = [rng.choice(directions)]
+                for source, target in directions:
+                    sources.append(source)
+                    targets.append(target)
+                    lengths.append(length)
+                    times.append(length / speed)
+    return RoadGraph.from_edges(node_x, node_y, sources, targets, lengths, times)
+
+
+def dijkstra(graph, source):
+    """
+    Durées minimales (secondes) depuis source, calculées sur la liste des arcs
+    """
+    adjacency = {}
+    for origin, target, _, duration in zip(*(array.tolist() for array in graph.edges())):
+        adjacency.setdefault(origin, []).append((target, duration))
+
+    distances = {source: 0.0}
+    queue = [(0.0, source)]
+    while queue:
+        distance, node = heapq.heappop(queue)
+        if distance > distances[node]:
+            continue
+        for target, duration in adjacency.get(node, ()):
+            candidate = distance + duration
+            if candidate < distances.get(target, math.inf):
+                distances[target] = candidate
+                heapq.heappush(queue, (candidate, target))
+    return distances
+
+
+def path_cost(graph, nodes):
+    """
+    (durée, longueur) du chemin `nodes`, chaque pas devant être un arc du graphe
+
+    Entre deux nœuds reliés par plusieurs arcs, le plus rapide est retenu.
+    """
+    sources, targets, lengths, times = (array.tolist() for array in graph.edges())
+    arcs = {}
+    for source, target, length, duration in zip(sources, targets, lengths, times):
+        if (source, target) not in arcs or duration < arcs[(source, target)][0]:
+            arcs[(source, target)] = (duration, length)
+    duration = length = 0.0
+    for step in zip(nodes, nodes[1:]):
+        arc_duration, arc_length = arcs[step]
+        duration += arc_duration
+        length += arc_length
+    return duration, length
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import tempfile
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from api import polyline
+from api.async_views import AsyncRouteView, AsyncSearchLocationView
+from api.models import MongoDBManager
+from api.search import LocationSearchService
+from api.utils import RoutingService, TrafficDataService
+from api.views import RouteView
+
+PATH = [[-5.0, 34.03], [-4.995, 34.035], [-4.99, 34.04]]
+VALHALLA_RESPONSE = {'trip': {'legs': [{'shape': polyline.encode(PATH), 'summary': {'length': 1.4, 'time': 120}}]}}
+
+
+def valhalla_response():
+    return mock.Mock(status_code=200, json=mock.Mock(return_value=VALHALLA_RESPONSE))
+
+
+class AsyncRouteViewTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(SINGLE_FLIGHT_LOCK_DIR=directory.name, CIRCUIT_BREAKERS={'valhalla': {}},
+                                     ROUTING_PROVIDER='valhalla', ROUTE_CACHE_SNAP='none')
+        override.enable()
+        self.addCleanup(override.disable)
+        patcher = mock.patch.object(TrafficDataService, 'get_traffic_factor', return_value=1.0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.body = {'start_point': PATH[0], 'end_point': PATH[-1]}
+
+    def request(self, view, body=None):
+        request = RequestFactory().post('/api/routes/calculate/', json.dumps(body or self.body),
+                                        content_type='application/json')
+        return view.as_view()(request)
+
+    def test_same_response_as_sync_view(self):
+        sync_client = mock.Mock()
+        sync_client.post.return_value = valhalla_response()
+        with mock.patch.object(MongoDBManager, 'find_route', return_value=None), \
+                mock.patch.object(MongoDBManager, 'save_route'), \
+                mock.patch('api.utils.get_http_client', return_value=sync_client):
+            expected = self.request(RouteView)
+            expected.render()
+
+        async_client = mock.Mock()
+        async_client.post = mock.AsyncMock(return_value=valhalla_response())
+        with mock.patch.object(MongoDBManager, 'afind_route', mock.AsyncMock(return_value=None)), \
+                mock.patch.object(MongoDBManager, 'asave_route', mock.AsyncMock()) as save, \
+                mock.patch('api.utils.get_async_http_client', return_value=async_client):
+            response = asyncio.run(self.request(AsyncRouteView))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), json.loads(expected.content))
+        save.assert_awaited_once()
+
+    def test_concurrent_identical_requests_compute_once(self):
+        async def slow_route(start_point, end_point):
+            await asyncio.sleep(0.05)
+            return RoutingService._parse_valhalla_route(VALHALLA_RESPONSE, start_point, end_point)
+
+        saved = []
+
+        async def find_route(start_point, end_point):
+            return saved[-1] if saved else None
+
+        async def save_route(start_point, end_point, path, distance, duration, duration_text=''):
+            saved.append({'path': path, 'distance': distance, 'duration': duration, 'duration_text': duration_text,
+                          'start_point': start_point, 'end_point': end_point})
+
+        async def run():
+            return await asyncio.gather(*(self.request(AsyncRouteView) for _ in range(5)))
+
+        with mock.patch.object(MongoDBManager, 'afind_route', side_effect=find_route), \
+                mock.patch.object(MongoDBManager, 'asave_route', side_effect=save_route), \
+                mock.patch.object(RoutingService, 'aget_route', side_effect=slow_route) as compute:
+            responses = asyncio.run(run())
+
+        self.assertEqual([response.status_code for response in responses], [200] * 5)
+        self.assertEqual(compute.await_count, 1)
+
+    def test_invalid_body(self):
+        request = RequestFactory().post('/api/routes/calculate/', b'{', content_type='application/json')
+        self.assertEqual(asyncio.run(AsyncRouteView.as_view()(request)).status_code, 400)
+        self.assertEqual(asyncio.run(self.request(AsyncRouteView, {'start_point': [1]})).status_code, 400)
+
+
+class AsyncSearchLocationViewTests(SimpleTestCase):
+    def test_search(self):
+        results = [{'name': 'Bab Boujloud', 'coordinates': [-4.983, 34.061]}]
+        with mock.patch.object(LocationSearchService, 'search', return_value=results) as search:
+            request = RequestFactory().post('/api/locations/search/', {'query': 'boujloud'}, content_type='application/json')
+            response = asyncio.run(AsyncSearchLocationView.as_view()(request))
+        self.assertEqual(json.loads(response.content), results)
+        search.assert_called_once_with('boujloud', limit=10, fuzzy=False)
+
+        with mock.patch.object(LocationSearchService, 'search', return_value=[]):
+            request = RequestFactory().post('/api/locations/search/', {'query': 'rien'}, content_type='application/json')
+            self.assertEqual(asyncio.run(AsyncSearchLocationView.as_view()(request)).status_code, 404)
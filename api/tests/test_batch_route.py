@@ -0,0 +1,78 @@
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from api.models import MongoDBManager
+from api.utils import RoutingService
+
+
+def fake_route(start_point, end_point):
+    return {
+        'path': [start_point, end_point], 'distance': 100.0, 'duration': 10.0,
+        'duration_text': '0 min 10 sec', 'start_point': start_point, 'end_point': end_point,
+    }
+
+
+@override_settings(ROUTE_CACHE_SNAP='none')
+class BatchRouteViewTests(SimpleTestCase):
+    def setUp(self):
+        self.saved = []
+        cached = fake_route([-5.0, 34.0], [-4.9, 34.1])
+        cached['duration'] = 99.0
+        patches = [
+            mock.patch.object(MongoDBManager, 'find_routes', return_value={
+                MongoDBManager.route_key(cached['start_point'], cached['end_point']): cached
+            }),
+            mock.patch.object(MongoDBManager, 'save_routes', side_effect=self.saved.extend),
+            mock.patch.object(RoutingService, 'get_route', side_effect=fake_route),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_cached_and_duplicate_pairs(self):
+        routes = [
+            {'start_point': [-5.0, 34.0], 'end_point': [-4.9, 34.1]},
+            {'start_point': [-5.0, 34.05], 'end_point': [-4.95, 34.1]},
+            {'start_point': [-5.0, 34.05], 'end_point': [-4.95, 34.1]},
+            {'start_point': [-5.01, 34.0], 'end_point': [-4.9, 34.1]},
+        ]
+        response = self.client.post('/api/routes/batch/', {'routes': routes}, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()
+        self.assertEqual([result['start_point'] for result in results], [route['start_point'] for route in routes])
+        self.assertEqual(results[0]['duration'], 99.0)
+        # Paire en double calculée et enregistrée une seule fois
+        self.assertEqual(RoutingService.get_route.call_count, 2)
+        self.assertEqual(len(self.saved), 2)
+
+    def test_invalid_batch(self):
+        response = self.client.post('/api/routes/batch/', {'routes': []}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class GetRoutesTests(SimpleTestCase):
+    def test_concurrency_is_bounded_and_order_kept(self):
+        lock = threading.Lock()
+        running = []
+        peak = []
+
+        def slow_route(start_point, end_point):
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.pop()
+            return fake_route(start_point, end_point)
+
+        pairs = [([-5.0, 34.0 + i / 1000], [-4.9, 34.1]) for i in range(20)]
+        with mock.patch.object(RoutingService, 'get_route', side_effect=slow_route):
+            routes = RoutingService.get_routes(pairs, max_workers=4)
+
+        self.assertEqual([route['start_point'] for route in routes], [start for start, _ in pairs])
+        self.assertLessEqual(max(peak), 4)
+        self.assertGreater(max(peak), 1)
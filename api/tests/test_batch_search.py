@@ -0,0 +1,40 @@
+import json
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from api.search import LocationSearchService
+
+
+def fake_searcher(limit, fuzzy):
+    def search(query):
+        if query == 'boom':
+            raise RuntimeError('index en reconstruction')
+        return [{'name': query, 'coordinates': [-5.0, 34.0]}]
+    return search
+
+
+@mock.patch.object(LocationSearchService, '_searcher', staticmethod(fake_searcher))
+class BatchSearchLocationViewTests(SimpleTestCase):
+    def post(self, queries):
+        return self.client.post(
+            '/api/locations/search/batch/', {'queries': queries}, content_type='application/json'
+        )
+
+    def test_small_batch(self):
+        response = self.post(['a', 'b'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['query'] for item in response.json()], ['a', 'b'])
+
+    def test_stream_survives_query_errors(self):
+        queries = [f"lieu {i}" for i in range(300)]
+        queries[10] = queries[250] = 'boom'
+        response = self.post(queries)
+        self.assertEqual(response.status_code, 200)
+        # Recherches effectuées pendant la lecture du flux
+        with self.assertLogs('api.views', 'ERROR'):
+            items = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([item['query'] for item in items], queries)
+        self.assertIn('error', items[10])
+        self.assertIn('error', items[250])
+        self.assertEqual(items[11]['results'][0]['name'], 'lieu 11')
@@ -0,0 +1,93 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from api.circuit_breaker import CircuitBreaker
+from api.utils import RoutingService
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('api.circuit_breaker.time.monotonic', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker('test', failure_threshold=2, slow_call_seconds=1.0,
+                                      reset_timeout=30.0, probe_timeout=20.0)
+
+    def open_circuit(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+
+    def test_opens_after_threshold(self):
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow_request())
+
+    def test_slow_call_counts_as_failure(self):
+        self.breaker.record_success(elapsed=2.0)
+        self.breaker.record_success(elapsed=2.0)
+        self.assertFalse(self.breaker.allow_request())
+
+    def test_single_probe_then_close(self):
+        self.open_circuit()
+        self.now += 30
+        self.assertTrue(self.breaker.allow_request())
+        self.assertFalse(self.breaker.allow_request())
+        self.breaker.record_success(0.1)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_failed_probe_reopens(self):
+        self.open_circuit()
+        self.now += 30
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_failure()
+        self.assertFalse(self.breaker.allow_request())
+
+    def test_lost_probe_expires(self):
+        # Appel de test sans issue enregistrée (exception imprévue, annulation)
+        self.open_circuit()
+        self.now += 30
+        self.assertTrue(self.breaker.allow_request())
+        self.now += 10
+        self.assertFalse(self.breaker.allow_request())
+        self.now += 11
+        self.assertTrue(self.breaker.allow_request())
+
+
+class ValhallaBreakerTests(SimpleTestCase):
+    start, end = [-5.0, 34.03], [-4.99, 34.04]
+
+    def setUp(self):
+        # Nouveau disjoncteur pour chaque test
+        override = override_settings(
+            CIRCUIT_BREAKERS={'valhalla': {'failure_threshold': 2, 'reset_timeout': 30.0}},
+            ROUTING_PROVIDER='valhalla'
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        self.valhalla = mock.Mock()
+        self.valhalla.post.return_value = mock.Mock(status_code=503, text='busy')
+        self.valhalla.url.side_effect = lambda path: path
+        patcher = mock.patch('api.utils.get_http_client', return_value=self.valhalla)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_open_circuit_skips_valhalla(self):
+        with self.assertLogs('api.utils', 'WARNING'):
+            route = RoutingService.get_valhalla_route(self.start, self.end, max_retries=3, retry_delay=0)
+            # Le circuit s'ouvre après deux échecs : la troisième tentative n'a pas lieu
+            self.assertEqual(self.valhalla.post.call_count, 2)
+            self.assertTrue(route['fallback'])
+            RoutingService.get_valhalla_route(self.start, self.end, max_retries=3, retry_delay=0)
+        self.assertEqual(self.valhalla.post.call_count, 2)
+
+    @override_settings(ROUTING_LATENCY_BUDGET=1)
+    def test_retry_wait_beyond_budget_is_skipped(self):
+        with mock.patch('api.utils.time.sleep') as sleep, self.assertLogs('api.utils', 'WARNING'):
+            RoutingService.get_valhalla_route(self.start, self.end, max_retries=3, retry_delay=5)
+        sleep.assert_not_called()
+        self.assertEqual(self.valhalla.post.call_count, 1)
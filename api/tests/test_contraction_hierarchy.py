@@ -0,0 +1,67 @@
+import math
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from api.contraction_hierarchy import ContractionHierarchy
+
+from .road_graphs import dijkstra, grid_road_graph, path_cost
+
+
+class ContractionHierarchyTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.graph = grid_road_graph(size=12, seed=3)
+        cls.hierarchy = ContractionHierarchy.build(cls.graph)
+        cls.sources = [0, 23, 77, 130]
+        cls.reference = {source: dijkstra(cls.graph, source) for source in cls.sources}
+
+    def check_paths(self, hierarchy):
+        for source in self.sources:
+            for target in range(len(self.graph)):
+                result = hierarchy.shortest_path(source, target)
+                expected = self.reference[source].get(target)
+                if expected is None:
+                    self.assertIsNone(result)
+                    continue
+                nodes, duration, length = result
+                self.assertAlmostEqual(duration, expected, places=2, msg=(source, target))
+                # Raccourcis déroulés : chaque pas est un arc du graphe d'origine
+                self.assertEqual((nodes[0], nodes[-1]), (source, target))
+                path_duration, path_length = path_cost(self.graph, nodes)
+                self.assertAlmostEqual(path_duration, duration, places=2)
+                self.assertAlmostEqual(path_length, length, places=1)
+
+    def test_rank_is_a_permutation(self):
+        self.assertEqual(sorted(self.hierarchy.rank.tolist()), list(range(len(self.graph))))
+
+    def test_shortest_paths_match_dijkstra(self):
+        self.check_paths(self.hierarchy)
+
+    def test_low_witness_limit_stays_exact(self):
+        # Recherches de témoin tronquées : raccourcis superflus, jamais de chemin faux
+        hierarchy = ContractionHierarchy.build(self.graph, witness_limit=2)
+        self.assertGreaterEqual(len(hierarchy.arc_source), len(self.hierarchy.arc_source))
+        self.check_paths(hierarchy)
+
+    def test_many_to_many_matches_dijkstra(self):
+        targets = [1, 50, 77, 143]
+        durations, lengths = self.hierarchy.many_to_many(self.sources, targets)
+        expected = np.array([[self.reference[source].get(target, math.inf) for target in targets] for source in self.sources])
+        np.testing.assert_allclose(durations, expected, rtol=1e-5)
+        _, plain_lengths = self.graph.many_to_many(self.sources, targets)
+        np.testing.assert_allclose(lengths, plain_lengths, rtol=1e-4)
+
+    def test_disconnected_graph(self):
+        graph = grid_road_graph(size=3, seed=4, one_way=0, missing=0)
+        sources, targets, lengths, times = (array.tolist() for array in graph.edges())
+        # Nœud 9 sans aucun arc
+        graph = type(graph).from_edges(graph.node_x.tolist() + [-4.9], graph.node_y.tolist() + [34.1],
+                                       sources, targets, lengths, times)
+        hierarchy = ContractionHierarchy.build(graph)
+        self.assertIsNone(hierarchy.shortest_path(0, 9))
+        durations, _ = hierarchy.many_to_many([0, 9], [9, 8])
+        self.assertEqual(durations[0, 0], math.inf)
+        self.assertEqual(durations[1, 0], 0.0)
+        self.assertEqual(durations[1, 1], math.inf)
@@ -0,0 +1,47 @@
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from api.models import PreExtractedLocation
+from api.search import LocationSearchService
+
+
+class MatchExpressionTests(SimpleTestCase):
+    def test_last_word_is_a_prefix(self):
+        self.assertEqual(LocationSearchService.fts_match_expression('bab bou'), '"bab" "bou"*')
+
+    def test_operators_are_quoted(self):
+        self.assertEqual(LocationSearchService.fts_match_expression('rue OR "x" NEAR(a'), '"rue" "OR" "x" "NEAR" "a"*')
+        self.assertEqual(LocationSearchService.fts_match_expression('- * "'), '')
+
+
+class FtsSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for name in ['Bab Boujloud', 'Rue Bab Boujloud', 'Boulangerie Boujloud', 'Médersa Bou Inania', 'Bab Ftouh']:
+            PreExtractedLocation.objects.create(name=name, longitude=-5.0, latitude=34.03)
+
+    def setUp(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('FTS5 est propre à SQLite')
+
+    def names(self, query, limit=10):
+        return [result['name'] for result in LocationSearchService.search_fts(query, limit)]
+
+    def test_every_word_must_match(self):
+        self.assertEqual(sorted(self.names('bab boujloud')), ['Bab Boujloud', 'Rue Bab Boujloud'])
+
+    def test_prefix_and_diacritics(self):
+        self.assertEqual(self.names('medersa bou'), ['Médersa Bou Inania'])
+        self.assertIn('Boulangerie Boujloud', self.names('boul'))
+
+    def test_triggers_follow_updates_and_deletes(self):
+        location = PreExtractedLocation.objects.get(name='Bab Ftouh')
+        location.name = 'Porte Ftouh'
+        location.save()
+        self.assertEqual(self.names('porte'), ['Porte Ftouh'])
+        location.delete()
+        self.assertEqual(self.names('ftouh'), [])
+
+    def test_limit_and_empty_query(self):
+        self.assertEqual(len(self.names('boujloud', 2)), 2)
+        self.assertEqual(self.names('  '), [])
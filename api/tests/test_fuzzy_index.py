@@ -0,0 +1,87 @@
+import random
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from api.fuzzy_index import FuzzyLocationIndex, edit_distance
+from api.location_store import LocationStore
+from api.normalization import normalize_search_key
+from api.search import LocationSearchService
+from api.search_index import LocationSearchIndex
+
+
+def reference_distance(source, target):
+    # Distance OSA (transpositions adjacentes) sans seuil
+    rows = [[0] * (len(target) + 1) for _ in range(len(source) + 1)]
+    for i in range(len(source) + 1):
+        rows[i][0] = i
+    for j in range(len(target) + 1):
+        rows[0][j] = j
+    for i in range(1, len(source) + 1):
+        for j in range(1, len(target) + 1):
+            cost = 0 if source[i - 1] == target[j - 1] else 1
+            rows[i][j] = min(rows[i - 1][j] + 1, rows[i][j - 1] + 1, rows[i - 1][j - 1] + cost)
+            if i > 1 and j > 1 and source[i - 1] == target[j - 2] and source[i - 2] == target[j - 1]:
+                rows[i][j] = min(rows[i][j], rows[i - 2][j - 2] + 1)
+    return rows[-1][-1]
+
+
+def rows_for(names):
+    return [
+        (position + 1, name, -5.0 + position / 1000, 34.03, 'place', normalize_search_key(name))
+        for position, name in enumerate(sorted(names))
+    ]
+
+
+class EditDistanceTests(SimpleTestCase):
+    def test_matches_reference(self):
+        rng = random.Random(5)
+        for _ in range(2000):
+            source = ''.join(rng.choice('abcd') for _ in range(rng.randint(0, 8)))
+            target = ''.join(rng.choice('abcd') for _ in range(rng.randint(0, 8)))
+            expected = reference_distance(source, target)
+            self.assertEqual(edit_distance(source, target, 2), min(expected, 3), (source, target))
+
+    def test_transposition_costs_one(self):
+        self.assertEqual(edit_distance('boujlodu', 'boujloud', 2), 1)
+
+
+class FuzzyLocationIndexTests(SimpleTestCase):
+    def test_typos_find_the_place(self):
+        index = FuzzyLocationIndex(rows_for(['Bab Boujloud', 'Bab Ftouh', 'Place Rcif', 'Médersa Bou Inania']))
+        self.assertEqual(index.search('bab boujlod')[0]['name'], 'Bab Boujloud')
+        self.assertEqual(index.search('medresa')[0]['name'], 'Médersa Bou Inania')
+        self.assertEqual(index.search('rcfi')[0]['name'], 'Place Rcif')
+        # Mots de deux lettres : aucune faute admise
+        self.assertEqual(index.search('bz'), [])
+        self.assertEqual(index.search('bub ftouh')[0]['name'], 'Bab Ftouh')
+
+    def test_words_match_brute_force(self):
+        rng = random.Random(8)
+        names = [''.join(rng.choice('abcdef') for _ in range(rng.randint(3, 11))) for _ in range(150)]
+        index = FuzzyLocationIndex(rows_for(names), max_distance=2)
+        for _ in range(100):
+            query = ''.join(rng.choice('abcdef') for _ in range(rng.randint(3, 11)))
+            allowed = index._allowed_distance(query)
+            expected = {
+                word for word in index._words if reference_distance(query, word) <= allowed
+            }
+            found = {index._words[word_id] for word_id in index.lookup_word(query)}
+            self.assertEqual(found, expected, query)
+
+    def test_ranked_by_total_distance(self):
+        index = FuzzyLocationIndex(rows_for(['Rue Tala Kbira', 'Rue Talaa Kebira', 'Rue Talaa Sghira']))
+        names = [result['name'] for result in index.search('talaa kebira')]
+        self.assertEqual(names, ['Rue Talaa Kebira', 'Rue Tala Kbira'])
+
+
+class FuzzySearchServiceTests(SimpleTestCase):
+    @override_settings(LOCATION_SEARCH_BACKEND='index')
+    def test_fuzzy_results_follow_exact_ones(self):
+        rows = rows_for(['Bab Boujloud', 'Boujloud Café', 'Bab Boujlod'])
+        indexes = {'search': LocationSearchIndex(rows), 'fuzzy': FuzzyLocationIndex(rows)}
+        with mock.patch.object(LocationStore, 'get_index', staticmethod(indexes.__getitem__)):
+            names = [result['name'] for result in LocationSearchService.search('boujloud', 10, fuzzy=True)]
+            self.assertEqual(names, ['Boujloud Café', 'Bab Boujloud', 'Bab Boujlod'])
+            self.assertEqual(len(LocationSearchService.search('boujloud', 10)), 2)
+
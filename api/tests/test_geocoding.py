@@ -0,0 +1,80 @@
+from datetime import timedelta
+from unittest import mock
+
+import requests
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from api.models import GeocodingCacheEntry
+from api.search import LocationSearchService
+from api.utils import GeocodingService
+
+REMOTE = [{'name': 'Jnan Sbil, Fès', 'coordinates': [-4.99, 34.06], 'type': 'Point'}]
+
+
+@mock.patch.object(LocationSearchService, 'search', staticmethod(lambda query, limit=10, fuzzy=False: []))
+class GeocodingCacheTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(GeocodingService, 'search_remote', return_value=REMOTE)
+        self.remote = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_remote_answer_is_cached(self):
+        self.assertEqual(GeocodingService.search_location('Jnan Sbil'), REMOTE)
+        # Même requête après normalisation : servie par le cache
+        self.assertEqual(GeocodingService.search_location('  JNAN-SBIL '), REMOTE)
+        self.assertEqual(self.remote.call_count, 1)
+        self.assertEqual(GeocodingCacheEntry.objects.count(), 1)
+
+    def test_limit_is_part_of_the_key(self):
+        GeocodingService.search_location('Jnan Sbil', limit=5)
+        GeocodingService.search_location('Jnan Sbil', limit=1)
+        self.assertEqual(self.remote.call_count, 2)
+
+    @override_settings(GEOCODING_CACHE_TTL=3600)
+    def test_expired_entry_is_refreshed(self):
+        GeocodingService.search_location('Jnan Sbil')
+        GeocodingCacheEntry.objects.update(created_at=timezone.now() - timedelta(hours=2))
+        GeocodingService.search_location('Jnan Sbil')
+        self.assertEqual(self.remote.call_count, 2)
+        self.assertEqual(GeocodingCacheEntry.objects.count(), 1)
+
+    def test_errors_are_not_cached(self):
+        self.remote.return_value = None
+        self.assertEqual(GeocodingService.search_location('Jnan Sbil'), [])
+        self.assertFalse(GeocodingCacheEntry.objects.exists())
+
+
+class LocalFirstTests(TestCase):
+    def test_local_results_skip_remote(self):
+        local = [{'name': 'Bab Boujloud', 'coordinates': [-4.983, 34.061]}]
+        with mock.patch.object(LocationSearchService, 'search', return_value=local), \
+                mock.patch.object(GeocodingService, 'search_remote') as remote:
+            results = GeocodingService.search_location('boujloud')
+        remote.assert_not_called()
+        self.assertEqual(results, [{'name': 'Bab Boujloud', 'coordinates': [-4.983, 34.061], 'type': 'Point'}])
+
+
+class SearchRemoteTests(TestCase):
+    def client_returning(self, response):
+        client = mock.Mock()
+        client.get.return_value = response
+        return mock.patch('api.utils.get_http_client', return_value=client)
+
+    def test_parses_valid_results(self):
+        response = mock.Mock(status_code=200)
+        response.json.return_value = [
+            {'display_name': 'Jnan Sbil', 'lon': '-4.99', 'lat': '34.06'},
+            {'display_name': 'Sans coordonnées', 'lon': None, 'lat': '34.0'},
+        ]
+        with self.client_returning(response), self.assertLogs('api.utils', 'WARNING'):
+            self.assertEqual(GeocodingService.search_remote('Jnan Sbil'),
+                             [{'name': 'Jnan Sbil', 'coordinates': [-4.99, 34.06], 'type': 'Point'}])
+
+    def test_http_and_network_errors_return_none(self):
+        with self.client_returning(mock.Mock(status_code=503, text='busy')), self.assertLogs('api.utils', 'WARNING'):
+            self.assertIsNone(GeocodingService.search_remote('Jnan Sbil'))
+        client = mock.Mock()
+        client.get.side_effect = requests.exceptions.ConnectionError('refused')
+        with mock.patch('api.utils.get_http_client', return_value=client), self.assertLogs('api.utils', 'WARNING'):
+            self.assertIsNone(GeocodingService.search_remote('Jnan Sbil'))
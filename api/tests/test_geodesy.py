@@ -0,0 +1,60 @@
+import math
+import random
+import tempfile
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from api import geodesy
+from api.ml_model.data_generator import DataGenerator
+
+
+def reference_haversine(lon1, lat1, lon2, lat2):
+    # Formule scalaire d'origine (math, un segment à la fois)
+    lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * geodesy.EARTH_RADIUS * math.asin(math.sqrt(a))
+
+
+class GeodesyTests(SimpleTestCase):
+    def setUp(self):
+        rng = random.Random(3)
+        self.path = [[-5.0 + rng.uniform(-0.05, 0.05), 34.03 + rng.uniform(-0.05, 0.05)] for _ in range(50)]
+
+    def test_segment_lengths_match_scalar_formula(self):
+        expected = [reference_haversine(*a, *b) for a, b in zip(self.path, self.path[1:])]
+        np.testing.assert_allclose(geodesy.segment_lengths(self.path), expected, atol=1e-6)
+        self.assertAlmostEqual(geodesy.path_length(self.path), sum(expected), places=6)
+        self.assertEqual(geodesy.path_length(self.path[:1]), 0.0)
+
+    def test_one_degree_of_latitude(self):
+        self.assertAlmostEqual(float(geodesy.haversine(0, 0, 0, 1)), 111194.93, places=1)
+
+    def test_haversine_matrix(self):
+        matrix = geodesy.haversine_matrix(self.path[:3], self.path[3:7])
+        self.assertEqual(matrix.shape, (3, 4))
+        self.assertAlmostEqual(matrix[2, 1], reference_haversine(*self.path[2], *self.path[4]), places=6)
+
+    def test_sinuosity(self):
+        self.assertAlmostEqual(geodesy.sinuosity([[0, 0], [0, 0.01], [0, 0.02]]), 1.0, places=9)
+        self.assertGreater(geodesy.sinuosity([[0, 0], [0.01, 0.01], [0, 0.02]]), 1.4)
+        self.assertIsNone(geodesy.sinuosity([[0, 0], [0.01, 0], [0, 0]]))
+
+    def test_bearings_and_turn_angles(self):
+        square = [[0, 0], [0, 0.01], [0, 0.01], [0.01, 0.01], [0.01, 0]]
+        np.testing.assert_allclose(geodesy.bearings([[0, 0], [0, 0.01], [0.01, 0.01]]), [0, 90], atol=0.01)
+        # Le point répété ne masque pas le virage
+        np.testing.assert_allclose(geodesy.turn_angles(square), [90, 90], atol=0.01)
+
+
+class DataGeneratorTests(SimpleTestCase):
+    def test_rows_carry_real_distance_and_duration(self):
+        random.seed(5)
+        with tempfile.TemporaryDirectory() as directory:
+            df = DataGenerator(directory).generate_traffic_data(50)
+        for row in df.itertuples():
+            self.assertAlmostEqual(row.distance, reference_haversine(row.start_lon, row.start_lat, row.end_lon, row.end_lat), places=6)
+            # Vitesse 50 km/h divisée par un facteur de trafic (0,7 à 1,7), bruit et jour de semaine
+            minutes_at_50 = row.distance / 1000 / 50 * 60
+            self.assertGreater(row.duration, minutes_at_50 * 0.7 * 0.9 * 0.8 - 1e-9)
+            self.assertLess(row.duration, minutes_at_50 * 1.7 * 1.1 * 1.2 + 1e-9)
@@ -0,0 +1,119 @@
+import io
+import os
+import tempfile
+from unittest import mock
+
+import numpy as np
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from api import routing_engine
+from api.contraction_hierarchy import ContractionHierarchy
+from api.graph_storage import ALIGNMENT, MappedArrays, save_arrays
+from api.routing_engine import RoadGraph, get_road_graph
+
+from .road_graphs import grid_road_graph
+
+
+class GraphStorageTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def test_round_trip(self):
+        arrays = {
+            'offsets': np.array([0, 2, 5], dtype=np.int64),
+            'targets': np.array([1, 2, 0, 1, 2], dtype=np.int32),
+            'weights': np.array([1.5, 2.5, 3.0, 0.5, 7.25], dtype=np.float32),
+            'empty': np.array([], dtype=np.float64),
+        }
+        save_arrays(self.path('g.bin'), arrays, metadata={'place': 'Fès'})
+        mapped = MappedArrays(self.path('g.bin'))
+
+        self.assertEqual(mapped.metadata, {'place': 'Fès'})
+        for name, array in arrays.items():
+            np.testing.assert_array_equal(mapped[name], array)
+            self.assertEqual(mapped[name].dtype, array.dtype)
+            # Tableaux lus dans la projection : alignés et en lecture seule
+            self.assertFalse(mapped[name].flags.writeable)
+            if len(array):
+                self.assertEqual(mapped[name].ctypes.data % ALIGNMENT, 0)
+        self.assertNotIn('missing', mapped)
+        self.assertFalse(os.path.exists(self.path('g.bin.tmp')))
+
+    def test_rejects_other_files(self):
+        with open(self.path('other.bin'), 'wb') as output:
+            output.write(b'not a graph' * 10)
+        with self.assertRaises(ValueError):
+            MappedArrays(self.path('other.bin'))
+
+    def test_replacing_keeps_mapped_version_readable(self):
+        save_arrays(self.path('g.bin'), {'a': np.arange(10)})
+        mapped = MappedArrays(self.path('g.bin'))
+        save_arrays(self.path('g.bin'), {'a': np.arange(5)})
+        np.testing.assert_array_equal(mapped['a'], np.arange(10))
+        np.testing.assert_array_equal(MappedArrays(self.path('g.bin'))['a'], np.arange(5))
+
+    def test_graph_and_hierarchy_round_trip(self):
+        graph = grid_road_graph(size=6, seed=5)
+        graph.save(self.path('graph.bin'))
+        loaded = RoadGraph.load(self.path('graph.bin'))
+        for name in RoadGraph.ARRAYS:
+            np.testing.assert_array_equal(getattr(loaded, name), getattr(graph, name))
+        self.assertEqual(loaded.shortest_path(0, 35), graph.shortest_path(0, 35))
+
+        hierarchy = ContractionHierarchy.build(graph)
+        hierarchy.save(self.path('ch.bin'))
+        self.assertEqual(ContractionHierarchy.load(self.path('ch.bin')).shortest_path(0, 35),
+                         hierarchy.shortest_path(0, 35))
+
+
+class GetRoadGraphTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.graph_path = os.path.join(directory.name, 'graph.bin')
+        self.hierarchy_path = os.path.join(directory.name, 'ch.bin')
+        override = override_settings(ROAD_GRAPH_PATH=self.graph_path, ROAD_GRAPH_CH_PATH=self.hierarchy_path)
+        override.enable()
+        self.addCleanup(override.disable)
+        patcher = mock.patch.object(routing_engine, '_road_graph', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_missing_graph(self):
+        with self.assertLogs('api.routing_engine', 'WARNING'):
+            self.assertIsNone(get_road_graph())
+
+    def test_hierarchy_built_by_command_is_attached(self):
+        grid_road_graph(size=5, seed=6).save(self.graph_path)
+        call_command('build_contraction_hierarchy', graph=self.graph_path, output=self.hierarchy_path, stdout=io.StringIO())
+        graph = get_road_graph()
+        self.assertIsNotNone(graph.hierarchy)
+        self.assertIs(get_road_graph(), graph)
+
+    def test_hierarchy_of_another_graph_is_ignored(self):
+        grid_road_graph(size=5, seed=6).save(self.graph_path)
+        ContractionHierarchy.build(grid_road_graph(size=4, seed=6)).save(self.hierarchy_path)
+        with self.assertLogs('api.routing_engine', 'WARNING'):
+            graph = get_road_graph()
+        self.assertIsNone(graph.hierarchy)
+
+    def test_hierarchy_of_a_same_size_graph_is_ignored(self):
+        # Graphe reconstruit (autre extraction, même nombre de nœuds) sans relancer la contraction
+        grid_road_graph(size=5, seed=6).save(self.graph_path)
+        call_command('build_contraction_hierarchy', graph=self.graph_path, output=self.hierarchy_path, stdout=io.StringIO())
+        grid_road_graph(size=5, seed=7).save(self.graph_path)
+        self.assertEqual(len(ContractionHierarchy.load(self.hierarchy_path)), 25)
+        with self.assertLogs('api.routing_engine', 'WARNING'):
+            graph = get_road_graph()
+        self.assertIsNone(graph.hierarchy)
+
+    def test_hierarchy_keeps_graph_fingerprint(self):
+        graph = grid_road_graph(size=4, seed=6)
+        ContractionHierarchy.build(graph).save(self.hierarchy_path)
+        self.assertEqual(ContractionHierarchy.load(self.hierarchy_path).graph_fingerprint, graph.fingerprint)
@@ -0,0 +1,63 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.test import SimpleTestCase, override_settings
+
+from api.http_client import HttpClient, get_http_client
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.peers.add(self.client_address)
+        status = 503 if self.path == '/busy' else 200
+        self.send_response(status)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, *args):
+        pass
+
+
+class HttpClientTests(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.peers = set()
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}/"
+
+    def test_pool_does_not_block_by_default(self):
+        # requests n'a pas de délai d'attente du pool : un pool bloquant plein
+        # bloquerait l'appel sans limite
+        client = HttpClient('test', 'http://127.0.0.1:1/', pool_maxsize=2)
+        self.addCleanup(client.close)
+        adapter = client.session.get_adapter('http://127.0.0.1:1/')
+        self.assertFalse(adapter._pool_block)
+        self.assertEqual(client.url('/route'), 'http://127.0.0.1:1/route')
+
+    def test_connection_is_kept_alive(self):
+        client = HttpClient('test', self.base_url)
+        self.addCleanup(client.close)
+        for _ in range(5):
+            self.assertEqual(client.get('/route').status_code, 200)
+        self.assertEqual(len(self.server.peers), 1)
+
+    def test_stats_count_server_errors(self):
+        client = HttpClient('test', self.base_url)
+        self.addCleanup(client.close)
+        client.get('/route')
+        client.get('/busy')
+        snapshot = client.stats.snapshot()
+        self.assertEqual((snapshot['count'], snapshot['errors']), (2, 1))
+
+    def test_one_client_per_service(self):
+        with override_settings(HTTP_SERVICES={'valhalla': {'base_url': self.base_url}}):
+            client = get_http_client('valhalla')
+            self.assertIs(get_http_client('valhalla'), client)
+            self.assertEqual(client.base_url, self.base_url.rstrip('/'))
+        self.assertIsNot(get_http_client('valhalla'), client)
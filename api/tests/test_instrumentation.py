@@ -0,0 +1,71 @@
+import asyncio
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from api import instrumentation
+from api.instrumentation import Histogram, counters, increment, observe, request_trace, stage_histograms, timed
+
+
+class HistogramTests(SimpleTestCase):
+    def test_cumulative_buckets(self):
+        histogram = Histogram(buckets=(0.1, 1))
+        for seconds in (0.05, 0.1, 0.5, 1, 3):
+            histogram.observe(seconds)
+        snapshot = histogram.snapshot()
+        # Une durée égale à une borne compte dans son intervalle (le <= de Prometheus)
+        self.assertEqual(snapshot['buckets'], [(0.1, 2), (1, 4), ('+Inf', 5)])
+        self.assertEqual(snapshot['count'], 5)
+        self.assertAlmostEqual(snapshot['sum'], 4.65)
+
+
+class TimingTests(SimpleTestCase):
+    def test_timed_records_failed_blocks(self):
+        with mock.patch('api.instrumentation.time.perf_counter', side_effect=[10.0, 10.25]):
+            with self.assertRaises(RuntimeError), timed('test_failed_block'):
+                raise RuntimeError('Valhalla')
+        snapshot = stage_histograms()['test_failed_block']
+        self.assertEqual((snapshot['count'], snapshot['sum']), (1, 0.25))
+
+    def test_trace_collects_stages_of_the_request(self):
+        observe('test_outside', 1.0)
+        with self.assertLogs('api.instrumentation', 'DEBUG') as logs, request_trace('POST /api/routes/calculate/') as trace:
+            observe('test_stage', 0.002)
+            observe('test_stage', 0.003)
+        self.assertEqual(list(trace), ['test_stage'])
+        self.assertAlmostEqual(trace['test_stage'], 0.005)
+        self.assertIn('POST /api/routes/calculate/', logs.output[0])
+        self.assertIn('test_stage=5.0ms', logs.output[0])
+
+    def test_traces_are_isolated_between_tasks(self):
+        async def handle(stage):
+            with request_trace(stage) as trace:
+                observe(stage, 0.01)
+                await asyncio.sleep(0.01)
+                observe(stage, 0.01)
+            return trace
+
+        async def run():
+            return await asyncio.gather(handle('test_task_a'), handle('test_task_b'))
+
+        first, second = asyncio.run(run())
+        self.assertEqual(list(first), ['test_task_a'])
+        self.assertEqual(list(second), ['test_task_b'])
+        self.assertIsNone(instrumentation._current_trace.get())
+
+
+class CounterTests(SimpleTestCase):
+    def test_labels_are_order_independent(self):
+        increment('test_events_total', endpoint='matrix', status=200)
+        increment('test_events_total', 2, status='200', endpoint='matrix')
+        key = ('test_events_total', (('endpoint', 'matrix'), ('status', '200')))
+        self.assertEqual(counters()[key], 3)
+
+    def test_middleware_counts_requests_by_route(self):
+        key = ('requests_total', (('endpoint', 'route-matrix'), ('method', 'POST'), ('status', '400')))
+        before = counters().get(key, 0)
+        # Pas de thread d'écriture des métriques pendant les tests
+        with mock.patch('route_finder.middleware.start_flusher') as start_flusher:
+            self.client.post('/api/routes/matrix/', {}, content_type='application/json')
+        start_flusher.assert_called_once_with()
+        self.assertEqual(counters()[key], before + 1)
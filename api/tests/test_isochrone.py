@@ -0,0 +1,96 @@
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+
+from api.geodesy import haversine
+from api.isochrone import _trace_polygons, circle_polygon, grid_contours
+from api.utils import TrafficDataService
+
+from .road_graphs import grid_road_graph
+
+
+def inside(ring, x, y):
+    # Lancer de rayon sur un anneau fermé
+    result = False
+    for (x1, y1), (x2, y2) in zip(ring, ring[1:]):
+        if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+            result = not result
+    return result
+
+
+def covered(polygons, x, y):
+    return sum(
+        inside(polygon[0], x, y) and not any(inside(hole, x, y) for hole in polygon[1:])
+        for polygon in polygons
+    )
+
+
+class TracePolygonsTests(SimpleTestCase):
+    def test_polygons_reproduce_random_masks(self):
+        # Chaque cellule pleine est dans exactement un polygone (hors de ses trous), aucune vide
+        for seed in range(150):
+            rng = np.random.default_rng(seed)
+            mask = rng.random((rng.integers(1, 10), rng.integers(1, 10))) < rng.uniform(0.2, 0.8)
+            polygons = _trace_polygons(mask)
+            for (row, column), full in np.ndenumerate(mask):
+                self.assertEqual(covered(polygons, column + 0.5, row + 0.5), int(full), (seed, row, column))
+
+    def test_ring_with_hole_and_diagonal_cells(self):
+        ring = np.ones((3, 3), dtype=bool)
+        ring[1, 1] = False
+        [[outer, hole]] = _trace_polygons(ring)
+        self.assertEqual(outer, [(0, 0), (3, 0), (3, 3), (0, 3), (0, 0)])
+        self.assertEqual(len(hole), 5)
+
+        # Deux cellules ne se touchant que par un sommet : deux polygones
+        diagonal = np.array([[True, False], [False, True]])
+        self.assertEqual(len(_trace_polygons(diagonal)), 2)
+
+
+class GridContoursTests(SimpleTestCase):
+    def test_nested_thresholds_cover_reached_nodes(self):
+        rng = np.random.default_rng(3)
+        lons = -5.0 + rng.uniform(0, 0.02, 300)
+        lats = 34.03 + rng.uniform(0, 0.02, 300)
+        times = rng.uniform(0, 900, 300)
+        small, large = grid_contours(lons, lats, times, [300, 900], cell_size=100)
+
+        for lon, lat, time in zip(lons, lats, times):
+            self.assertEqual(covered(large, lon, lat), 1)
+            if time <= 300:
+                self.assertEqual(covered(small, lon, lat), 1)
+        # Zone du petit seuil incluse dans celle du grand
+        for lon in np.linspace(-5.002, -4.978, 40):
+            for lat in np.linspace(34.028, 34.052, 40):
+                if covered(small, lon, lat):
+                    self.assertEqual(covered(large, lon, lat), 1)
+
+    def test_empty(self):
+        self.assertEqual(grid_contours([], [], [], [600, 900]), [[], []])
+
+    def test_circle_polygon(self):
+        [ring] = circle_polygon([-5.0, 34.03], 1000)
+        self.assertEqual(ring[0], ring[-1])
+        distances = haversine(-5.0, 34.03, np.array(ring)[:, 0], np.array(ring)[:, 1])
+        np.testing.assert_allclose(distances, 1000, rtol=2e-3)
+
+
+@override_settings(ROUTING_PROVIDER='local', ISOCHRONE_CELL_SIZE=50)
+class IsochroneViewTests(SimpleTestCase):
+    def test_local_isochrone(self):
+        graph = grid_road_graph(size=10, seed=9)
+        center = [float(graph.node_x[44]), float(graph.node_y[44])]
+        with mock.patch('api.routing_engine.get_road_graph', return_value=graph), \
+                mock.patch.object(TrafficDataService, 'get_traffic_factor', return_value=1.0):
+            response = self.client.post('/api/routes/isochrone/', {'point': center, 'minutes': [1, 2]},
+                                        content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        self.assertEqual(result['provider'], 'local')
+        self.assertEqual([contour['minutes'] for contour in result['contours']], [1, 2])
+        settled = graph.search(44, max_duration=120)
+        for node, (duration, _) in settled.items():
+            self.assertEqual(covered(result['contours'][1]['polygons'], graph.node_x[node], graph.node_y[node]), 1)
+        self.assertEqual(covered(result['contours'][0]['polygons'], *center), 1)
@@ -0,0 +1,112 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from api import metrics
+
+
+def state(requests, seconds):
+    return {
+        'counters': [['requests_total', [['endpoint', 'calculate-route']], requests]],
+        'histograms': {'request': {
+            'buckets': [[0.1, requests], [1.0, requests], ['+Inf', requests]],
+            'count': requests, 'sum': seconds,
+        }},
+    }
+
+
+class MetricsTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(METRICS_DIR=directory.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        environ = mock.patch.dict(os.environ, {metrics.INSTANCE_ENV: 'gunicorn-1'})
+        environ.start()
+        self.addCleanup(environ.stop)
+        self.base = directory.name
+        self.directory = os.path.join(directory.name, 'gunicorn-1')
+        os.makedirs(self.directory)
+        # État en mémoire de ce processus ignoré
+        local = mock.patch.object(metrics, 'local_state', lambda: {'counters': [], 'histograms': {}})
+        local.start()
+        self.addCleanup(local.stop)
+
+    def write(self, name, content):
+        with open(os.path.join(self.directory, name), 'w') as f:
+            json.dump(content, f)
+
+    def test_collect_sums_workers_and_archive(self):
+        self.write('101.json', state(2, 0.5))
+        self.write('102.json', state(3, 1.0))
+        metrics.retire(101)
+        self.assertEqual(sorted(os.listdir(self.directory)), ['.lock', '102.json', 'archive.json'])
+
+        collected = metrics.collect()
+        self.assertEqual(collected['counters'], [['requests_total', [['endpoint', 'calculate-route']], 5]])
+        self.assertEqual(collected['histograms']['request']['count'], 5)
+        self.assertEqual(collected['histograms']['request']['buckets'][-1], ['+Inf', 5])
+
+    def test_instances_are_isolated(self):
+        self.write('101.json', state(2, 0.5))
+        other = os.path.join(self.base, 'gunicorn-2')
+        os.makedirs(other)
+        with open(os.path.join(other, '201.json'), 'w') as f:
+            json.dump(state(7, 1.0), f)
+        self.assertEqual(metrics.collect()['counters'][0][2], 2)
+
+        metrics.remove_instance()
+        self.assertFalse(os.path.exists(self.directory))
+        self.assertTrue(os.path.exists(other))
+
+    def test_render(self):
+        text = metrics.render(state(2, 0.5))
+        self.assertIn('# TYPE route_finder_requests_total counter', text)
+        self.assertIn('route_finder_requests_total{endpoint="calculate-route"} 2', text)
+        self.assertIn('route_finder_stage_duration_seconds_bucket{stage="request",le="+Inf"} 2', text)
+        self.assertIn('route_finder_stage_duration_seconds_sum{stage="request"} 0.5', text)
+
+
+class NoInstanceMetricsTests(SimpleTestCase):
+    """
+    Processus lancés sans maître gunicorn (runserver, uvicorn --workers N)
+    """
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(METRICS_DIR=directory.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        environ = mock.patch.dict(os.environ)
+        environ.start()
+        self.addCleanup(environ.stop)
+        os.environ.pop(metrics.INSTANCE_ENV, None)
+        local = mock.patch.object(metrics, 'local_state', lambda: {'counters': [], 'histograms': {}})
+        local.start()
+        self.addCleanup(local.stop)
+        self.directory = directory.name
+
+    def write(self, pid, content):
+        with open(os.path.join(self.directory, f"{pid}.json"), 'w') as f:
+            json.dump(content, f)
+
+    def test_files_of_exited_processes_are_dropped(self):
+        exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+        exited.wait()
+        self.write(exited.pid, state(5, 1.0))
+        self.write(os.getppid(), state(2, 0.5))
+
+        collected = metrics.collect()
+
+        self.assertEqual(collected['counters'], [['requests_total', [['endpoint', 'calculate-route']], 2]])
+        self.assertEqual(sorted(os.listdir(self.directory)), ['.lock', f"{os.getppid()}.json"])
+
+    def test_flush_writes_in_metrics_dir(self):
+        metrics.flush()
+        self.assertTrue(os.path.exists(os.path.join(self.directory, f"{os.getpid()}.json")))
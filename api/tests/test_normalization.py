@@ -0,0 +1,42 @@
+from django.test import SimpleTestCase, TestCase
+
+from api.models import PreExtractedLocation
+from api.normalization import normalize_search_key
+from api.search import LocationSearchService
+
+
+class NormalizeSearchKeyTests(SimpleTestCase):
+    def test_latin_names(self):
+        self.assertEqual(normalize_search_key('Bāb Bou-Jeloud'), 'bab bou jeloud')
+        self.assertEqual(normalize_search_key("  Rue de l'Équité__2 "), 'rue de l equite 2')
+        self.assertEqual(normalize_search_key('STRASSE'), normalize_search_key('straße'))
+
+    def test_arabic_variants(self):
+        self.assertEqual(normalize_search_key('مدرسة'), normalize_search_key('مدرسه'))
+        self.assertEqual(normalize_search_key('أحمد'), normalize_search_key('احمد'))
+        self.assertEqual(normalize_search_key('مصطفى'), normalize_search_key('مصطفي'))
+        self.assertEqual(normalize_search_key('فـاس'), 'فاس')
+        self.assertEqual(normalize_search_key('شارع ٢٠'), 'شارع 20')
+
+    def test_empty(self):
+        self.assertEqual(normalize_search_key(None), '')
+        self.assertEqual(normalize_search_key(' - '), '')
+
+
+class SearchKeyOrmTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for name in ['Café Clock', 'Le Café Central', 'Cafétéria', 'Bab Ftouh', 'مدرسة العطارين']:
+            PreExtractedLocation.objects.create(name=name, longitude=-5.0, latitude=34.03)
+
+    def test_save_computes_search_key(self):
+        self.assertEqual(PreExtractedLocation.objects.get(name='Café Clock').search_key, 'cafe clock')
+
+    def test_prefix_then_substring(self):
+        names = [result['name'] for result in LocationSearchService.search_orm('CAFE')]
+        self.assertEqual(names, ['Café Clock', 'Cafétéria', 'Le Café Central'])
+        self.assertEqual(len(LocationSearchService.search_orm('cafe', 2)), 2)
+
+    def test_arabic_query_variant(self):
+        names = [result['name'] for result in LocationSearchService.search_orm('مدرسه')]
+        self.assertEqual(names, ['مدرسة العطارين'])
@@ -0,0 +1,82 @@
+import random
+
+from django.test import SimpleTestCase
+
+from api import polyline
+from api.views import RouteView
+
+
+def reference_encode(coordinates, precision=6):
+    # Algorithme de référence, une valeur à la fois
+    factor = 10 ** precision
+    output = []
+    previous = (0, 0)
+    for lon, lat in coordinates:
+        current = (round(lat * factor), round(lon * factor))
+        for value in (current[0] - previous[0], current[1] - previous[1]):
+            value = ~(value << 1) if value < 0 else value << 1
+            while value >= 0x20:
+                output.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            output.append(chr(value + 63))
+        previous = current
+    return ''.join(output)
+
+
+def random_path(rng, count):
+    lon, lat = rng.uniform(-180, 180), rng.uniform(-85, 85)
+    path = []
+    for _ in range(count):
+        # Pas de route (quelques mètres), points répétés et grands sauts
+        step = rng.choice([0.0, 1e-5, 1e-3, 5.0])
+        lon = max(-180.0, min(180.0, lon + rng.uniform(-step, step)))
+        lat = max(-85.0, min(85.0, lat + rng.uniform(-step, step)))
+        path.append([lon, lat])
+    return path
+
+
+class PolylineTests(SimpleTestCase):
+    def test_known_vector(self):
+        # Exemple de la documentation du format (précision 5)
+        path = [[-120.2, 38.5], [-120.95, 40.7], [-126.453, 43.252]]
+        self.assertEqual(polyline.encode(path, precision=5), '_p~iF~ps|U_ulLnnqC_mqNvxq`@')
+        self.assertEqual(polyline.decode('_p~iF~ps|U_ulLnnqC_mqNvxq`@', precision=5).tolist(), path)
+
+    def test_matches_reference_encoder(self):
+        rng = random.Random(13)
+        for _ in range(200):
+            path = random_path(rng, rng.randint(1, 60))
+            for precision in (5, 6):
+                encoded = polyline.encode(path, precision)
+                self.assertEqual(encoded, reference_encode(path, precision))
+                decoded = polyline.decode(encoded, precision)
+                self.assertEqual(decoded.shape, (len(path), 2))
+                for point, expected in zip(decoded.tolist(), path):
+                    self.assertAlmostEqual(point[0], expected[0], delta=0.51 / 10 ** precision)
+                    self.assertAlmostEqual(point[1], expected[1], delta=0.51 / 10 ** precision)
+
+    def test_empty_and_invalid(self):
+        self.assertEqual(polyline.encode([]), '')
+        self.assertEqual(polyline.decode('').shape, (0, 2))
+        encoded = polyline.encode([[-5.0, 34.03], [-4.99, 34.04]])
+        for invalid in (encoded[:-1], encoded[:1], 'abc\x10'):
+            with self.assertRaises(ValueError):
+                polyline.decode(invalid)
+
+
+class PolylineResponseTests(SimpleTestCase):
+    def setUp(self):
+        self.path = [[-5.0, 34.03], [-4.995, 34.035], [-4.99, 34.04]]
+        self.route = {'path': self.path, 'distance': 1400.0, 'polyline': 'valhalla'}
+
+    def test_valhalla_polyline_is_reused_for_full_path(self):
+        data = RouteView.format_response(self.route, {'format': 'polyline6'})
+        self.assertEqual(data['polyline'], 'valhalla')
+        self.assertNotIn('path', data)
+
+    def test_polyline_is_encoded_otherwise(self):
+        data = RouteView.format_response(dict(self.route, polyline=None), {'format': 'polyline6'})
+        self.assertEqual(data['polyline'], reference_encode(self.path))
+        data = RouteView.format_response(self.route, {'format': 'coordinates'})
+        self.assertEqual(data['path'], self.path)
+        self.assertNotIn('polyline', data)
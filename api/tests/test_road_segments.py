@@ -0,0 +1,41 @@
+from django.test import SimpleTestCase
+
+from api.road_segments import is_road_segment, merge_road_segments
+
+
+def edge(name, start, end):
+    return {'name': name, 'coordinates': [start, end], 'type': 'residential'}
+
+
+class MergeRoadSegmentsTests(SimpleTestCase):
+    def test_connected_edges_become_one_street(self):
+        edges = [
+            edge('Rue Talaa', [-5.0, 34.0], [-5.0, 34.001]),
+            # Même arête dans l'autre sens (réseau non orienté)
+            edge('Rue Talaa', [-5.0, 34.001], [-5.0, 34.0]),
+            edge('Rue Talaa', [-5.0, 34.001], [-4.999, 34.002]),
+        ]
+        [street] = merge_road_segments(edges)
+        self.assertEqual(street['segments'], 3)
+        self.assertEqual(street['bbox'], [-5.0, 34.0, -4.999, 34.002])
+        # Sommet de la rue le plus proche du centre de l'emprise
+        self.assertEqual(street['coordinates'], [-5.0, 34.001])
+        self.assertEqual(street['type'], 'residential')
+
+    def test_homonyms_without_common_point_stay_apart(self):
+        edges = [
+            edge('Rue 12', [-5.0, 34.0], [-5.0, 34.001]),
+            edge('Rue 12', [-4.9, 34.1], [-4.9, 34.101]),
+            # Relie deux arêtes arrivées dans un ordre défavorable
+            edge('Rue 12', [-5.0, 34.002], [-5.0, 34.003]),
+            edge('Rue 12', [-5.0, 34.001], [-5.0, 34.002]),
+        ]
+        streets = merge_road_segments(edges)
+        self.assertEqual(sorted(street['segments'] for street in streets), [1, 3])
+
+    def test_other_entries_are_kept(self):
+        place = {'name': 'Bab Boujloud', 'coordinates': [-4.983, 34.061], 'type': 'place'}
+        unnamed = edge('', [-5.0, 34.0], [-5.0, 34.001])
+        self.assertEqual(merge_road_segments([place, unnamed]), [place, unnamed])
+        self.assertFalse(is_road_segment(place))
+        self.assertTrue(is_road_segment(unnamed))
@@ -0,0 +1,166 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from api.geodesy import haversine, path_length
+from api.models import MongoDBManager
+from api.route_cache import fit_route, fits_route, max_offset, point_key
+from api.routing_engine import RoadGraph
+from api.utils import RoutingService
+
+from .road_graphs import grid_road_graph
+
+
+def meridian(*latitudes):
+    return [[-5.0, latitude] for latitude in latitudes]
+
+
+class PointKeyTests(SimpleTestCase):
+    @override_settings(ROUTE_CACHE_SNAP='grid', ROUTE_CACHE_GRID_PRECISION=4)
+    def test_grid_merges_serialization_noise(self):
+        self.assertEqual(point_key([-5.0, 34.03]), point_key([-5.00000001, 34.0300004]))
+        self.assertEqual(point_key([-0.00001, 0.0]), point_key([0.00001, 0.0]))
+        self.assertNotEqual(point_key([-5.0, 34.03]), point_key([-5.0, 34.031]))
+
+    @override_settings(ROUTE_CACHE_SNAP='none')
+    def test_none_keeps_exact_coordinates(self):
+        self.assertNotEqual(point_key([-5.0, 34.03]), point_key([-5.00000001, 34.03]))
+
+
+class NodeKeyTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'graph.bin')
+        override = override_settings(ROAD_GRAPH_PATH=self.path, ROUTE_CACHE_SNAP='node', ROUTE_CACHE_NODE_RADIUS=50)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def key(self, graph, point):
+        with mock.patch('api.routing_engine.get_road_graph', return_value=graph):
+            return point_key(point)
+
+    def test_key_belongs_to_the_graph(self):
+        graph = grid_road_graph(size=6, seed=0)
+        graph.save(self.path)
+        loaded = RoadGraph.load(self.path)
+        point = [float(graph.node_x[7]), float(graph.node_y[7])]
+
+        self.assertEqual(loaded.fingerprint, graph.fingerprint)
+        self.assertEqual(self.key(loaded, point), f"n{graph.fingerprint}:7")
+        # Nouvelle extraction : le nœud 7 est un autre carrefour
+        rebuilt = grid_road_graph(size=6, seed=1)
+        self.assertNotEqual(rebuilt.fingerprint, graph.fingerprint)
+        self.assertNotEqual(self.key(rebuilt, point), self.key(loaded, point))
+
+    def test_far_point_falls_back_to_grid(self):
+        graph = grid_road_graph(size=6, seed=0)
+        graph.save(self.path)
+        self.assertEqual(self.key(graph, [-4.9, 34.03]), '-4.9000,34.0300')
+
+
+class FitsRouteTests(SimpleTestCase):
+    def route(self, start_point, end_point):
+        return {'path': [start_point, end_point], 'start_point': start_point, 'end_point': end_point}
+
+    @override_settings(ROUTE_CACHE_SNAP='grid', ROUTE_CACHE_GRID_PRECISION=4)
+    def test_grid_allows_one_cell_diagonal(self):
+        diagonal = max_offset(34.03)
+        self.assertAlmostEqual(diagonal, float(haversine(-5.0, 34.03, -4.9999, 34.0301)), delta=0.1)
+        route = self.route([-5.00004, 34.03004], [-4.9, 34.1])
+        self.assertTrue(fits_route(route, [-4.99996, 34.02996], [-4.9, 34.1]))
+        self.assertFalse(fits_route(route, [-5.0, 34.0302], [-4.9, 34.1]))
+        self.assertFalse(fits_route(route, [-5.00004, 34.03004], [-4.8, 34.1]))
+
+    @override_settings(ROUTE_CACHE_SNAP='node', ROUTE_CACHE_NODE_RADIUS=50)
+    def test_node_allows_twice_the_radius(self):
+        self.assertEqual(max_offset(34.03), 100)
+        route = self.route([-5.0, 34.03], [-4.9, 34.1])
+        self.assertTrue(fits_route(route, [-5.0, 34.0308], [-4.9, 34.1]))
+        self.assertFalse(fits_route(route, [-5.0, 34.0310], [-4.9, 34.1]))
+
+    @override_settings(ROUTE_CACHE_SNAP='none')
+    def test_none_requires_same_points(self):
+        route = self.route([-5.0, 34.03], [-4.9, 34.1])
+        self.assertTrue(fits_route(route, [-5.0, 34.03], [-4.9, 34.1]))
+        self.assertFalse(fits_route(route, [-5.0, 34.03001], [-4.9, 34.1]))
+
+
+@override_settings(ROUTE_CACHE_SNAP='node', ROUTE_CACHE_NODE_RADIUS=50)
+class StaleCachedRouteTests(SimpleTestCase):
+    def test_far_cached_route_is_a_miss(self):
+        start, end = [-5.0, 34.03], [-4.99, 34.04]
+        # Même clé, mais enregistré pour un carrefour à ~1 km
+        stale = {
+            'path': [[-5.0, 34.02], end], 'distance': 2000.0, 'duration': 200.0,
+            'duration_text': '3 min 20 sec', 'start_point': [-5.0, 34.02], 'end_point': end,
+        }
+        computed = {'path': [start, end], 'distance': 1400.0, 'duration': 140.0, 'duration_text': '2 min 20 sec'}
+        with mock.patch.object(MongoDBManager, 'find_route', return_value=stale), \
+                mock.patch.object(MongoDBManager, 'save_route') as save_route, \
+                mock.patch.object(RoutingService, 'get_route', return_value=computed):
+            response = self.client.post(
+                '/api/routes/calculate/', {'start_point': start, 'end_point': end}, content_type='application/json'
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['distance'], 1400.0)
+        save_route.assert_called_once()
+
+
+class FitRouteTests(SimpleTestCase):
+    def route(self, path, start_point, end_point, extra=0.0):
+        # Distance routière = longueur du tracé + extra (écart entre Valhalla et la géométrie)
+        distance = path_length(path) + extra
+        return {
+            'path': path, 'start_point': start_point, 'end_point': end_point,
+            'distance': distance, 'duration': distance / 10, 'duration_text': '',
+            'polyline': 'abc',
+        }
+
+    def test_same_endpoints_returns_route(self):
+        route = self.route(meridian(34.0, 34.01), [-5.0, 34.0], [-5.0, 34.01])
+        self.assertIs(fit_route(route, [-5.0, 34.0], [-5.0, 34.01]), route)
+
+    def test_connectors_are_added_to_road_snapped_path(self):
+        # Tracé Valhalla : ses extrémités sont les points rattachés à la route,
+        # pas les points demandés
+        path = meridian(34.000, 34.005, 34.010, 34.015)
+        route = self.route(path, [-5.0005, 33.9995], [-5.0005, 34.0155], extra=25.0)
+        start, end = [-5.0004, 33.9996], [-4.9996, 34.0154]
+
+        fitted = fit_route(route, start, end)
+
+        self.assertEqual(fitted['path'], [start] + path + [end])
+        expected = route['distance'] + path_length([start, path[0]]) + path_length([path[-1], end])
+        self.assertAlmostEqual(fitted['distance'], expected, places=6)
+        self.assertAlmostEqual(fitted['duration'], expected / 10, places=6)
+        self.assertNotIn('polyline', fitted)
+        self.assertEqual(fitted['start_point'], start)
+
+    def test_requested_endpoints_are_replaced(self):
+        # Tracé du moteur local : il commence et finit aux anciens points demandés
+        old_start, old_end = [-5.0003, 33.9998], [-5.0002, 34.0152]
+        path = [old_start] + meridian(34.000, 34.005, 34.010, 34.015) + [old_end]
+        route = self.route(path, old_start, old_end, extra=25.0)
+        start, end = [-4.9998, 33.9997], [-5.0001, 34.0151]
+
+        fitted = fit_route(route, start, end)
+
+        self.assertEqual(fitted['path'], [start] + path[1:-1] + [end])
+        self.assertAlmostEqual(fitted['distance'], path_length(fitted['path']) + 25.0, places=6)
+
+    def test_short_path(self):
+        old_start, old_end = [-5.0, 34.0], [-5.0, 34.001]
+        route = self.route([old_start, old_end], old_start, old_end)
+        fitted = fit_route(route, [-5.0, 34.0001], [-5.0, 34.0011])
+        self.assertAlmostEqual(fitted['distance'], path_length(fitted['path']), places=6)
+
+    def test_simplified_levels_are_fitted(self):
+        path = meridian(34.000, 34.005, 34.010)
+        route = self.route(path, [-5.001, 34.0], [-5.001, 34.01])
+        route['simplified_paths'] = {'12': [path[0], path[-1]]}
+        fitted = fit_route(route, [-5.0011, 34.0], [-5.0011, 34.01])
+        self.assertEqual(fitted['simplified_paths']['12'], [[-5.0011, 34.0], path[0], path[-1], [-5.0011, 34.01]])
@@ -0,0 +1,86 @@
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+
+from api.utils import RoutingService, TrafficDataService
+
+from .road_graphs import grid_road_graph
+
+
+def valhalla_matrix(payload):
+    # Réponse sources_to_targets : 60 s et 1 km par indice de source et de destination
+    rows = [
+        [
+            {'from_index': i, 'to_index': j, 'time': 60.0 * (i + j + 1), 'distance': float(i + j + 1)}
+            for j in range(len(payload['targets']))
+        ]
+        for i in range(len(payload['sources']))
+    ]
+    return mock.Mock(status_code=200, json=mock.Mock(return_value={'sources_to_targets': rows}))
+
+
+class RouteMatrixTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(TrafficDataService, 'get_traffic_factor', return_value=1.2)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        override = override_settings(CIRCUIT_BREAKERS={'valhalla': {}})
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def post(self, sources, targets):
+        return self.client.post('/api/routes/matrix/', {'sources': sources, 'targets': targets},
+                                content_type='application/json')
+
+    @override_settings(ROUTING_PROVIDER='local')
+    def test_local_matrix(self):
+        graph = grid_road_graph(size=6, seed=7)
+        points = [[float(graph.node_x[node]), float(graph.node_y[node])] for node in (0, 14, 35)]
+        with mock.patch('api.routing_engine.get_road_graph', return_value=graph):
+            response = self.post(points[:2], points)
+
+        self.assertEqual(response.status_code, 200)
+        matrix = response.json()
+        durations, distances = graph.many_to_many([0, 14], [0, 14, 35])
+        np.testing.assert_allclose(matrix['durations'], np.round(durations * 1.2, 1))
+        np.testing.assert_allclose(matrix['distances'], np.round(distances, 1))
+        self.assertEqual((matrix['provider'], matrix['traffic_factor']), ('local', 1.2))
+
+    @override_settings(ROUTING_PROVIDER='valhalla', VALHALLA_MATRIX_MAX_PAIRS=4)
+    def test_valhalla_sources_are_batched(self):
+        valhalla = mock.Mock()
+        valhalla.post.side_effect = lambda path, json, timeout: valhalla_matrix(json)
+        sources = [[-5.0, 34.03], [-5.01, 34.03], [-5.02, 34.03]]
+        with mock.patch('api.utils.get_http_client', return_value=valhalla):
+            matrix = RoutingService.get_matrix(sources, sources[:2], hour_of_day=10)
+
+        # 4 paires par appel : deux sources, puis la dernière
+        self.assertEqual([len(call.kwargs['json']['sources']) for call in valhalla.post.call_args_list], [2, 1])
+        # L'indice de la troisième source est relatif à son lot
+        self.assertEqual(matrix['durations'][2], [72.0, 144.0])
+        self.assertEqual(matrix['distances'][1], [2000.0, 3000.0])
+        self.assertEqual(matrix['provider'], 'valhalla')
+
+    @override_settings(ROUTING_PROVIDER='valhalla')
+    def test_fallback_and_unreachable(self):
+        valhalla = mock.Mock()
+        valhalla.post.return_value = mock.Mock(status_code=503)
+        points = [[-5.0, 34.03], [-4.99, 34.04]]
+        with mock.patch('api.utils.get_http_client', return_value=valhalla), self.assertLogs('api.utils', 'WARNING'):
+            matrix = RoutingService.get_matrix(points, points, hour_of_day=10)
+        self.assertEqual(matrix['provider'], 'fallback')
+        self.assertEqual(matrix['durations'][0][0], 0.0)
+
+        valhalla.post.side_effect = lambda path, json, timeout: mock.Mock(
+            status_code=200, json=mock.Mock(return_value={'sources_to_targets': [[
+                {'from_index': 0, 'to_index': 0, 'time': None, 'distance': None}
+            ]]})
+        )
+        with mock.patch('api.utils.get_http_client', return_value=valhalla):
+            matrix = RoutingService.get_matrix(points[:1], points[:1], hour_of_day=10)
+        self.assertEqual(matrix['durations'], [[None]])
+
+    def test_invalid_coordinates(self):
+        response = self.post([[-5.0, 95.0]], [[-5.0, 34.0]])
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,89 @@
+import math
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from api.routing_engine import LocalRoutingEngine, RoadGraph
+
+from .road_graphs import dijkstra, grid_road_graph, path_cost
+
+
+class RoadGraphTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.graph = grid_road_graph(size=12, seed=1)
+        cls.sources = [0, 17, 70, 143]
+        cls.reference = {source: dijkstra(cls.graph, source) for source in cls.sources}
+
+    def test_bidirectional_astar_matches_dijkstra(self):
+        for source in self.sources:
+            for target in range(len(self.graph)):
+                result = self.graph.shortest_path(source, target)
+                expected = self.reference[source].get(target)
+                if expected is None:
+                    self.assertIsNone(result)
+                    continue
+                nodes, duration, length = result
+                self.assertAlmostEqual(duration, expected, places=3)
+                self.assertEqual((nodes[0], nodes[-1]), (source, target))
+                path_duration, path_length = path_cost(self.graph, nodes)
+                self.assertAlmostEqual(path_duration, duration, places=3)
+                self.assertAlmostEqual(path_length, length, places=2)
+
+    def test_search_matches_dijkstra(self):
+        settled = self.graph.search(17)
+        self.assertEqual(settled.keys(), self.reference[17].keys())
+        for node, (duration, _) in settled.items():
+            self.assertAlmostEqual(duration, self.reference[17][node], places=3)
+
+        bounded = self.graph.search(17, max_duration=60)
+        self.assertEqual(set(bounded), {node for node, duration in self.reference[17].items() if duration <= 60})
+
+    def test_many_to_many(self):
+        targets = [5, 60, 143]
+        durations, lengths = self.graph.many_to_many(self.sources, targets)
+        for row, source in enumerate(self.sources):
+            for column, target in enumerate(targets):
+                self.assertAlmostEqual(durations[row, column], self.reference[source].get(target, math.inf), places=3)
+        self.assertEqual(durations.shape, lengths.shape)
+
+    def test_one_way_and_unreachable(self):
+        # 0 -> 1 à sens unique, 2 isolé
+        graph = RoadGraph.from_edges([-5.0, -4.999, -4.998], [34.0, 34.0, 34.0], [0], [1], [92.0], [10.0])
+        self.assertEqual(graph.shortest_path(0, 1), ([0, 1], 10.0, 92.0))
+        self.assertIsNone(graph.shortest_path(1, 0))
+        self.assertIsNone(graph.shortest_path(0, 2))
+        self.assertEqual(graph.shortest_path(2, 2), ([2], 0.0, 0.0))
+
+    def test_nearest_node(self):
+        node, gap = self.graph.nearest_node(float(self.graph.node_x[40]), float(self.graph.node_y[40]) + 0.0001)
+        self.assertEqual(node, 40)
+        self.assertAlmostEqual(gap, 11.1, places=1)
+        empty = RoadGraph.from_edges([], [], [], [], [], [])
+        self.assertEqual(empty.nearest_node(-5.0, 34.0), (None, None))
+
+
+class LocalRoutingEngineTests(SimpleTestCase):
+    def setUp(self):
+        self.graph = grid_road_graph(size=6, seed=2, one_way=0, missing=0)
+        patcher = mock.patch('api.routing_engine.get_road_graph', return_value=self.graph)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_route_adds_access_legs(self):
+        start = [float(self.graph.node_x[0]), float(self.graph.node_y[0]) - 0.0002]
+        end = [float(self.graph.node_x[35]), float(self.graph.node_y[35])]
+        route = LocalRoutingEngine.get_route(start, end, traffic_factor=1.5)
+
+        nodes, duration, length = self.graph.shortest_path(0, 35)
+        self.assertEqual(route['path'][0], start)
+        self.assertEqual(route['path'][1:-1], self.graph.path_coordinates(nodes))
+        access = self.graph.nearest_node(*start)[1]
+        self.assertAlmostEqual(route['distance'], length + access, places=3)
+        self.assertAlmostEqual(route['duration'], (duration + access / LocalRoutingEngine.ACCESS_SPEED) * 1.5, places=3)
+        self.assertEqual(route['provider'], 'local')
+
+    def test_unavailable_graph(self):
+        with mock.patch('api.routing_engine.get_road_graph', return_value=None):
+            self.assertIsNone(LocalRoutingEngine.get_route([-5.0, 34.03], [-4.99, 34.04]))
@@ -0,0 +1,98 @@
+import random
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from api.location_store import LocationStore
+from api.models import PreExtractedLocation
+from api.normalization import normalize_search_key
+from api.search import LocationSearchService
+from api.search_index import LocationSearchIndex
+
+NAMES = [
+    'Bab Boujloud', 'Bab Ftouh', 'Boulevard Allal Ben Abdellah', 'Café Clock',
+    'Place Bab Ftouh', 'Rue Ibn Khaldoun', 'Rue de la Liberté', 'Pharmacie Bab Guissa',
+    'Mosquée Andalous', 'Médersa Bou Inania', 'Avenue Hassan II', 'Zaouia Moulay Idriss',
+]
+
+
+def rows_for(names):
+    names = sorted(names)
+    return [
+        (position + 1, name, -5.0 + position / 1000, 34.03, 'place', normalize_search_key(name))
+        for position, name in enumerate(names)
+    ]
+
+
+def brute_force(rows, query, limit):
+    # Sémantique de l'ancien name__icontains, préfixes d'abord, chaque groupe par nom
+    key = normalize_search_key(query)
+    if not key:
+        return []
+    prefixed = [row[1] for row in rows if row[5].startswith(key)]
+    others = [row[1] for row in rows if key in row[5] and not row[5].startswith(key)]
+    return (prefixed + others)[:limit]
+
+
+class LocationSearchIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.rows = rows_for(NAMES)
+        self.index = LocationSearchIndex(self.rows)
+
+    def test_prefix_matches_come_first(self):
+        names = [result['name'] for result in self.index.search('bab', 10)]
+        self.assertEqual(names, ['Bab Boujloud', 'Bab Ftouh', 'Pharmacie Bab Guissa', 'Place Bab Ftouh'])
+
+    def test_accents_and_case_are_ignored(self):
+        self.assertEqual(self.index.search('LIBERTE')[0]['name'], 'Rue de la Liberté')
+        medersa = next(row for row in self.rows if row[1] == 'Médersa Bou Inania')
+        self.assertEqual(self.index.search('MEDERSA')[0]['coordinates'], list(medersa[2:4]))
+
+    def test_limit_and_empty_query(self):
+        self.assertEqual(len(self.index.search('a', 3)), 3)
+        self.assertEqual(self.index.search('  ', 10), [])
+        self.assertEqual(self.index.search('xyz', 10), [])
+
+    def test_matches_brute_force(self):
+        rng = random.Random(7)
+        alphabet = 'abdeilnoru '
+        names = [''.join(rng.choice(alphabet) for _ in range(rng.randint(3, 12))).strip() or 'a' for _ in range(300)]
+        rows = rows_for(names)
+        index = LocationSearchIndex(rows)
+        for _ in range(300):
+            query = ''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 5)))
+            limit = rng.choice([1, 5, 10, 50])
+            self.assertEqual([result['name'] for result in index.search(query, limit)],
+                             brute_force(rows, query, limit), query)
+
+
+class SearchBackendTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for position, name in enumerate(NAMES):
+            PreExtractedLocation.objects.create(name=name, longitude=-5.0 + position / 1000, latitude=34.03)
+
+    def setUp(self):
+        LocationStore.invalidate()
+        self.addCleanup(LocationStore.invalidate)
+
+    def test_index_and_orm_backends_agree(self):
+        for query in ['bab', 'rue', 'ftouh', 'a', 'moulay idriss', 'nothing']:
+            with override_settings(LOCATION_SEARCH_BACKEND='index'):
+                indexed = LocationSearchService.search(query, 3)
+            with override_settings(LOCATION_SEARCH_BACKEND='orm'):
+                scanned = LocationSearchService.search(query, 3)
+            self.assertEqual(indexed, scanned, query)
+
+    @override_settings(LOCATION_INDEX_REFRESH_SECONDS=0, LOCATION_SEARCH_BACKEND='index')
+    def test_in_place_updates_rebuild_the_index(self):
+        self.assertEqual(LocationSearchService.search('boujloud', 1)[0]['name'], 'Bab Boujloud')
+        signature = LocationStore.snapshot().signature
+
+        # QuerySet.update() n'envoie pas post_save : seul le compteur de la table change
+        PreExtractedLocation.objects.filter(name='Bab Boujloud').update(
+            name='Bab Bou Jeloud', search_key=normalize_search_key('Bab Bou Jeloud'), longitude=-4.98
+        )
+
+        self.assertNotEqual(LocationStore.snapshot().signature, signature)
+        self.assertEqual(LocationSearchService.search('boujloud', 1), [])
+        self.assertEqual(LocationSearchService.search('jeloud', 1), [{'name': 'Bab Bou Jeloud', 'coordinates': [-4.98, 34.03]}])
@@ -0,0 +1,87 @@
+import math
+import random
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from api.geodesy import EARTH_RADIUS
+from api.simplification import route_path, simplify, simplify_levels, zoom_tolerance
+
+
+def reference_simplify(path, tolerance):
+    # Douglas-Peucker récursif, dans la même projection locale que simplify
+    scale = math.radians(1) * EARTH_RADIUS
+    mean_lat = sum(lat for _, lat in path) / len(path)
+    xy = [(lon * scale * math.cos(math.radians(mean_lat)), lat * scale) for lon, lat in path]
+
+    def distance(point, start, end):
+        dx, dy = end[0] - start[0], end[1] - start[1]
+        length2 = dx * dx + dy * dy
+        t = 0.0 if length2 == 0 else max(0.0, min(1.0, ((point[0] - start[0]) * dx + (point[1] - start[1]) * dy) / length2))
+        return math.hypot(point[0] - start[0] - t * dx, point[1] - start[1] - t * dy)
+
+    kept = {0, len(path) - 1}
+
+    def split(first, last):
+        if last - first < 2:
+            return
+        distances = [distance(xy[i], xy[first], xy[last]) for i in range(first + 1, last)]
+        farthest = max(range(len(distances)), key=distances.__getitem__)
+        if distances[farthest] > tolerance:
+            index = first + 1 + farthest
+            kept.add(index)
+            split(first, index)
+            split(index, last)
+
+    split(0, len(path) - 1)
+    return [path[i] for i in sorted(kept)]
+
+
+def winding_path(rng, count):
+    lon, lat, heading = -5.0, 34.03, 0.0
+    path = []
+    for _ in range(count):
+        heading += rng.gauss(0, 0.4)
+        step = rng.choice([0.0, 2e-5, 1e-4])
+        lon += step * math.cos(heading)
+        lat += step * math.sin(heading)
+        path.append([lon, lat])
+    return path
+
+
+class SimplificationTests(SimpleTestCase):
+    def test_matches_recursive_douglas_peucker(self):
+        rng = random.Random(17)
+        for _ in range(60):
+            path = winding_path(rng, rng.randint(3, 400))
+            for tolerance in (0.5, 3.0, 20.0, 150.0):
+                self.assertEqual(simplify(path, tolerance), reference_simplify(path, tolerance))
+
+    def test_levels_match_direct_simplification(self):
+        path = winding_path(random.Random(18), 2000)
+        zooms = [10, 13, 16, 18]
+        levels = simplify_levels(path, zooms)
+        for zoom in zooms:
+            self.assertEqual(levels[str(zoom)], simplify(path, zoom_tolerance(zoom, path[0][1])))
+        self.assertLess(len(levels['10']), len(levels['18']))
+
+    def test_short_paths_and_zero_tolerance(self):
+        self.assertEqual(simplify([[-5.0, 34.0], [-4.9, 34.1]], 10), [[-5.0, 34.0], [-4.9, 34.1]])
+        path = winding_path(random.Random(19), 50)
+        self.assertEqual(simplify(path, 0), path)
+        self.assertEqual(simplify_levels(path[:2], [12]), {})
+        # Ligne droite : seules les extrémités restent
+        line = [[-5.0 + i * 1e-4, 34.0] for i in range(20)]
+        self.assertEqual(simplify(line, 0.1), [line[0], line[-1]])
+
+    def test_zoom_tolerance(self):
+        self.assertAlmostEqual(zoom_tolerance(0, 0), 2 * math.pi * EARTH_RADIUS / 256)
+        self.assertAlmostEqual(zoom_tolerance(16, 34.03), 1.98, places=2)
+
+    def test_route_path_uses_precomputed_levels(self):
+        path = winding_path(random.Random(20), 300)
+        route = {'path': path, 'simplified_paths': {'12': path[::100]}}
+        self.assertIs(route_path(route), path)
+        self.assertEqual(route_path(route, zoom=12), path[::100])
+        self.assertEqual(route_path(route, zoom=14), simplify(path, zoom_tolerance(14, path[0][1])))
+        self.assertEqual(route_path(route, tolerance=5), simplify(path, 5))
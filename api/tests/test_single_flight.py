@@ -0,0 +1,99 @@
+import fcntl
+import os
+import tempfile
+import threading
+import time
+
+from django.test import SimpleTestCase, override_settings
+
+from api.single_flight import SingleFlight
+
+
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        override = override_settings(SINGLE_FLIGHT_LOCK_DIR=self.directory, ROUTING_LATENCY_BUDGET=5)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.flights = SingleFlight('test')
+
+    def test_concurrent_calls_compute_once(self):
+        calls = []
+        release = threading.Event()
+        results = []
+
+        def compute():
+            calls.append(1)
+            release.wait(5)
+            return 'route'
+
+        def request():
+            results.append(self.flights.do('a', compute))
+
+        threads = [threading.Thread(target=request) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join(10)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['route'] * 5)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_different_keys_do_not_wait(self):
+        release = threading.Event()
+        finished = []
+
+        def slow():
+            release.wait(5)
+            finished.append('slow')
+            return 'slow'
+
+        def fast():
+            finished.append('fast')
+            return 'fast'
+
+        slow_thread = threading.Thread(target=lambda: self.flights.do('slow', slow))
+        slow_thread.start()
+        time.sleep(0.05)
+        started = time.monotonic()
+        self.assertEqual(self.flights.do('fast', fast), 'fast')
+        self.assertLess(time.monotonic() - started, 1)
+        release.set()
+        slow_thread.join(10)
+        self.assertEqual(finished, ['fast', 'slow'])
+
+    def test_waits_for_other_worker_then_rechecks(self):
+        # Meneur simulé d'un autre worker : verrou tenu sur le fichier de la clé
+        path = self.flights._lock_path('a')
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(
+            self.flights.do('a', lambda: 'computed', recheck=lambda: 'cached')
+        ))
+        waiter.start()
+        time.sleep(0.1)
+        self.assertEqual(results, [])
+        os.unlink(path)
+        os.close(fd)
+        waiter.join(10)
+        self.assertEqual(results, ['cached'])
+
+    def test_recheck_miss_computes(self):
+        path = self.flights._lock_path('a')
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(
+            self.flights.do('a', lambda: 'computed', recheck=lambda: None)
+        ))
+        waiter.start()
+        time.sleep(0.05)
+        os.unlink(path)
+        os.close(fd)
+        waiter.join(10)
+        self.assertEqual(results, ['computed'])
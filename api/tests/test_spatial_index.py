@@ -0,0 +1,74 @@
+import random
+
+from django.test import SimpleTestCase, TestCase
+
+from api.location_store import LocationStore
+from api.models import PreExtractedLocation
+from api.spatial_index import GridIndex, NearestLocationIndex
+
+
+class GridIndexTests(SimpleTestCase):
+    def setUp(self):
+        rng = random.Random(11)
+        # Nuage dense autour de la médina et quelques points isolés
+        self.points = [[-5.0 + rng.gauss(0, 0.01), 34.06 + rng.gauss(0, 0.01)] for _ in range(2000)]
+        self.points += [[-4.9, 34.2], [-5.3, 33.9]]
+        self.grid = GridIndex(self.points, cell_size=250)
+
+    def brute_force(self, lon, lat, k, max_distance=None):
+        distances = sorted(
+            (GridIndex.distance(lon, lat, *point), position) for position, point in enumerate(self.points)
+        )
+        return [item for item in distances if max_distance is None or item[0] <= max_distance][:k]
+
+    def test_matches_brute_force(self):
+        rng = random.Random(12)
+        queries = [[-5.0 + rng.uniform(-0.05, 0.05), 34.06 + rng.uniform(-0.05, 0.05)] for _ in range(100)]
+        queries += [[-4.95, 34.25], [-6.0, 33.0]]
+        for lon, lat in queries:
+            for k in (1, 5):
+                found = self.grid.nearest(lon, lat, k)
+                expected = self.brute_force(lon, lat, k)
+                # Le parcours se fait en distance projetée : égalité au millimètre près
+                self.assertEqual(len(found), k)
+                for (distance, _), (expected_distance, _) in zip(found, expected):
+                    self.assertAlmostEqual(distance, expected_distance, delta=1e-3)
+
+    def test_max_distance(self):
+        lon, lat = -4.95, 34.25
+        self.assertEqual(self.grid.nearest(lon, lat, 3, max_distance=1000), [])
+        found = self.grid.nearest(-5.0, 34.06, 50, max_distance=300)
+        self.assertEqual([position for _, position in found],
+                         [position for _, position in self.brute_force(-5.0, 34.06, 50, 300)])
+
+    def test_empty_grid(self):
+        self.assertEqual(GridIndex([]).nearest(-5.0, 34.0, 3), [])
+
+
+class NearestLocationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        PreExtractedLocation.objects.create(name='Bab Boujloud', longitude=-4.9830, latitude=34.0617)
+        PreExtractedLocation.objects.create(name='Place Rcif', longitude=-4.9740, latitude=34.0640)
+        PreExtractedLocation.objects.create(name='nan', longitude=-4.9831, latitude=34.0617)
+
+    def setUp(self):
+        LocationStore.invalidate()
+        self.addCleanup(LocationStore.invalidate)
+
+    def post(self, data):
+        return self.client.post('/api/locations/nearest/', data, content_type='application/json')
+
+    def test_nearest_skips_unnamed_locations(self):
+        response = self.post({'coordinates': [-4.9831, 34.0617], 'k': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['name'] for item in response.json()], ['Bab Boujloud', 'Place Rcif'])
+        self.assertEqual(response.json()[0]['distance'], 9.2)
+
+    def test_not_found_and_invalid(self):
+        self.assertEqual(self.post({'coordinates': [-5.2, 34.0], 'max_distance': 500}).status_code, 404)
+        self.assertEqual(self.post({'coordinates': [-5.2]}).status_code, 400)
+
+    def test_index_rows(self):
+        index = NearestLocationIndex([(1, 'A', -5.0, 34.0, None, 'a'), (2, '', -5.0, 34.0, None, '')])
+        self.assertEqual(len(index), 1)
@@ -0,0 +1,81 @@
+import itertools
+import math
+import random
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from api.tour_optimizer import TourOptimizer
+
+from .road_graphs import grid_road_graph
+
+
+def tour_cost(durations, order, has_end):
+    tour = [0] + list(order) + ([len(durations) - 1] if has_end else [])
+    return sum(durations[a][b] for a, b in zip(tour, tour[1:]))
+
+
+def random_instance(rng, stops, has_end):
+    # Points du plan, durées asymétriques (jusqu'à 30 % d'écart entre les deux sens)
+    points = [(rng.random(), rng.random()) for _ in range(stops + 1 + has_end)]
+    return [[math.dist(a, b) * (1 + 0.3 * rng.random()) for b in points] for a in points]
+
+
+class TourOptimizerTests(SimpleTestCase):
+    def test_close_to_optimum_on_small_tours(self):
+        rng = random.Random(21)
+        for _ in range(100):
+            stops, has_end = rng.randint(2, 7), rng.random() < 0.5
+            durations = random_instance(rng, stops, has_end)
+            order = TourOptimizer.solve(durations, has_end)
+            self.assertEqual(sorted(order), list(range(1, stops + 1)))
+            optimum = min(tour_cost(durations, permutation, has_end)
+                          for permutation in itertools.permutations(range(1, stops + 1)))
+            self.assertLessEqual(tour_cost(durations, order, has_end), optimum * 1.1)
+
+    def test_result_is_a_local_optimum(self):
+        rng = random.Random(22)
+        durations = random_instance(rng, 30, True)
+        order = TourOptimizer.solve(durations, has_end=True, time_budget=10)
+        cost = TourOptimizer._cost_matrix(durations, True)
+        tour = [0] + order + [len(durations) - 1]
+        self.assertFalse(TourOptimizer.two_opt(cost, list(tour), math.inf))
+        self.assertFalse(TourOptimizer.or_opt(cost, list(tour), math.inf))
+
+    def test_stops_on_a_line(self):
+        # Départ à gauche, arrêts dans le désordre : la tournée les parcourt de gauche à droite
+        positions = [0, 5, 1, 4, 2, 3]
+        durations = [[abs(a - b) for b in positions] for a in positions]
+        self.assertEqual(TourOptimizer.solve(durations), [2, 4, 5, 3, 1])
+
+    def test_impossible_legs_are_avoided(self):
+        durations = [
+            [0, 1, 2, 10],
+            [1, 0, math.inf, 1],
+            [2, 1, 0, 1],
+            [10, 1, 1, 0],
+        ]
+        self.assertEqual(TourOptimizer.solve(durations, has_end=True), [2, 1])
+
+
+@override_settings(ROUTING_PROVIDER='local', TOUR_OPTIMIZATION_BUDGET=1)
+class MultiStopRouteViewTests(SimpleTestCase):
+    def test_tour_follows_optimized_order(self):
+        graph = grid_road_graph(size=6, seed=8, one_way=0, missing=0)
+        point = lambda node: [float(graph.node_x[node]), float(graph.node_y[node])]
+        stops = [point(35), point(2), point(20)]
+        with mock.patch('api.routing_engine.get_road_graph', return_value=graph):
+            response = self.client.post(
+                '/api/routes/multi-stop/', {'start_point': point(0), 'stops': stops},
+                content_type='application/json'
+            )
+
+        self.assertEqual(response.status_code, 200)
+        tour = response.json()
+        self.assertEqual(sorted(tour['order']), [0, 1, 2])
+        self.assertEqual(tour['end_point'], stops[tour['order'][-1]])
+        self.assertEqual(len(tour['legs']), 3)
+        # Tracé continu : chaque tronçon commence où finit le précédent
+        for leg in tour['legs']:
+            self.assertEqual(tour['path'][leg['path_start']], leg['start_point'])
+        self.assertAlmostEqual(tour['duration'], sum(leg['duration'] for leg in tour['legs']))
@@ -0,0 +1,158 @@
+"""
+Ordre de visite d'une tournée à plusieurs arrêts (problème du voyageur de commerce)
+
+La tournée part d'un point fixe, visite tous les arrêts et se termine soit à
+un point d'arrivée fixe, soit au dernier arrêt. Elle est construite par le
+plus proche voisin puis améliorée par 2-opt et Or-opt jusqu'à ce qu'aucun
+mouvement ne réduise la durée totale ou que le budget de temps soit écoulé.
+Les durées peuvent être asymétriques (sens uniques).
+"""
+import time
+
+import numpy as np
+
+# Amélioration minimale (secondes) pour accepter un mouvement
+EPSILON = 1e-9
+
+
+class TourOptimizer:
+    """
+    Heuristiques de construction et d'amélioration de tournée sur une matrice de durées
+    """
+    @staticmethod
+    def solve(durations, has_end=False, time_budget=1.0):
+        """
+        Calcule l'ordre de visite des arrêts
+
+        Args:
+            durations: Matrice carrée des durées ; l'index 0 est le départ, les
+                suivants les arrêts, et le dernier l'arrivée si has_end
+            has_end: La dernière ligne de la matrice est un point d'arrivée imposé
+            time_budget: Durée maximale (secondes) consacrée aux améliorations
+
+        Returns:
+            Indices des arrêts (lignes de la matrice) dans l'ordre de visite
+        """
+        deadline = time.monotonic() + time_budget
+        cost = TourOptimizer._cost_matrix(durations, has_end)
+
+        end = len(cost) - 1
+        tour = [0] + TourOptimizer.nearest_neighbour(cost, list(range(1, end))) + [end]
+
+        improved = True
+        while improved and time.monotonic() < deadline:
+            improved = TourOptimizer.two_opt(cost, tour, deadline)
+            improved = TourOptimizer.or_opt(cost, tour, deadline) or improved
+
+        return tour[1:-1]
+
+    @staticmethod
+    def _cost_matrix(durations, has_end):
+        """
+        Matrice en listes Python, avec un point d'arrivée fictif (durées nulles)
+        quand la tournée se termine au dernier arrêt
+        """
+        cost = np.array(durations, dtype=np.float64)
+        finite = np.isfinite(cost)
+        # Trajet impossible : pénalité supérieure à toute tournée réalisable
+        penalty = (cost[finite].sum() if finite.any() else 0.0) + 1e6
+        cost[~finite] = penalty
+
+        if not has_end:
+            cost = np.pad(cost, ((0, 1), (0, 1)))
+        return cost.tolist()
+
+    @staticmethod
+    def tour_duration(cost, tour):
+        return sum(cost[a][b] for a, b in zip(tour, tour[1:]))
+
+    @staticmethod
+    def nearest_neighbour(cost, stops):
+        """
+        Depuis le départ, aller à chaque fois à l'arrêt non visité le plus proche
+        """
+        order = []
+        remaining = set(stops)
+        current = 0
+        while remaining:
+            row = cost[current]
+            current = min(remaining, key=row.__getitem__)
+            remaining.remove(current)
+            order.append(current)
+        return order
+
+    @staticmethod
+    def two_opt(cost, tour, deadline):
+        """
+        Inverse des sections de la tournée tant que cela la raccourcit
+
+        Les durées cumulées dans les deux sens permettent d'évaluer chaque
+        inversion en temps constant malgré l'asymétrie.
+
+        Returns:
+            True si la tournée a été modifiée
+        """
+        size = len(tour)
+        improved = False
+
+        def prefix_sums():
+            forward = [0.0] * size
+            backward = [0.0] * size
+            for position in range(1, size):
+                a, b = tour[position - 1], tour[position]
+                forward[position] = forward[position - 1] + cost[a][b]
+                backward[position] = backward[position - 1] + cost[b][a]
+            return forward, backward
+
+        forward, backward = prefix_sums()
+        for i in range(size - 3):
+            if time.monotonic() >= deadline:
+                break
+            a, first = tour[i], tour[i + 1]
+            for j in range(i + 2, size - 1):
+                last, b = tour[j], tour[j + 1]
+                current = cost[a][first] + forward[j] - forward[i + 1] + cost[last][b]
+                reversed_cost = cost[a][last] + backward[j] - backward[i + 1] + cost[first][b]
+                if reversed_cost < current - EPSILON:
+                    tour[i + 1:j + 1] = tour[i + 1:j + 1][::-1]
+                    forward, backward = prefix_sums()
+                    first = tour[i + 1]
+                    improved = True
+        return improved
+
+    @staticmethod
+    def or_opt(cost, tour, deadline):
+        """
+        Déplace des suites de 1 à 3 arrêts consécutifs vers une meilleure position
+
+        Returns:
+            True si la tournée a été modifiée
+        """
+        improved = False
+        for length in (1, 2, 3):
+            i = 1
+            while i + length < len(tour):
+                if time.monotonic() >= deadline:
+                    return improved
+
+                segment = tour[i:i + length]
+                previous, following = tour[i - 1], tour[i + length]
+                first, last = segment[0], segment[-1]
+                removal_gain = cost[previous][first] + cost[last][following] - cost[previous][following]
+
+                rest = tour[:i] + tour[i + length:]
+                best_position, best_cost = None, removal_gain - EPSILON
+                for k in range(len(rest) - 1):
+                    if k == i - 1:
+                        continue
+                    a, b = rest[k], rest[k + 1]
+                    insertion_cost = cost[a][first] + cost[last][b] - cost[a][b]
+                    if insertion_cost < best_cost:
+                        best_position, best_cost = k, insertion_cost
+
+                if best_position is not None:
+                    tour[:] = rest[:best_position + 1] + segment + rest[best_position + 1:]
+                    improved = True
+                else:
+                    i += 1
+        return improved
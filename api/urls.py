@@ -1,9 +1,35 @@
+from django.conf import settings
 from django.urls import path
-from .views import SearchLocationView, RouteView, OptimizedRouteView
+from .views import (
+    SearchLocationView,
+    BatchSearchLocationView,
+    NearestLocationView,
+    RouteView,
+    BatchRouteView,
+    OptimizedRouteView,
+    RouteMatrixView,
+    MultiStopRouteView,
+    IsochroneView
+)
+
+# En mode ASGI, les vues qui attendent Valhalla et MongoDB sont servies par leurs
+# versions asynchrones
+if getattr(settings, 'SERVER_MODE', 'wsgi') == 'asgi':
+    from .async_views import (
+        AsyncSearchLocationView as SearchLocationView,
+        AsyncRouteView as RouteView,
+        AsyncOptimizedRouteView as OptimizedRouteView
+    )
 
 urlpatterns = [
     path('locations/search/', SearchLocationView.as_view(), name='search-location'),
+    path('locations/search/batch/', BatchSearchLocationView.as_view(), name='batch-search-location'),
+    path('locations/nearest/', NearestLocationView.as_view(), name='nearest-location'),
     path('routes/calculate/', RouteView.as_view(), name='calculate-route'),
+    path('routes/batch/', BatchRouteView.as_view(), name='batch-route'),
     path('routes/optimize/', OptimizedRouteView.as_view(), name='optimize-route'),
+    path('routes/matrix/', RouteMatrixView.as_view(), name='route-matrix'),
+    path('routes/multi-stop/', MultiStopRouteView.as_view(), name='multi-stop-route'),
+    path('routes/isochrone/', IsochroneView.as_view(), name='route-isochrone'),
 ]
 
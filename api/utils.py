@@ -1,20 +1,93 @@
+import asyncio
 import requests
 import math
-from datetime import datetime
-import json
+import numpy as np
+from datetime import datetime, timedelta
+import logging
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from .circuit_breaker import get_circuit_breaker
+from .geodesy import haversine, haversine_matrix, path_length, sinuosity
+from .http_client import AsyncHttpError, get_async_http_client, get_http_client
+from .instrumentation import increment, timed
+from .isochrone import circle_polygon
+from .models import GeocodingCacheEntry
+from .normalization import normalize_search_key
+from . import polyline
+from .routing_engine import LocalRoutingEngine
+from .search import LocationSearchService
+
+logger = logging.getLogger(__name__)
 
 class GeocodingService:
     """
-    Service de géocodage utilisant Nominatim (OpenStreetMap)
+    Service de géocodage en couches : lieux pré-extraits, cache persistant, puis Nominatim
+
+    Nominatim limite l'usage à environ une requête par seconde : il n'est appelé
+    qu'en dernier recours et ses réponses sont conservées GEOCODING_CACHE_TTL
+    secondes dans la table GeocodingCacheEntry.
     """
     @staticmethod
-    def search_location(query, limit=5, city="Fès", country="Maroc"):
+    def search_location(query, limit=5, city="Fès", country="Maroc", use_local=True):
         """
         Recherche un lieu par son nom
+        
+        Args:
+            use_local: Chercher d'abord dans les lieux pré-extraits (PreExtractedLocation)
+        """
+        # 1. Lieux pré-extraits (index en mémoire, aucun appel réseau)
+        if use_local:
+            local_results = LocationSearchService.search(query, limit=limit)
+            if local_results:
+                return [
+                    {"name": result["name"], "coordinates": result["coordinates"], "type": "Point"}
+                    for result in local_results
+                ]
+        
+        # 2. Cache persistant des réponses Nominatim
+        query_key = GeocodingService._cache_key(query, limit, city, country)
+        cached = GeocodingService._get_cached(query_key)
+        if cached is not None:
+            return cached
+        
+        # 3. Service distant, réponse écrite dans le cache
+        locations = GeocodingService.search_remote(query, limit, city, country)
+        if locations is not None:
+            GeocodingCacheEntry.objects.update_or_create(
+                query_key=query_key,
+                defaults={"results": locations}
+            )
+            return locations
+        return []
+    
+    @staticmethod
+    def _cache_key(query, limit, city, country):
+        return f"{normalize_search_key(query)}|{normalize_search_key(city)}|{normalize_search_key(country)}|{limit}"
+    
+    @staticmethod
+    def _get_cached(query_key):
+        """
+        Retourne les résultats en cache, ou None si absents ou expirés
+        """
+        ttl = getattr(settings, 'GEOCODING_CACHE_TTL', 30 * 24 * 3600)
+        entry = GeocodingCacheEntry.objects.filter(
+            query_key=query_key,
+            created_at__gte=timezone.now() - timedelta(seconds=ttl)
+        ).first()
+        return entry.results if entry else None
+    
+    @staticmethod
+    def search_remote(query, limit=5, city="Fès", country="Maroc"):
+        """
+        Interroge Nominatim (ou le service configuré par NOMINATIM_URL)
+        
+        Returns:
+            Liste de lieux, ou None en cas d'erreur (rien n'est alors mis en cache)
         """
-        base_url = "https://nominatim.openstreetmap.org/search"
         params = {
             "q": f"{query}, {city}, {country}",
             "format": "json",
@@ -22,12 +95,8 @@ class GeocodingService:
             "addressdetails": 1
         }
         
-        headers = {
-            "User-Agent": "RouteFinder/1.0"
-        }
-        
         try:
-            response = requests.get(base_url, params=params, headers=headers, timeout=10)
+            response = get_http_client("nominatim").get("/search", params=params, timeout=10)
             
             if response.status_code == 200:
                 results = response.json()
@@ -46,197 +115,640 @@ class GeocodingService:
                         }
                         locations.append(location)
                     except (ValueError, TypeError):
-                        print(f"Coordonnées invalides pour: {result.get('display_name')}")
+                        logger.warning("Coordonnées invalides pour: %s", result.get('display_name'))
                         continue
                 
                 return locations
             else:
-                print(f"Erreur HTTP {response.status_code}: {response.text}")
-                return []
+                logger.warning("Erreur HTTP %s: %s", response.status_code, response.text)
+                return None
                 
-        except requests.exceptions.RequestException as e:
-            print(f"Erreur de requête géocodage: {str(e)}")
-            return []
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.warning("Erreur de requête géocodage: %s", e)
+            return None
 
 class RoutingService:
     """
     Service de calcul d'itinéraire utilisant Valhalla (Open Source Routing Engine)
+    ou le moteur local construit sur le graphe routier de Fès (ROUTING_PROVIDER)
     """
     @staticmethod
     def get_route(start_point, end_point, max_retries=3, retry_delay=1):
         """
-        Calcule un itinéraire entre deux points en utilisant l'API Valhalla
+        Calcule un itinéraire entre deux points avec le fournisseur configuré
         start_point et end_point sont des listes [longitude, latitude]
         """
         # Validation des coordonnées d'entrée
         if not RoutingService._validate_coordinates(start_point) or not RoutingService._validate_coordinates(end_point):
-            print("Coordonnées invalides")
+            logger.warning("Coordonnées invalides")
             return RoutingService.fallback_route(start_point, end_point)
         
+        if getattr(settings, 'ROUTING_PROVIDER', 'valhalla') == 'local':
+            traffic_factor = TrafficDataService.get_traffic_factor(None, datetime.now().hour)
+            with timed('local_routing'):
+                route = LocalRoutingEngine.get_route(start_point, end_point, traffic_factor)
+            if route is not None:
+                return route
+            logger.info("Itinéraire local indisponible - appel à Valhalla")
+        
+        return RoutingService.get_valhalla_route(start_point, end_point, max_retries, retry_delay)
+    
+    @staticmethod
+    def get_routes(pairs, max_workers=None):
+        """
+        Calcule plusieurs itinéraires en parallèle
+        
+        Les appels au fournisseur passent par un pool de taille bornée
+        (ROUTE_BATCH_CONCURRENCY) pour ne pas dépasser les connexions keep-alive
+        du client HTTP ni surcharger Valhalla.
+        
+        Args:
+            pairs: Liste de couples (start_point, end_point)
+        
+        Returns:
+            Liste de dictionnaires au format de get_route, dans l'ordre des paires
+        """
+        if max_workers is None:
+            max_workers = getattr(settings, 'ROUTE_BATCH_CONCURRENCY', 10)
+        if len(pairs) <= 1 or max_workers <= 1:
+            return [RoutingService.get_route(start, end) for start, end in pairs]
+        
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(pairs))) as executor:
+            return list(executor.map(lambda pair: RoutingService.get_route(*pair), pairs))
+    
+    @staticmethod
+    def get_valhalla_route(start_point, end_point, max_retries=3, retry_delay=1):
+        """
+        Calcule un itinéraire entre deux points en utilisant l'API Valhalla
+        """
         # Utilisation de l'API Valhalla pour obtenir un vrai trajet routier
-        valhalla_url = "https://valhalla1.openstreetmap.de/route"
+        # (client partagé du worker : connexions keep-alive réutilisées)
+        valhalla = get_http_client("valhalla")
         
         # Préparation du payload JSON pour Valhalla
-        payload = {
-            "locations": [
-                {"lat": start_point[1], "lon": start_point[0]},
-                {"lat": end_point[1], "lon": end_point[0]}
-            ],
-            "costing": "auto",
-            "shape_match": "edge_walk",
-            "filters": {
-                "attributes": ["edge.length", "edge.time"],
-                "action": "include"
-            }
-        }
+        payload = RoutingService._valhalla_route_payload(start_point, end_point)
         
-        headers = {
-            "Content-Type": "application/json",
-            "User-Agent": "RouteFinder/1.0"
-        }
+        logger.debug("Requête Valhalla %s: %s", valhalla.url('/route'), payload)
+        
+        # Disjoncteur : tant que Valhalla est en panne, passer directement au calcul de secours
+        breaker = get_circuit_breaker("valhalla")
+        if not breaker.allow_request():
+            logger.warning("Circuit Valhalla ouvert - utilisation du calcul d'itinéraire de secours")
+            increment('valhalla_routes_total', outcome='fallback')
+            return RoutingService.fallback_route(start_point, end_point)
         
-        print(f"Valhalla Request URL: {valhalla_url}")
-        print(f"Valhalla Request Payload: {json.dumps(payload, indent=2)}")
+        # Budget de latence global pour l'ensemble des tentatives et des attentes,
+        # inférieur au timeout des workers gunicorn
+        deadline = time.monotonic() + getattr(settings, 'ROUTING_LATENCY_BUDGET', 20)
         
         # Appel à l'API Valhalla avec mécanisme de retry
         for attempt in range(max_retries):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or (attempt > 0 and not breaker.allow_request()):
+                break
+            
             try:
-                response = requests.post(valhalla_url, json=payload, headers=headers, timeout=120)
+                started = time.monotonic()
+                response = valhalla.post("/route", json=payload, timeout=remaining)
+                elapsed = time.monotonic() - started
                 
-                print(f"Valhalla Response Status: {response.status_code}")
+                logger.debug("Réponse Valhalla: %s", response.status_code)
                 
                 if response.status_code == 200:
                     data = response.json()
                     
-                    print(f"Valhalla Response Keys: {list(data.keys())}")
+                    # Structure invalide (pas de géométrie) : KeyError, traitée plus bas
+                    route = RoutingService._parse_valhalla_route(data, start_point, end_point)
+                    breaker.record_success(elapsed)
+                    if route is not None:
+                        increment('valhalla_routes_total', outcome='success')
+                        return route
                     
-                    if "trip" in data and "legs" in data["trip"] and len(data["trip"]["legs"]) > 0:
-                        trip = data["trip"]
-                        leg = trip["legs"][0]  # Premier segment
-                        
-                        # Validation de la structure de la réponse
-                        if "shape" not in leg:
-                            print("Structure de réponse Valhalla invalide - pas de géométrie")
-                            break
-                        
-                        # Extraction du chemin (coordonnées décodées du shape)
-                        path = RoutingService._decode_polyline(leg["shape"])
-                        
-                        # Extraction de la distance en mètres
-                        distance = leg.get("summary", {}).get("length", 0) * 1000  # Conversion km -> m
-                        
-                        # Extraction de la durée en secondes
-                        duration = leg.get("summary", {}).get("time", 0)
-                        
-                        # Obtenir l'heure actuelle pour le facteur de trafic
-                        current_hour = datetime.now().hour
-                        
-                        # Appliquer le facteur de trafic à la durée
-                        traffic_factor = TrafficDataService.get_traffic_factor(None, current_hour)
-                        adjusted_duration = duration * traffic_factor
-                        
-                        # Formatage du temps en minutes et secondes
-                        minutes = int(adjusted_duration // 60)
-                        seconds = int(adjusted_duration % 60)
-                        
-                        print(f"Valhalla Path Points: {len(path)}")
-                        print(f"Valhalla First Point: {path[0] if path else 'N/A'}")
-                        print(f"Valhalla Last Point: {path[-1] if path else 'N/A'}")
-                        print(f"Valhalla Distance: {distance}m")
-                        print(f"Valhalla Duration: {duration}s")
-                        print(f"Traffic Factor: {traffic_factor}")
-                        print(f"Adjusted Duration: {adjusted_duration}s")
-                        
-                        # Création de la réponse
-                        return {
-                            "path": path,
-                            "distance": distance,
-                            "duration": adjusted_duration,
-                            "duration_text": f"{minutes} min {seconds:02d} sec",
-                            "start_point": start_point,
-                            "end_point": end_point,
-                            "traffic_factor": traffic_factor,
-                            "success": True
-                        }
-                    else:
-                        error_msg = data.get('error', 'Aucune route trouvée')
-                        print(f"Valhalla Error: {error_msg}")
+                    # Valhalla a répondu normalement mais ne trouve pas de route :
+                    # une nouvelle tentative donnerait la même réponse
+                    logger.info("Valhalla ne trouve pas de route: %s", data.get('error', 'Aucune route trouvée'))
+                    break
                         
                 elif response.status_code == 400:
-                    print("Requête Valhalla invalide - arrêt des tentatives")
-                    print(f"Response: {response.text}")
+                    breaker.record_success(elapsed)
+                    logger.warning("Requête Valhalla invalide - arrêt des tentatives: %s", response.text)
                     break
                 else:
-                    print(f"Erreur HTTP Valhalla: {response.status_code}")
-                    print(f"Response: {response.text}")
-                        
-                # Si nous sommes ici, c'est que la requête a échoué
-                if attempt < max_retries - 1:
-                    print(f"Tentative {attempt + 1}/{max_retries} après {retry_delay}s")
-                    time.sleep(retry_delay)
-                    retry_delay *= 2  # Backoff exponentiel
+                    breaker.record_failure()
+                    logger.warning("Erreur HTTP Valhalla: %s %s", response.status_code, response.text)
                     
             except requests.exceptions.RequestException as e:
-                print(f"Erreur de requête Valhalla: {str(e)}")
-                if attempt < max_retries - 1:
-                    print(f"Tentative {attempt + 1}/{max_retries} après {retry_delay}s")
-                    time.sleep(retry_delay)
-                    retry_delay *= 2
+                breaker.record_failure()
+                logger.warning("Erreur de requête Valhalla: %s", e)
             except (KeyError, ValueError, TypeError) as e:
-                print(f"Erreur de traitement des données Valhalla: {str(e)}")
+                breaker.record_failure()
+                logger.warning("Erreur de traitement des données Valhalla: %s", e)
                 break
+            
+            # Si nous sommes ici, c'est que la requête a échoué : attendre avant
+            # la tentative suivante si le budget de latence le permet encore
+            if attempt < max_retries - 1:
+                if time.monotonic() + retry_delay >= deadline:
+                    logger.warning("Budget de latence épuisé - arrêt des tentatives")
+                    break
+                logger.info("Tentative %s/%s après %ss", attempt + 1, max_retries, retry_delay)
+                time.sleep(retry_delay)
+                retry_delay *= 2  # Backoff exponentiel
         
         # En cas d'échec après tous les essais, utiliser la méthode de secours
-        print("Utilisation du calcul d'itinéraire de secours")
+        logger.warning("Utilisation du calcul d'itinéraire de secours")
+        increment('valhalla_routes_total', outcome='fallback')
         return RoutingService.fallback_route(start_point, end_point)
     
     @staticmethod
-    def _decode_polyline(encoded_string, precision=6):
+    async def aget_route(start_point, end_point, max_retries=3, retry_delay=1):
         """
-        Décode une polyline encodée (format utilisé par Valhalla)
+        Version asynchrone de get_route : l'appel à Valhalla ne bloque pas le
+        worker, qui peut attendre des centaines de réponses à la fois
+        """
+        if not RoutingService._validate_coordinates(start_point) or not RoutingService._validate_coordinates(end_point):
+            logger.warning("Coordonnées invalides")
+            return RoutingService.fallback_route(start_point, end_point)
+        
+        if getattr(settings, 'ROUTING_PROVIDER', 'valhalla') == 'local':
+            traffic_factor = TrafficDataService.get_traffic_factor(None, datetime.now().hour)
+            # Calcul en mémoire : exécuté hors de la boucle d'événements
+            with timed('local_routing'):
+                route = await sync_to_async(LocalRoutingEngine.get_route, thread_sensitive=False)(
+                    start_point, end_point, traffic_factor
+                )
+            if route is not None:
+                return route
+            logger.info("Itinéraire local indisponible - appel à Valhalla")
+        
+        return await RoutingService.aget_valhalla_route(start_point, end_point, max_retries, retry_delay)
+    
+    @staticmethod
+    async def aget_valhalla_route(start_point, end_point, max_retries=3, retry_delay=1):
+        """
+        Version asynchrone de get_valhalla_route (mêmes tentatives, disjoncteur
+        et budget de latence)
+        """
+        valhalla = get_async_http_client("valhalla")
+        payload = RoutingService._valhalla_route_payload(start_point, end_point)
+        
+        breaker = get_circuit_breaker("valhalla")
+        if not breaker.allow_request():
+            logger.warning("Circuit Valhalla ouvert - utilisation du calcul d'itinéraire de secours")
+            increment('valhalla_routes_total', outcome='fallback')
+            return RoutingService.fallback_route(start_point, end_point)
+        
+        deadline = time.monotonic() + getattr(settings, 'ROUTING_LATENCY_BUDGET', 20)
+        
+        for attempt in range(max_retries):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or (attempt > 0 and not breaker.allow_request()):
+                break
+            
+            try:
+                started = time.monotonic()
+                response = await valhalla.post("/route", json=payload, timeout=remaining)
+                elapsed = time.monotonic() - started
+                
+                if response.status_code == 200:
+                    data = response.json()
+                    route = RoutingService._parse_valhalla_route(data, start_point, end_point)
+                    breaker.record_success(elapsed)
+                    if route is not None:
+                        increment('valhalla_routes_total', outcome='success')
+                        return route
+                    logger.info("Valhalla ne trouve pas de route: %s", data.get('error', 'Aucune route trouvée'))
+                    break
+                elif response.status_code == 400:
+                    breaker.record_success(elapsed)
+                    logger.warning("Requête Valhalla invalide - arrêt des tentatives: %s", response.text)
+                    break
+                else:
+                    breaker.record_failure()
+                    logger.warning("Erreur HTTP Valhalla: %s", response.status_code)
+            
+            except AsyncHttpError as e:
+                breaker.record_failure()
+                logger.warning("Erreur de requête Valhalla: %s", e)
+            except (KeyError, ValueError, TypeError) as e:
+                breaker.record_failure()
+                logger.warning("Erreur de traitement des données Valhalla: %s", e)
+                break
+            
+            if attempt < max_retries - 1:
+                if time.monotonic() + retry_delay >= deadline:
+                    logger.warning("Budget de latence épuisé - arrêt des tentatives")
+                    break
+                logger.info("Tentative %s/%s après %ss", attempt + 1, max_retries, retry_delay)
+                await asyncio.sleep(retry_delay)
+                retry_delay *= 2  # Backoff exponentiel
+        
+        logger.warning("Utilisation du calcul d'itinéraire de secours")
+        increment('valhalla_routes_total', outcome='fallback')
+        return RoutingService.fallback_route(start_point, end_point)
+    
+    @staticmethod
+    def _valhalla_route_payload(start_point, end_point):
+        return {
+            "locations": [
+                {"lat": start_point[1], "lon": start_point[0]},
+                {"lat": end_point[1], "lon": end_point[0]}
+            ],
+            "costing": "auto",
+            "shape_match": "edge_walk",
+            "filters": {
+                "attributes": ["edge.length", "edge.time"],
+                "action": "include"
+            }
+        }
+    
+    @staticmethod
+    def _parse_valhalla_route(data, start_point, end_point):
+        """
+        Construit l'itinéraire à partir d'une réponse /route de Valhalla,
+        durée corrigée du facteur de trafic de l'heure courante
+        
+        Returns:
+            Dictionnaire au format de get_route, None si Valhalla ne trouve pas de route
+        
+        Raises:
+            KeyError: Réponse sans géométrie
         """
+        if not ("trip" in data and "legs" in data["trip"] and len(data["trip"]["legs"]) > 0):
+            return None
+        
+        leg = data["trip"]["legs"][0]  # Premier segment
+        
+        # Extraction du chemin (coordonnées décodées du shape)
+        path = RoutingService._decode_polyline(leg["shape"])
+        
+        # Extraction de la distance en mètres
+        distance = leg.get("summary", {}).get("length", 0) * 1000  # Conversion km -> m
+        
+        # Extraction de la durée en secondes
+        duration = leg.get("summary", {}).get("time", 0)
+        
+        # Appliquer le facteur de trafic de l'heure actuelle à la durée
+        with timed('traffic_adjustment'):
+            traffic_factor = TrafficDataService.get_traffic_factor(None, datetime.now().hour)
+            adjusted_duration = duration * traffic_factor
+        
+        # Formatage du temps en minutes et secondes
+        minutes = int(adjusted_duration // 60)
+        seconds = int(adjusted_duration % 60)
+        
+        logger.debug(
+            "Itinéraire Valhalla: %d points, %.0f m, %.0f s (%.0f s avec le facteur de trafic %s)",
+            len(path), distance, duration, adjusted_duration, traffic_factor
+        )
+        
+        return {
+            "path": path,
+            # Géométrie encodée d'origine, renvoyée telle quelle au format polyline6
+            "polyline": leg["shape"],
+            "distance": distance,
+            "duration": adjusted_duration,
+            "duration_text": f"{minutes} min {seconds:02d} sec",
+            "start_point": start_point,
+            "end_point": end_point,
+            "traffic_factor": traffic_factor,
+            "success": True
+        }
+    
+    @staticmethod
+    def get_matrix(sources, targets, hour_of_day=None):
+        """
+        Calcule les durées et distances entre chaque source et chaque destination
+        sources et targets sont des listes de points [longitude, latitude]
+        
+        Returns:
+            Dictionnaire {'durations', 'distances'} (listes de lignes, secondes et
+            mètres, None si aucun chemin), 'traffic_factor' et 'provider'
+        """
+        if hour_of_day is None:
+            hour_of_day = datetime.now().hour
+        traffic_factor = TrafficDataService.get_traffic_factor(None, hour_of_day)
+        
+        durations, distances, provider = RoutingService.compute_matrix(sources, targets)
+        # Facteur de trafic appliqué à toute la matrice d'un coup
+        durations = np.round(durations * traffic_factor, 1)
+        distances = np.round(distances, 1)
+        
+        def to_rows(values):
+            return [
+                [value if math.isfinite(value) else None for value in row]
+                for row in values.tolist()
+            ]
+        
+        return {
+            "durations": to_rows(durations),
+            "distances": to_rows(distances),
+            "traffic_factor": traffic_factor,
+            "provider": provider
+        }
+    
+    @staticmethod
+    def compute_matrix(sources, targets):
+        """
+        Matrices brutes des durées (sans facteur de trafic) et distances
+        
+        Returns:
+            (durées, distances, fournisseur) : tableaux NumPy, inf sans chemin
+        """
+        provider = getattr(settings, 'ROUTING_PROVIDER', 'valhalla')
+        matrix = None
+        if provider == 'local':
+            matrix = LocalRoutingEngine.get_matrix(sources, targets)
+            if matrix is None:
+                logger.info("Matrice locale indisponible - appel à Valhalla")
+                provider = 'valhalla'
+        if matrix is None:
+            matrix = RoutingService.get_valhalla_matrix(sources, targets)
+        if matrix is None:
+            provider = 'fallback'
+            matrix = RoutingService.fallback_matrix(sources, targets)
+        return matrix[0], matrix[1], provider
+    
+    @staticmethod
+    def get_valhalla_matrix(sources, targets):
+        """
+        Matrice des durées (sans facteur de trafic) et distances via l'API
+        sources_to_targets de Valhalla
+        
+        Les sources sont envoyées par lots pour rester sous la limite de paires
+        par appel du serveur (VALHALLA_MATRIX_MAX_PAIRS).
+        
+        Returns:
+            (durées, distances) : tableaux NumPy, inf sans chemin ; None en cas d'échec
+        """
+        valhalla = get_http_client("valhalla")
+        breaker = get_circuit_breaker("valhalla")
+        deadline = time.monotonic() + getattr(settings, 'ROUTING_LATENCY_BUDGET', 20)
+        rows_per_call = max(1, getattr(settings, 'VALHALLA_MATRIX_MAX_PAIRS', 2500) // len(targets))
+        
+        durations = np.full((len(sources), len(targets)), np.inf)
+        distances = np.full((len(sources), len(targets)), np.inf)
+        targets_payload = [{"lat": point[1], "lon": point[0]} for point in targets]
+        
+        for first_row in range(0, len(sources), rows_per_call):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not breaker.allow_request():
+                logger.warning("Circuit Valhalla ouvert ou budget épuisé - matrice de secours")
+                return None
+            
+            batch = sources[first_row:first_row + rows_per_call]
+            payload = {
+                "sources": [{"lat": point[1], "lon": point[0]} for point in batch],
+                "targets": targets_payload,
+                "costing": "auto"
+            }
+            
+            try:
+                started = time.monotonic()
+                response = valhalla.post("/sources_to_targets", json=payload, timeout=remaining)
+                elapsed = time.monotonic() - started
+                
+                if response.status_code >= 500:
+                    breaker.record_failure()
+                    logger.warning("Erreur HTTP Valhalla (matrice): %s", response.status_code)
+                    return None
+                breaker.record_success(elapsed)
+                if response.status_code != 200:
+                    logger.warning("Requête de matrice Valhalla refusée: %s %s", response.status_code, response.text)
+                    return None
+                
+                for row in response.json()["sources_to_targets"]:
+                    for cell in row:
+                        if cell.get("time") is not None and cell.get("distance") is not None:
+                            source_index = first_row + cell["from_index"]
+                            durations[source_index, cell["to_index"]] = cell["time"]
+                            distances[source_index, cell["to_index"]] = cell["distance"] * 1000  # km -> m
+            
+            except requests.exceptions.RequestException as e:
+                breaker.record_failure()
+                logger.warning("Erreur de requête Valhalla (matrice): %s", e)
+                return None
+            except (KeyError, ValueError, TypeError, IndexError) as e:
+                breaker.record_failure()
+                logger.warning("Erreur de traitement de la matrice Valhalla: %s", e)
+                return None
+        
+        return durations, distances
+    
+    @staticmethod
+    def fallback_matrix(sources, targets):
+        """
+        Matrice de secours : distance à vol d'oiseau corrigée, à 50 km/h
+        (mêmes hypothèses que fallback_route, sans facteur de trafic)
+        """
+        distances = haversine_matrix(sources, targets) * 1.3
+        durations = distances / (50 / 3.6)
+        return durations, distances
+    
+    @staticmethod
+    def get_isochrone(point, minutes, hour_of_day=None):
+        """
+        Calcule les zones atteignables depuis un point [longitude, latitude]
+        en moins de chacune des durées demandées (minutes)
+        
+        Returns:
+            Dictionnaire {'center', 'contours': [{'minutes', 'polygons'}],
+            'traffic_factor', 'provider'} ; les polygones sont au format des
+            coordonnées GeoJSON MultiPolygon
+        """
+        if hour_of_day is None:
+            hour_of_day = datetime.now().hour
+        traffic_factor = TrafficDataService.get_traffic_factor(None, hour_of_day)
+        thresholds = [value * 60 for value in minutes]
+        
+        provider = getattr(settings, 'ROUTING_PROVIDER', 'valhalla')
+        contours = None
+        if provider == 'local':
+            contours = LocalRoutingEngine.get_isochrone(point, thresholds, traffic_factor)
+            if contours is None:
+                logger.info("Isochrone locale indisponible - appel à Valhalla")
+                provider = 'valhalla'
+        if contours is None:
+            contours = RoutingService.get_valhalla_isochrone(point, thresholds, traffic_factor)
+        if contours is None:
+            # Secours : disques parcourus à 50 km/h avec le facteur de détour de fallback_route
+            provider = 'fallback'
+            speed = 50 / 3.6 / traffic_factor
+            contours = [[circle_polygon(point, threshold * speed / 1.3)] for threshold in thresholds]
+        
+        return {
+            "center": point,
+            "contours": [
+                {"minutes": value, "polygons": polygons}
+                for value, polygons in zip(minutes, contours)
+            ],
+            "traffic_factor": traffic_factor,
+            "provider": provider
+        }
+    
+    @staticmethod
+    def get_valhalla_isochrone(point, thresholds, traffic_factor=1.0):
+        """
+        Isochrones via l'API Valhalla, seuils (secondes) corrigés du facteur de trafic
+        
+        Returns:
+            Pour chaque seuil, la liste des polygones ; None en cas d'échec
+        """
+        breaker = get_circuit_breaker("valhalla")
+        if not breaker.allow_request():
+            logger.warning("Circuit Valhalla ouvert - isochrone de secours")
+            return None
+        
+        # Valhalla attend des minutes, sans trafic : un trafic dense réduit la zone
+        contour_minutes = [threshold / 60 / traffic_factor for threshold in thresholds]
+        payload = {
+            "locations": [{"lat": point[1], "lon": point[0]}],
+            "costing": "auto",
+            "contours": [{"time": value} for value in contour_minutes],
+            "polygons": True
+        }
+        
         try:
-            coordinates = []
-            index = 0
-            lat = 0
-            lng = 0
-            factor = 10 ** precision
-
-            while index < len(encoded_string):
-                # Décodage latitude
-                shift = 0
-                result = 0
-                while True:
-                    byte = ord(encoded_string[index]) - 63
-                    index += 1
-                    result |= (byte & 0x1f) << shift
-                    shift += 5
-                    if byte < 0x20:
-                        break
+            started = time.monotonic()
+            response = get_http_client("valhalla").post(
+                "/isochrone", json=payload,
+                timeout=getattr(settings, 'ROUTING_LATENCY_BUDGET', 20)
+            )
+            elapsed = time.monotonic() - started
+            
+            if response.status_code >= 500:
+                breaker.record_failure()
+                logger.warning("Erreur HTTP Valhalla (isochrone): %s", response.status_code)
+                return None
+            breaker.record_success(elapsed)
+            if response.status_code != 200:
+                logger.warning("Requête d'isochrone Valhalla refusée: %s %s", response.status_code, response.text)
+                return None
+            
+            # Les contours sont renvoyés du plus grand au plus petit : associer
+            # chaque polygone au seuil demandé le plus proche
+            contours = [[] for _ in thresholds]
+            for feature in response.json()["features"]:
+                geometry = feature["geometry"]
+                if geometry["type"] not in ("Polygon", "MultiPolygon"):
+                    continue
+                contour = feature["properties"]["contour"]
+                index = min(range(len(contour_minutes)), key=lambda i: abs(contour_minutes[i] - contour))
+                if geometry["type"] == "Polygon":
+                    contours[index].append(geometry["coordinates"])
+                else:
+                    contours[index].extend(geometry["coordinates"])
+            return contours
+        
+        except requests.exceptions.RequestException as e:
+            breaker.record_failure()
+            logger.warning("Erreur de requête Valhalla (isochrone): %s", e)
+        except (KeyError, ValueError, TypeError) as e:
+            breaker.record_failure()
+            logger.warning("Erreur de traitement de l'isochrone Valhalla: %s", e)
+        return None
+    
+    @staticmethod
+    def get_route_legs(points):
+        """
+        Calcule les itinéraires entre chaque point et le suivant d'une tournée
+        
+        Returns:
+            Liste de dictionnaires au format de get_route, un par tronçon
+        """
+        pairs = list(zip(points, points[1:]))
+        if getattr(settings, 'ROUTING_PROVIDER', 'valhalla') == 'local':
+            return [RoutingService.get_route(start, end) for start, end in pairs]
+        
+        legs = RoutingService.get_valhalla_legs(points)
+        if legs is None:
+            logger.warning("Utilisation du calcul d'itinéraire de secours pour la tournée")
+            legs = [RoutingService.fallback_route(start, end) for start, end in pairs]
+        return legs
+    
+    @staticmethod
+    def get_valhalla_legs(points):
+        """
+        Itinéraires entre points consécutifs via Valhalla, avec plusieurs
+        positions par appel (au plus VALHALLA_MAX_LOCATIONS)
+        
+        Returns:
+            Liste de dictionnaires au format de get_route, ou None en cas d'échec
+        """
+        valhalla = get_http_client("valhalla")
+        breaker = get_circuit_breaker("valhalla")
+        deadline = time.monotonic() + getattr(settings, 'ROUTING_LATENCY_BUDGET', 20)
+        max_locations = max(2, getattr(settings, 'VALHALLA_MAX_LOCATIONS', 20))
+        traffic_factor = TrafficDataService.get_traffic_factor(None, datetime.now().hour)
+        
+        legs = []
+        # Les lots se chevauchent d'un point : la fin d'un lot est le début du suivant
+        for first in range(0, len(points) - 1, max_locations - 1):
+            batch = points[first:first + max_locations]
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not breaker.allow_request():
+                return None
+            
+            payload = {
+                "locations": [{"lat": point[1], "lon": point[0]} for point in batch],
+                "costing": "auto"
+            }
+            
+            try:
+                started = time.monotonic()
+                response = valhalla.post("/route", json=payload, timeout=remaining)
+                elapsed = time.monotonic() - started
                 
-                lat_change = ~(result >> 1) if (result & 1) else (result >> 1)
-                lat += lat_change
-
-                # Décodage longitude
-                shift = 0
-                result = 0
-                while True:
-                    byte = ord(encoded_string[index]) - 63
-                    index += 1
-                    result |= (byte & 0x1f) << shift
-                    shift += 5
-                    if byte < 0x20:
-                        break
+                if response.status_code >= 500:
+                    breaker.record_failure()
+                    logger.warning("Erreur HTTP Valhalla (tournée): %s", response.status_code)
+                    return None
+                breaker.record_success(elapsed)
+                if response.status_code != 200:
+                    logger.warning("Requête de tournée Valhalla refusée: %s %s", response.status_code, response.text)
+                    return None
                 
-                lng_change = ~(result >> 1) if (result & 1) else (result >> 1)
-                lng += lng_change
-
-                coordinates.append([lng / factor, lat / factor])
-
-            return coordinates
+                trip_legs = response.json()["trip"]["legs"]
+                if len(trip_legs) != len(batch) - 1:
+                    logger.warning("Réponse Valhalla incomplète pour la tournée")
+                    return None
+                
+                for start_point, end_point, leg in zip(batch, batch[1:], trip_legs):
+                    duration = leg["summary"]["time"] * traffic_factor
+                    minutes = int(duration // 60)
+                    seconds = int(duration % 60)
+                    legs.append({
+                        "path": RoutingService._decode_polyline(leg["shape"]),
+                        "distance": leg["summary"]["length"] * 1000,  # km -> m
+                        "duration": duration,
+                        "duration_text": f"{minutes} min {seconds:02d} sec",
+                        "start_point": start_point,
+                        "end_point": end_point,
+                        "traffic_factor": traffic_factor,
+                        "success": True
+                    })
             
+            except requests.exceptions.RequestException as e:
+                breaker.record_failure()
+                logger.warning("Erreur de requête Valhalla (tournée): %s", e)
+                return None
+            except (KeyError, ValueError, TypeError) as e:
+                breaker.record_failure()
+                logger.warning("Erreur de traitement de la tournée Valhalla: %s", e)
+                return None
+        
+        return legs
+    
+    @staticmethod
+    def _decode_polyline(encoded_string, precision=6):
+        """
+        Décode une polyline encodée (format utilisé par Valhalla)
+        """
+        try:
+            with timed('polyline_decode'):
+                return polyline.decode(encoded_string, precision).tolist()
         except Exception as e:
-            print(f"Erreur de décodage polyline: {str(e)}")
+            logger.warning("Erreur de décodage polyline: %s", e)
             return []
     
     @staticmethod
@@ -262,23 +774,18 @@ class RoutingService:
         """
         Méthode de secours pour calculer un itinéraire si l'API Valhalla échoue
         """
+        increment('fallback_routes_total')
         try:
             # Simulation d'un itinéraire avec quelques points intermédiaires
             path = RoutingService.generate_path(start_point, end_point, 35)
             
             # Calcul de la distance réelle en additionnant les segments du chemin
-            distance = 0
-            for i in range(len(path) - 1):
-                segment_distance = RoutingService.haversine_distance(
-                    path[i][1], path[i][0],
-                    path[i+1][1], path[i+1][0]
-                )
-                distance += segment_distance
+            path_distance = path_length(path)
             
             # Ajout d'un facteur de correction pour simuler les routes réelles
             # Les routes réelles sont généralement 20-30% plus longues que la ligne droite
             road_winding_factor = 1.3
-            distance = distance * road_winding_factor
+            distance = path_distance * road_winding_factor
             
             # Obtenir l'heure actuelle pour le facteur de trafic
             current_hour = datetime.now().hour
@@ -286,7 +793,7 @@ class RoutingService:
             # Estimation de la vitesse moyenne en fonction du trafic
             # Vitesse de base: 50 km/h en ville
             traffic_factor = TrafficDataService.get_traffic_factor(None, current_hour)
-            road_type_factor = TrafficDataService.get_road_type_factor(path)
+            road_type_factor = TrafficDataService.get_road_type_factor(path, path_distance)
             base_speed_kmh = 50
             speed_kmh = base_speed_kmh * road_type_factor / traffic_factor
             
@@ -315,12 +822,9 @@ class RoutingService:
             }
             
         except Exception as e:
-            print(f"Erreur dans le calcul de secours: {str(e)}")
+            logger.exception("Erreur dans le calcul de secours: %s", e)
             # Calcul ultra-basique en dernier recours
-            direct_distance = RoutingService.haversine_distance(
-                start_point[1], start_point[0],
-                end_point[1], end_point[0]
-            )
+            direct_distance = float(haversine(start_point[0], start_point[1], end_point[0], end_point[1]))
             
             return {
                 "path": [start_point, end_point],
@@ -336,35 +840,6 @@ class RoutingService:
                 "error": "Calcul d'urgence utilisé"
             }
     
-    @staticmethod
-    def haversine_distance(lat1, lon1, lat2, lon2):
-        """
-        Calcule la distance à vol d'oiseau entre deux points en mètres
-        """
-        try:
-            R = 6371000  # Rayon de la Terre en mètres
-            
-            # Conversion en radians
-            lat1_rad = math.radians(float(lat1))
-            lon1_rad = math.radians(float(lon1))
-            lat2_rad = math.radians(float(lat2))
-            lon2_rad = math.radians(float(lon2))
-            
-            # Différence de latitude et longitude
-            dlat = lat2_rad - lat1_rad
-            dlon = lon2_rad - lon1_rad
-            
-            # Formule de Haversine
-            a = math.sin(dlat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon/2)**2
-            c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-            distance = R * c
-            
-            return max(distance, 0)  # S'assurer que la distance n'est pas négative
-            
-        except (ValueError, TypeError) as e:
-            print(f"Erreur dans le calcul de distance: {str(e)}")
-            return 0
-    
     @staticmethod
     def generate_path(start_point, end_point, num_points):
         """
@@ -416,7 +891,7 @@ class RoutingService:
             return path
             
         except Exception as e:
-            print(f"Erreur dans la génération du chemin: {str(e)}")
+            logger.exception("Erreur dans la génération du chemin: %s", e)
             # Retourner un chemin simple en cas d'erreur
             return [start_point, end_point]
 
@@ -458,16 +933,17 @@ class TrafficDataService:
                 return 1.0 * day_factor  # Trafic normal
                 
         except Exception as e:
-            print(f"Erreur dans le calcul du facteur de trafic: {str(e)}")
+            logger.exception("Erreur dans le calcul du facteur de trafic: %s", e)
             return 1.0  # Facteur neutre en cas d'erreur
     
     @staticmethod
-    def get_road_type_factor(path):
+    def get_road_type_factor(path, total_distance=None):
         """
         Estime un facteur de vitesse basé sur le type de route
         
         Args:
             path: Liste de points du chemin
+            total_distance: Longueur du chemin en mètres, si elle est déjà calculée
             
         Returns:
             Facteur de vitesse (>1 pour routes rapides, <1 pour routes lentes)
@@ -480,46 +956,32 @@ class TrafficDataService:
             # Calcul de la distance à vol d'oiseau entre le début et la fin
             start_point = path[0]
             end_point = path[-1]
+            direct_distance = float(haversine(start_point[0], start_point[1], end_point[0], end_point[1]))
             
-            direct_distance = RoutingService.haversine_distance(
-                start_point[1], start_point[0],
-                end_point[1], end_point[0]
-            )
-            
-            # Calcul de la distance totale du chemin
-            total_distance = 0
-            for i in range(len(path) - 1):
-                segment_distance = RoutingService.haversine_distance(
-                    path[i][1], path[i][0],
-                    path[i+1][1], path[i+1][0]
-                )
-                total_distance += segment_distance
-            
-            # Ratio entre la distance totale et la distance directe
-            if direct_distance > 0:
-                sinuosity = total_distance / direct_distance
-            else:
+            # Ratio entre la distance totale du chemin et la distance directe
+            path_sinuosity = sinuosity(path, total_distance)
+            if path_sinuosity is None:
                 return 1.0
             
             # Détermination du type de route en fonction de la sinuosité et de la distance
             if direct_distance > 10000:  # Plus de 10 km
-                if sinuosity < 1.2:
+                if path_sinuosity < 1.2:
                     return 1.3  # Autoroute
                 else:
                     return 1.1  # Route nationale
             elif direct_distance > 3000:  # Entre 3 et 10 km
-                if sinuosity < 1.3:
+                if path_sinuosity < 1.3:
                     return 1.1  # Route nationale
                 else:
                     return 0.9  # Route départementale
             else:  # Moins de 3 km
-                if sinuosity < 1.2:
+                if path_sinuosity < 1.2:
                     return 0.9  # Route urbaine principale
                 else:
                     return 0.7  # Route urbaine secondaire ou ruelle
                     
         except Exception as e:
-            print(f"Erreur dans le calcul du facteur de type de route: {str(e)}")
+            logger.exception("Erreur dans le calcul du facteur de type de route: %s", e)
             return 1.0  # Facteur neutre en cas d'erreur
 
 # Fonction utilitaire pour tester les services
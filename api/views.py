@@ -4,15 +4,32 @@ from rest_framework import status
 from .serializers import (
     LocationSerializer, 
     RouteRequestSerializer, 
+    BatchRouteSerializer,
     RouteResponseSerializer,
-    SearchLocationSerializer
+    SearchLocationSerializer,
+    BatchSearchLocationSerializer,
+    NearestLocationSerializer,
+    RouteMatrixSerializer,
+    MultiStopRouteSerializer,
+    IsochroneSerializer
 )
 from .utils import GeocodingService, RoutingService, TrafficDataService
 from .models import MongoDBManager, PreExtractedLocation
+from .instrumentation import increment
 from .ml_integration import MLIntegration
+from .search import LocationSearchService
+from .polyline import encode as encode_polyline
+from .route_cache import fit_route, fits_route
+from .simplification import route_path
+from .single_flight import route_flights
+from .tour_optimizer import TourOptimizer
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from datetime import datetime
-import traceback
-from django.db.models import Q
+import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 class SearchLocationView(APIView):
     """
@@ -24,20 +41,101 @@ class SearchLocationView(APIView):
         if serializer.is_valid():
             query = serializer.validated_data['query']
             
-            # Recherche dans les lieux pré-extraits avec une recherche insensible à la casse
-            # et qui contient le terme de recherche
-            locations = PreExtractedLocation.objects.filter(
-                Q(name__icontains=query)
-            ).order_by('name')[:10]  # Limiter à 10 résultats
-            
-            if locations:
-                # Formater les résultats
-                results = []
-                for location in locations:
-                    results.append({
-                        'name': location.name,
-                        'coordinates': location.coordinates
-                    })
+            # Recherche dans les lieux pré-extraits sur la clé normalisée
+            # (insensible à la casse, aux accents et aux variantes de l'arabe)
+            results = LocationSearchService.search(
+                query,
+                limit=10,
+                fuzzy=serializer.validated_data['fuzzy']
+            )
+            
+            if results:
+                return Response(results)
+            
+            return Response({'message': 'Aucun lieu trouvé'}, status=status.HTTP_404_NOT_FOUND)
+        
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+class BatchSearchLocationView(APIView):
+    """
+    API pour rechercher plusieurs lieux en une seule requête
+    """
+    # Au-delà de ce nombre de requêtes, les résultats sont envoyés au fil de l'eau
+    STREAM_THRESHOLD = 200
+    
+    def post(self, request):
+        serializer = BatchSearchLocationSerializer(data=request.data)
+        
+        if serializer.is_valid():
+            queries = serializer.validated_data['queries']
+            limit = serializer.validated_data['limit']
+            fuzzy = serializer.validated_data['fuzzy']
+            
+            if len(queries) <= self.STREAM_THRESHOLD:
+                results = LocationSearchService.search_many(queries, limit=limit, fuzzy=fuzzy)
+                return Response([
+                    {'query': query, 'results': locations}
+                    for query, locations in zip(queries, results)
+                ])
+            
+            return StreamingHttpResponse(
+                self._stream_json_array(self._stream_items(queries, limit, fuzzy)),
+                content_type='application/json'
+            )
+        
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    @staticmethod
+    def _stream_items(queries, limit, fuzzy):
+        """
+        Résultats envoyés au fil de l'eau, après le statut 200 : une erreur sur
+        une requête produit un élément d'erreur et la recherche reprend à la
+        suivante, pour que le tableau JSON soit toujours complet
+        """
+        start = 0
+        while start < len(queries):
+            results = LocationSearchService.search_many(queries[start:], limit=limit, fuzzy=fuzzy)
+            for query in queries[start:]:
+                start += 1
+                try:
+                    locations = next(results)
+                except Exception as e:
+                    logger.exception("Erreur dans BatchSearchLocationView: %s", e)
+                    yield {
+                        'query': query,
+                        'results': [],
+                        'error': f"Une erreur s'est produite lors de la recherche: {str(e)}"
+                    }
+                    # Le générateur est terminé par l'exception : en créer un autre
+                    break
+                yield {'query': query, 'results': locations}
+    
+    @staticmethod
+    def _stream_json_array(items):
+        """
+        Produit un tableau JSON élément par élément
+        """
+        yield '['
+        for i, item in enumerate(items):
+            yield (',' if i else '') + json.dumps(item, ensure_ascii=False)
+        yield ']'
+
+class NearestLocationView(APIView):
+    """
+    API pour trouver les lieux nommés les plus proches d'un point (géocodage inverse)
+    """
+    def post(self, request):
+        serializer = NearestLocationSerializer(data=request.data)
+        
+        if serializer.is_valid():
+            # Index spatial en mémoire construit sur les lieux pré-extraits : aucun appel réseau
+            results = LocationSearchService.nearest(
+                serializer.validated_data['coordinates'],
+                k=serializer.validated_data['k'],
+                max_distance=serializer.validated_data.get('max_distance')
+            )
+            
+            if results:
                 return Response(results)
             
             return Response({'message': 'Aucun lieu trouvé'}, status=status.HTTP_404_NOT_FOUND)
@@ -57,42 +155,151 @@ class RouteView(APIView):
                 end_point = serializer.validated_data['end_point']
                 
                 # Vérifier si l'itinéraire existe déjà dans MongoDB
-                existing_route = MongoDBManager.find_route(start_point, end_point)
-                
-                if existing_route and 'duration_text' in existing_route:
-                    # Si l'itinéraire existe et contient le format de durée, le retourner
-                    return Response({
-                        'path': existing_route['path'],
-                        'distance': existing_route['distance'],
-                        'duration': existing_route['duration'],
-                        'duration_text': existing_route['duration_text'],
-                        'start_point': existing_route['start_point'],
-                        'end_point': existing_route['end_point']
-                    })
-                
-                # Sinon, calculer l'itinéraire avec l'API OSRM
-                route = RoutingService.get_route(start_point, end_point)
+                existing_route = self.find_cached_route(start_point, end_point)
+                increment('route_cache_requests_total', result='hit' if existing_route else 'miss')
+                if existing_route:
+                    return Response(self.format_response(existing_route, serializer.validated_data))
                 
-                # Sauvegarder l'itinéraire dans MongoDB
-                MongoDBManager.save_route(
-                    start_point,
-                    end_point,
-                    route['path'],
-                    route['distance'],
-                    route['duration'],
-                    route.get('duration_text', '')
+                # Sinon, le calculer ; les requêtes simultanées pour le même
+                # itinéraire attendent le résultat du premier calcul
+                route = route_flights.do(
+                    MongoDBManager.route_key(start_point, end_point),
+                    lambda: self.compute_route(start_point, end_point),
+                    recheck=lambda: self.find_cached_route(start_point, end_point)
                 )
                 
-                return Response(route)
+                return Response(self.format_response(route, serializer.validated_data))
             
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
-            print(f"Erreur dans RouteView: {str(e)}")
-            traceback.print_exc()
+            logger.exception("Erreur dans RouteView: %s", e)
             return Response(
                 {'error': f"Une erreur s'est produite lors du calcul de l'itinéraire: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+    
+    @staticmethod
+    def cached_response(existing_route, start_point, end_point):
+        """
+        Réponse construite à partir d'un itinéraire enregistré dans MongoDB,
+        None s'il n'a pas le format de durée attendu ou si ses points sont trop
+        loin de start_point / end_point (api/route_cache.py)
+        """
+        if not existing_route or 'duration_text' not in existing_route:
+            return None
+        if not fits_route(existing_route, start_point, end_point):
+            return None
+        return {
+            'path': existing_route['path'],
+            'distance': existing_route['distance'],
+            'duration': existing_route['duration'],
+            'duration_text': existing_route['duration_text'],
+            'start_point': existing_route['start_point'],
+            'end_point': existing_route['end_point'],
+            'simplified_paths': existing_route.get('simplified_paths')
+        }
+    
+    @staticmethod
+    def format_response(route, options=None):
+        """
+        Met la géométrie de l'itinéraire au format demandé
+        
+        Args:
+            route: Itinéraire calculé ou enregistré
+            options: Données validées de RouteRequestSerializer
+                - start_point / end_point : points exacts auxquels est raccordé
+                  un itinéraire partagé par des points voisins (api/route_cache.py)
+                - tolerance / zoom : tracé simplifié (niveau précalculé du cache si disponible)
+                - format 'coordinates' : path en liste de [longitude, latitude] ;
+                  'polyline6' : polyline encodée (précision 6) à la place de path,
+                  reprise telle quelle de Valhalla pour le tracé complet
+        """
+        options = options or {}
+        if 'start_point' in options and 'end_point' in options:
+            route = fit_route(route, options['start_point'], options['end_point'])
+        path = route_path(route, options.get('zoom'), options.get('tolerance'))
+        data = {}
+        for key, value in route.items():
+            if key == 'path':
+                if options.get('format') == 'polyline6':
+                    encoded = route.get('polyline') if path is value else None
+                    data['polyline'] = encoded or encode_polyline(path)
+                else:
+                    data['path'] = path
+            elif key not in ('polyline', 'simplified_paths'):
+                data[key] = value
+        return data
+    
+    @staticmethod
+    def find_cached_route(start_point, end_point):
+        return RouteView.cached_response(MongoDBManager.find_route(start_point, end_point), start_point, end_point)
+    
+    @staticmethod
+    def compute_route(start_point, end_point):
+        """
+        Calcule l'itinéraire et l'enregistre dans MongoDB
+        """
+        route = RoutingService.get_route(start_point, end_point)
+        
+        MongoDBManager.save_route(
+            start_point,
+            end_point,
+            route['path'],
+            route['distance'],
+            route['duration'],
+            route.get('duration_text', '')
+        )
+        return route
+
+class BatchRouteView(APIView):
+    """
+    API pour calculer plusieurs itinéraires en une seule requête
+    
+    Les itinéraires déjà enregistrés sont lus en une requête MongoDB, les autres
+    sont calculés en parallèle puis enregistrés en une écriture groupée.
+    """
+    def post(self, request):
+        try:
+            serializer = BatchRouteSerializer(data=request.data)
+            
+            if serializer.is_valid():
+                pairs = [
+                    (item['start_point'], item['end_point'])
+                    for item in serializer.validated_data['routes']
+                ]
+                existing_routes = MongoDBManager.find_routes(pairs)
+                
+                results = [None] * len(pairs)
+                # Paires à calculer (une seule fois par itinéraire) et leurs positions
+                missing = {}
+                for i, (start_point, end_point) in enumerate(pairs):
+                    route_key = MongoDBManager.route_key(start_point, end_point)
+                    results[i] = RouteView.cached_response(existing_routes.get(route_key), start_point, end_point)
+                    if results[i] is None:
+                        missing.setdefault(route_key, ((start_point, end_point), []))[1].append(i)
+                misses = sum(len(positions) for _, positions in missing.values())
+                increment('route_cache_requests_total', len(pairs) - misses, result='hit')
+                increment('route_cache_requests_total', misses, result='miss')
+                
+                if missing:
+                    routes = RoutingService.get_routes([pair for pair, _ in missing.values()])
+                    for route, (_, positions) in zip(routes, missing.values()):
+                        for i in positions:
+                            results[i] = route
+                    MongoDBManager.save_routes(routes)
+                
+                return Response([
+                    RouteView.format_response(route, item)
+                    for route, item in zip(results, serializer.validated_data['routes'])
+                ])
+            
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.exception("Erreur dans BatchRouteView: %s", e)
+            return Response(
+                {'error': f"Une erreur s'est produite lors du calcul des itinéraires: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
 
 class OptimizedRouteView(APIView):
     """
@@ -131,17 +338,153 @@ class OptimizedRouteView(APIView):
                     'duration': route['duration'],
                     'duration_text': route.get('duration_text', ''),
                     'start_point': route['start_point'],
-                    'end_point': route['end_point']
+                    'end_point': route['end_point'],
+                    'polyline': route.get('polyline')
                 }
                 
-                return Response(response_data)
+                return Response(RouteView.format_response(response_data, serializer.validated_data))
             
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
-            print(f"Erreur dans OptimizedRouteView: {str(e)}")
-            traceback.print_exc()
+            logger.exception("Erreur dans OptimizedRouteView: %s", e)
             return Response(
                 {'error': f"Une erreur s'est produite lors du calcul de l'itinéraire optimisé: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+
+class RouteMatrixView(APIView):
+    """
+    API pour calculer les durées et distances entre plusieurs sources et destinations
+    en un seul calcul (sans géométrie)
+    """
+    def post(self, request):
+        try:
+            serializer = RouteMatrixSerializer(data=request.data)
+            
+            if serializer.is_valid():
+                sources = serializer.validated_data['sources']
+                targets = serializer.validated_data['targets']
+                
+                invalid = [
+                    point for point in sources + targets
+                    if not RoutingService._validate_coordinates(point)
+                ]
+                if invalid:
+                    return Response(
+                        {'error': f"Coordonnées invalides: {invalid[0]}"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                
+                matrix = RoutingService.get_matrix(
+                    sources, targets, serializer.validated_data.get('hour')
+                )
+                return Response(matrix)
+            
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.exception("Erreur dans RouteMatrixView: %s", e)
+            return Response(
+                {'error': f"Une erreur s'est produite lors du calcul de la matrice: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+class MultiStopRouteView(APIView):
+    """
+    API pour calculer une tournée : départ, arrêts à visiter dans le meilleur
+    ordre, et point d'arrivée facultatif
+    """
+    def post(self, request):
+        try:
+            serializer = MultiStopRouteSerializer(data=request.data)
+            
+            if serializer.is_valid():
+                start_point = serializer.validated_data['start_point']
+                stops = serializer.validated_data['stops']
+                end_point = serializer.validated_data.get('end_point')
+                
+                points = [start_point] + stops + ([end_point] if end_point else [])
+                invalid = [point for point in points if not RoutingService._validate_coordinates(point)]
+                if invalid:
+                    return Response(
+                        {'error': f"Coordonnées invalides: {invalid[0]}"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                
+                # Matrice des durées calculée une seule fois, puis ordre des arrêts
+                durations, _, provider = RoutingService.compute_matrix(points, points)
+                order = TourOptimizer.solve(
+                    durations,
+                    has_end=end_point is not None,
+                    time_budget=getattr(settings, 'TOUR_OPTIMIZATION_BUDGET', 2)
+                )
+                
+                ordered_points = [start_point] + [points[i] for i in order] + ([end_point] if end_point else [])
+                legs = RoutingService.get_route_legs(ordered_points)
+                
+                # Géométrie continue : le premier point de chaque tronçon est la fin du précédent
+                path = []
+                leg_summaries = []
+                for leg in legs:
+                    leg_summaries.append({
+                        'start_point': leg['start_point'],
+                        'end_point': leg['end_point'],
+                        'distance': leg['distance'],
+                        'duration': leg['duration'],
+                        'duration_text': leg.get('duration_text', ''),
+                        'path_start': max(len(path) - 1, 0)
+                    })
+                    path.extend(leg['path'][1:] if path else leg['path'])
+                
+                distance = sum(leg['distance'] for leg in legs)
+                duration = sum(leg['duration'] for leg in legs)
+                minutes = int(duration // 60)
+                seconds = int(duration % 60)
+                
+                return Response({
+                    'order': [i - 1 for i in order],  # indices dans la liste `stops`
+                    'legs': leg_summaries,
+                    'path': path,
+                    'distance': distance,
+                    'duration': duration,
+                    'duration_text': f"{minutes} min {seconds:02d} sec",
+                    'start_point': start_point,
+                    'end_point': ordered_points[-1],
+                    'matrix_provider': provider
+                })
+            
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.exception("Erreur dans MultiStopRouteView: %s", e)
+            return Response(
+                {'error': f"Une erreur s'est produite lors du calcul de la tournée: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+class IsochroneView(APIView):
+    """
+    API pour calculer les zones atteignables depuis un point en 10, 15, 20... minutes
+    """
+    def post(self, request):
+        try:
+            serializer = IsochroneSerializer(data=request.data)
+            
+            if serializer.is_valid():
+                point = serializer.validated_data['point']
+                if not RoutingService._validate_coordinates(point):
+                    return Response({'error': 'Coordonnées invalides'}, status=status.HTTP_400_BAD_REQUEST)
+                
+                isochrone = RoutingService.get_isochrone(
+                    point,
+                    sorted(serializer.validated_data['minutes']),
+                    serializer.validated_data.get('hour')
+                )
+                return Response(isochrone)
+            
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.exception("Erreur dans IsochroneView: %s", e)
+            return Response(
+                {'error': f"Une erreur s'est produite lors du calcul de l'isochrone: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
@@ -1,7 +1,15 @@
 import osmnx as ox
+import argparse
 import json
 import os
 
+from api.road_segments import merge_road_segments
+
+parser = argparse.ArgumentParser(description="Extraction des lieux et routes de Fès depuis OpenStreetMap")
+parser.add_argument("--raw-edges", action="store_true",
+                    help="Conserver une entrée par arête du graphe au lieu d'une entrée par rue")
+args = parser.parse_args()
+
 # Définir la ville et le pays
 city = "Fès"
 country = "Maroc"
@@ -32,6 +40,12 @@ for u, v, k, data in G.edges(keys=True, data=True):
         else:
             named_edges.append({"name": data["name"], "coordinates": [[G.nodes[u]["x"], G.nodes[u]["y"]], [G.nodes[v]["x"], G.nodes[v]["y"]]], "type": "highway"})
 
+# Regrouper les arêtes d'une même rue (une entrée par rue avec point représentatif et emprise)
+if not args.raw_edges:
+    edge_count = len(named_edges)
+    named_edges = merge_road_segments(named_edges)
+    print(f"{edge_count} arêtes nommées fusionnées en {len(named_edges)} rues")
+
 # Extraire les lieux (points d'intérêt) en utilisant ox.features_from_place
 places = ox.features_from_place(place_name, tags)
 
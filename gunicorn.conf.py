@@ -5,7 +5,13 @@ bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
 
 # Worker configuration
 workers = 2
-worker_class = "sync"
+# SERVER_MODE=asgi : workers uvicorn (paquet uvicorn-worker) servant l'application
+# ASGI ; chaque worker garde des centaines d'appels Valhalla en cours
+if os.environ.get('SERVER_MODE', 'wsgi') == 'asgi':
+    wsgi_app = "route_finder.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    worker_class = "sync"
 worker_connections = 1000
 max_requests = 1000
 max_requests_jitter = 100
@@ -25,4 +31,44 @@ keepalive = 2
 # Security
 limit_request_line = 4094
 limit_request_fields = 100
-limit_request_field_size = 8190
\ No newline at end of file
+limit_request_field_size = 8190
+
+
+def post_worker_init(worker):
+    """Construit les index en mémoire avant de servir des requêtes"""
+    try:
+        from api.location_store import LocationStore
+        LocationStore.warm_up()
+    except Exception as e:
+        worker.log.warning(f"Préchargement des index de lieux impossible: {e}")
+
+    # Projeter le graphe routier (mmap : pages partagées entre workers) si le moteur local est utilisé
+    from django.conf import settings
+    if getattr(settings, 'ROUTING_PROVIDER', 'valhalla') == 'local':
+        from api.routing_engine import get_road_graph
+        get_road_graph()
+
+
+def on_starting(server):
+    """Répertoire de métriques propre à ce maître, hérité par ses workers (api/metrics.py)"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'route_finder.settings')
+    from api import metrics
+    metrics.start_instance()
+
+
+def on_exit(server):
+    """Supprime les métriques de l'instance"""
+    from api import metrics
+    metrics.remove_instance()
+
+
+def worker_exit(server, worker):
+    """Verse les métriques du worker qui s'arrête dans l'archive commune"""
+    from api import metrics
+    metrics.retire()
+
+
+def child_exit(server, worker):
+    """Archive les métriques d'un worker tué avant d'avoir pu le faire lui-même"""
+    from api import metrics
+    metrics.retire(worker.pid)
@@ -11,6 +11,8 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'route_finder.settings')
 django.setup()
 
 from api.models import PreExtractedLocation
+from api.normalization import normalize_search_key
+from api.road_segments import merge_road_segments
 
 def import_locations_from_json(json_file_path):
     """
@@ -28,6 +30,11 @@ def import_locations_from_json(json_file_path):
     
     print(f"Chargement de {len(locations_data)} lieux...")
     
+    # Les fichiers extraits avec --raw-edges contiennent une entrée par arête de route :
+    # les regrouper en une entrée par rue (sans effet sur un fichier déjà fusionné)
+    locations_data = merge_road_segments(locations_data)
+    print(f"{len(locations_data)} lieux après fusion des tronçons de route")
+    
     # Importer les lieux par lots pour améliorer les performances
     batch_size = 1000
     locations_to_create = []
@@ -44,9 +51,11 @@ def import_locations_from_json(json_file_path):
             # Créer l'objet PreExtractedLocation
             location_obj = PreExtractedLocation(
                 name=name,
+                search_key=normalize_search_key(name),
                 longitude=longitude,
                 latitude=latitude,
-                location_type=str(location_type) if location_type else None
+                location_type=str(location_type) if location_type else None,
+                bbox=location.get('bbox')
             )
             locations_to_create.append(location_obj)
             
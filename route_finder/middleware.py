@@ -0,0 +1,77 @@
+"""
+Middleware du projet
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from api.instrumentation import increment, request_trace
+from api.metrics import start_flusher
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise utilisable tel quel sous ASGI
+
+    WhiteNoiseMiddleware est uniquement synchrone : sous ASGI, Django exécuterait
+    alors chaque requête dans un thread, ce qui limiterait les vues asynchrones
+    à la taille du pool de threads.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        static_file = self._find_static_file(request)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
+
+    def _find_static_file(self, request):
+        if self.autorefresh:
+            return self.find_file(request.path_info)
+        return self.files.get(request.path_info)
+
+
+class RequestTimingMiddleware:
+    """
+    Ouvre le relevé de durée des étapes de chaque requête (api/instrumentation.py)
+    et compte les requêtes par vue, méthode et statut (api/metrics.py)
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with request_trace(f"{request.method} {request.path}"):
+            response = self.get_response(request)
+        self._count(request, response)
+        return response
+
+    async def __acall__(self, request):
+        with request_trace(f"{request.method} {request.path}"):
+            response = await self.get_response(request)
+        self._count(request, response)
+        return response
+
+    @staticmethod
+    def _count(request, response):
+        # Nom de la route plutôt que le chemin : nombre de séries borné
+        match = getattr(request, 'resolver_match', None)
+        endpoint = (match.url_name or match.view_name) if match else 'unmatched'
+        increment('requests_total', endpoint=endpoint, method=request.method, status=response.status_code)
+        start_flusher()
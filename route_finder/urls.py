@@ -16,7 +16,9 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
+
+from api.metrics import CONTENT_TYPE, exposition
 
 def home(request):
     """Route racine pour vérifier que l'API fonctionne"""
@@ -37,9 +39,14 @@ def health_check(request):
         "service": "route-finder-api"
     })
 
+def metrics(request):
+    """Métriques au format Prometheus, additionnées sur tous les workers"""
+    return HttpResponse(exposition(), content_type=CONTENT_TYPE)
+
 urlpatterns = [
     path('', home, name='home'),  # Route racine - corrige l'erreur 404
     path('health/', health_check, name='health_check'),  # Health check
+    path('metrics/', metrics, name='metrics'),  # Prometheus (metrics_path: /metrics/)
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
 ]
\ No newline at end of file